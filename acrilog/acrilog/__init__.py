@@ -1,4 +1,21 @@
 from .lib.mplogger import MpLogger, create_stream_handler
+from .lib.mpqueue_handler import MpQueueHandler
+from .lib.shm_queue import SharedMemoryQueue
+from .lib.record_codec import RecordEncoder, RecordDecoder
+from .lib.threaded_handler import ThreadedHandler
+from .lib.async_listener import AsyncLogListener
+from .lib.level_control import LevelControl
+from .lib.handler_pool import HandlerPool
+from .lib.buffered_file_handler import BufferedFileHandler, HierarchicalBufferedFileHandler
+from .lib.log_compressor import LogCompressor
+from .lib.mmap_file_handler import MmapFileHandler
+from .lib.binary_log import BinaryRecordEncoder, read_records, convert_to_text
+from .lib.time_index import TimeIndex, log_filename, query
+from .lib.json_formatter import JsonLinesFormatter
+from .lib.compiled_formatter import CompiledLevelBasedFormatter
+from .lib.repeat_aggregator import RepeatAggregator
+from .lib.rate_limit import RateLimitFilter
+from .lib.listener_stats import ListenerStats
 from acrilib import TimedSizedRotatingHandler
 from .lib.sshlogger_socket_server import SSHLogger
 from .lib.sshlogger_socket_handler import SSHLoggerClientHandler
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import os
+import re
+import sys
+import logging
+from acrilog.lib.log_search import search, DEFAULT_DATEFMT
+
+module_logger = logging.getLogger(__name__)
+
+
+def main(pattern=None, logdir=None, file_prefix=None, file_suffix=None,
+         keys=None, separator='.', ignore_case=False, with_key=False,
+         datefmt=None, format=None, workers=None):
+    level_formats = {'default': format} if format else None
+    flags = re.IGNORECASE if ignore_case else 0
+    out = sys.stdout.buffer
+
+    def untimed(filename):
+        sys.stderr.write('%s: no record time matching --datefmt %r; its '
+                         'lines are not merged by time.\n'
+                         % (filename, datefmt or DEFAULT_DATEFMT))
+
+    for _, key, line in search(logdir, pattern, file_prefix=file_prefix,
+                               file_suffix=file_suffix, keys=keys,
+                               separator=separator or None, flags=flags,
+                               datefmt=datefmt, level_formats=level_formats,
+                               workers=workers, untimed=untimed):
+        if with_key:
+            out.write(key.encode('utf8') + b': ')
+        out.write(line)
+        out.write(b'\n')
+    out.flush()
+
+
+def cmdargs():
+    import argparse
+
+    filename = os.path.basename(__file__)
+    progname = filename.rpartition('.')[0]
+
+    parser = argparse.ArgumentParser(
+        description="""%s searches log files of a log directory, including
+        rotated and compressed backups, in parallel; matches are printed in
+        time order""" % progname)
+    parser.add_argument('pattern', type=str,
+                        help="""Regular expression to search.""")
+    parser.add_argument('logdir', type=str,
+                        help="""Log directory.""")
+    parser.add_argument('-k', '--key', type=str, action='append',
+                        dest='keys',
+                        help="""Key (name or process key) pattern of files
+                        to search, e.g., 'app.*'; may be repeated.  Default
+                        is top keys, which hold records of their sub
+                        keys.""")
+    parser.add_argument('--file-prefix', type=str, dest='file_prefix',
+                        help="""file_prefix of logger.""")
+    parser.add_argument('--file-suffix', type=str, dest='file_suffix',
+                        help="""file_suffix of logger.""")
+    parser.add_argument('--separator', type=str, dest='separator',
+                        default='.',
+                        help="""Key hierarchy separator; empty if keys are
+                        not hierarchical.""")
+    parser.add_argument('-i', '--ignore-case', action='store_true',
+                        dest='ignore_case', help="""Ignore case.""")
+    parser.add_argument('-H', '--with-key', action='store_true',
+                        dest='with_key',
+                        help="""Prefix lines with their key.""")
+    parser.add_argument('--datefmt', type=str, dest='datefmt',
+                        help="""Date format of records; default is logger
+                        default.""")
+    parser.add_argument('--format', type=str, dest='format',
+                        help="""Record format of binary log files.""")
+    parser.add_argument('-w', '--workers', type=int, dest='workers',
+                        help="""Searching processes; default number of
+                        CPUs.""")
+    args = parser.parse_args()
+
+    return args
+
+
+def run():
+    args = cmdargs()
+    try:
+        main(**vars(args))
+    except BrokenPipeError:
+        # reader of output is gone (e.g., head); stdout is redirected so
+        # flushing it at exit does not fail again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import os
+import sys
+import logging
+from acrilog.lib.binary_log import convert_to_text
+
+module_logger = logging.getLogger(__name__)
+
+
+def main(files=[], output=None, format=None, datefmt=None):
+    level_formats = {'default': format} if format else None
+    dest = open(output, 'w') if output else sys.stdout
+    try:
+        for file in files:
+            convert_to_text(file, dest, level_formats=level_formats,
+                            datefmt=datefmt)
+    finally:
+        if output:
+            dest.close()
+
+
+def cmdargs():
+    import argparse
+
+    filename = os.path.basename(__file__)
+    progname = filename.rpartition('.')[0]
+
+    parser = argparse.ArgumentParser(
+        description="%s renders binary log files as text" % progname)
+    parser.add_argument('files', type=str, nargs='+',
+                        help="""Binary log files (may be compressed).""")
+    parser.add_argument('-o', '--output', type=str, dest='output',
+                        help="""Text file to write; default stdout.""")
+    parser.add_argument('--format', type=str, dest='format',
+                        help="""Record format for all levels; default is
+                        logger default level formats.""")
+    parser.add_argument('--datefmt', type=str, dest='datefmt',
+                        help="""Date format.""")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = cmdargs()
+    main(**vars(args))
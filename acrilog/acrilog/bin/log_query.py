@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import os
+import sys
+import logging
+from datetime import datetime
+from acrilog.lib.time_index import query, log_filename
+
+module_logger = logging.getLogger(__name__)
+
+
+def parse_time(value):
+    ''' Returns epoch seconds of value: epoch seconds, or ISO date time in
+    local time.
+    '''
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(file=None, logdir=None, name=None, file_prefix=None,
+         file_suffix=None, start=None, end=None, format=None, datefmt=None):
+    if file is None:
+        file = log_filename(logdir, name, file_prefix, file_suffix)
+    start = parse_time(start) if start else None
+    end = parse_time(end) if end else None
+    formatter = None
+    out = sys.stdout
+    for item in query(file, start, end):
+        if isinstance(item, logging.LogRecord):
+            if formatter is None:
+                from acrilog.lib.binary_log import text_formatter
+                level_formats = {'default': format} if format else None
+                formatter = text_formatter(level_formats, datefmt)
+            out.write(formatter.format(item))
+            out.write('\n')
+        else:
+            out.buffer.write(item)
+    out.flush()
+
+
+def cmdargs():
+    import argparse
+
+    filename = os.path.basename(__file__)
+    progname = filename.rpartition('.')[0]
+
+    parser = argparse.ArgumentParser(
+        description="""%s prints records of a time range from log file and its
+        backups, using their time index""" % progname)
+    parser.add_argument('file', type=str, nargs='?',
+                        help="""Current log file; default is named by --logdir,
+                        --name, --file-prefix, and --file-suffix.""")
+    parser.add_argument('--logdir', type=str, dest='logdir',
+                        help="""Log directory.""")
+    parser.add_argument('--name', type=str, dest='name',
+                        help="""Logger name, or process key value.""")
+    parser.add_argument('--file-prefix', type=str, dest='file_prefix',
+                        help="""file_prefix of logger.""")
+    parser.add_argument('--file-suffix', type=str, dest='file_suffix',
+                        help="""file_suffix of logger.""")
+    parser.add_argument('-s', '--start', type=str, dest='start',
+                        help="""Range start: epoch seconds or ISO date time;
+                        default is from first record.""")
+    parser.add_argument('-e', '--end', type=str, dest='end',
+                        help="""Range end: epoch seconds or ISO date time;
+                        default is to last record.""")
+    parser.add_argument('--format', type=str, dest='format',
+                        help="""Record format of binary log files.""")
+    parser.add_argument('--datefmt', type=str, dest='datefmt',
+                        help="""Date format of binary log files.""")
+    args = parser.parse_args()
+    if args.file is None and args.name is None:
+        parser.error("file or --name is required.")
+
+    return args
+
+
+if __name__ == '__main__':
+    args = cmdargs()
+    main(**vars(args))
@@ -0,0 +1,218 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import queue
+import pickle
+import struct
+import asyncio
+import logging
+import threading as th
+from acrilog.lib.queue_listener import RecordQueueListener
+
+
+class AsyncLogListener(RecordQueueListener):
+    ''' Listener serving any number of MpLogger queues and log sockets on a
+    single asyncio event loop.
+
+    multiprocessing Queues are read when their underlying connection is
+    readable; queues with no connection (e.g., SharedMemoryQueue) are
+    polled.  Sockets accept the protocol of logging.handlers.SocketHandler
+    (4 bytes length followed by pickled record dict), same as SSHLogger.
+
+    Handlers that have an ahandle coroutine method are awaited by a task of
+    their own, in record order; others are called directly.
+
+    A queue callback handles at most drain_limit items, then reschedules
+    itself, so a busy queue does not starve other queues and sockets.
+    '''
+
+    def __init__(self, *handlers, name=None, respect_handler_level=False,
+                 poll_interval=0.01, drain_limit=1000):
+        '''
+        Args:
+            handlers: handlers to pass records to.
+            name: name used for listener own records.
+            respect_handler_level: pass handlers only records of their level
+                and above.
+            poll_interval: seconds between polls of queues without
+                connection.
+            drain_limit: maximum number of items taken off a queue before
+                yielding to the event loop.
+        '''
+        super(AsyncLogListener, self).__init__(
+            None, None, *handlers, name=name,
+            respect_handler_level=respect_handler_level)
+        self.poll_interval = poll_interval
+        self.drain_limit = drain_limit
+        self.loop = None
+        self._queues = list()
+        self._addresses = list()
+        self._handler_queues = dict()
+        self._clients = dict()
+        self._stopping = None
+        self._ready = th.Event()
+        self._error = None
+
+    def add_queue(self, queue):
+        ''' adds queue to serve; must be called before start.
+        '''
+        self._queues.append(queue)
+        return self
+
+    def add_tcp(self, host, port):
+        ''' adds TCP address to accept log records on; must be called before
+        start.
+        '''
+        self._addresses.append((host, port))
+        return self
+
+    def _drain(self, queue_, limit=None):
+        ''' handles items of queue, up to limit; returns True if limit was
+        reached (items may be left).
+        '''
+        count = 0
+        while limit is None or count < limit:
+            try:
+                item = queue_.get_nowait()
+            except (queue.Empty, EOFError):
+                return False
+            if item is not None:
+                self.handle(item)
+            count += 1
+        return True
+
+    def _drain_ready(self, queue_):
+        if self._drain(queue_, self.drain_limit) and \
+                not self._stopping.is_set():
+            self.loop.call_soon(self._drain_ready, queue_)
+
+    async def _poll(self, queue_):
+        while True:
+            more = self._drain(queue_, self.drain_limit)
+            await asyncio.sleep(0 if more else self.poll_interval)
+
+    async def _serve_client(self, reader, writer):
+        self._clients[asyncio.current_task()] = writer
+        try:
+            while True:
+                chunk = await reader.readexactly(4)
+                slen = struct.unpack('>L', chunk)[0]
+                chunk = await reader.readexactly(slen)
+                self.handle(logging.makeLogRecord(pickle.loads(chunk)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            del self._clients[asyncio.current_task()]
+
+    async def _serve_handler(self, handler, records):
+        while True:
+            record = await records.get()
+            try:
+                await handler.ahandle(record)
+            except Exception:
+                handler.handleError(record)
+            finally:
+                records.task_done()
+
+    def dispatch(self, record):
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if self.respect_handler_level and record.levelno < handler.level:
+                continue
+            records = self._handler_queues.get(handler)
+            if records is not None:
+                records.put_nowait(record)
+            else:
+                handler.handle(record)
+
+    async def serve(self):
+        ''' serves queues and sockets until stop() is called.
+
+        Can be awaited directly in an application's own event loop.
+        '''
+        self.loop = loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+
+        tasks = list()
+        for handler in self.handlers:
+            if asyncio.iscoroutinefunction(getattr(handler, 'ahandle', None)):
+                records = self._handler_queues[handler] = asyncio.Queue()
+                tasks.append(loop.create_task(
+                    self._serve_handler(handler, records)))
+
+        readers = list()
+        for queue_ in self._queues:
+            connection = getattr(queue_, '_reader', None)
+            if connection is not None:
+                loop.add_reader(connection.fileno(), self._drain_ready, queue_)
+                readers.append(connection.fileno())
+            else:
+                tasks.append(loop.create_task(self._poll(queue_)))
+
+        servers = [await asyncio.start_server(self._serve_client, host, port)
+                   for host, port in self._addresses]
+
+        self._ready.set()
+        await self._stopping.wait()
+
+        for server in servers:
+            server.close()
+        clients = list(self._clients.items())
+        for _, writer in clients:
+            writer.close()
+        await asyncio.gather(*[client for client, _ in clients],
+                             return_exceptions=True)
+        for fd in readers:
+            loop.remove_reader(fd)
+        for queue_ in self._queues:
+            self._drain(queue_)
+        for records in self._handler_queues.values():
+            await records.join()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    def start(self):
+        ''' runs serve() on an event loop in a thread of its own.
+        '''
+        self._thread = th.Thread(name='AsyncLogListener', target=self._run,
+                                 daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        if self.loop is not None and self._stopping is not None:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -25,12 +25,15 @@ import multiprocessing as mp
 from copy import copy
 from acrilib import get_file_handler, get_hostname
 from acrilib import LevelBasedFormatter
+from acrilog.lib.json_formatter import JsonLinesFormatter
+from acrilog.lib.compiled_formatter import CompiledLevelBasedFormatter
+from acrilog.lib.format_cache import SharedFormatter
 from copy import deepcopy
 import sys
 
 
 def create_stream_handler(logging_level=logging.INFO, level_formats={},
-                          datefmt=None, encoding='utf8'):
+                          datefmt=None, encoding='utf8', formatter=None):
     handlers = list()
 
     stdout = sys.stdout
@@ -38,8 +41,9 @@ def create_stream_handler(logging_level=logging.INFO, level_formats={},
 
     stdout_handler = logging.StreamHandler(stream=stdout)
     # stdout_handler.setLevel(logging_level)
-    formatter = LevelBasedFormatter(level_formats=level_formats,
-                                    datefmt=datefmt)
+    if formatter is None:
+        formatter = LevelBasedFormatter(level_formats=level_formats,
+                                        datefmt=datefmt)
     stdout_handler.setFormatter(formatter)
     handlers.append(stdout_handler)
 
@@ -48,6 +52,29 @@ def create_stream_handler(logging_level=logging.INFO, level_formats={},
     return handlers
 
 
+def create_record_formatter(level_formats={}, datefmt=None,
+                            level_fields=None):
+    ''' Returns formatter of records of file handlers: JsonLinesFormatter
+    if level_fields are given, CompiledLevelBasedFormatter (same text as
+    LevelBasedFormatter) otherwise.
+    '''
+    if level_fields:
+        return JsonLinesFormatter(level_fields=level_fields, datefmt=datefmt)
+    return CompiledLevelBasedFormatter(level_formats=level_formats,
+                                       datefmt=datefmt)
+
+
+def console_formatter(formatter):
+    ''' Returns record formatter if console handlers can share it (it renders
+    level formats, as console does); None otherwise.
+    '''
+    shared = formatter.formatter if isinstance(formatter, SharedFormatter) \
+        else formatter
+    if isinstance(shared, LevelBasedFormatter):
+        return formatter
+    return None
+
+
 class BaseLogger(object):
     ''' Builds Multiprocessing logger such all process
         hare the same logging mechanism.
@@ -78,7 +105,7 @@ class BaseLogger(object):
          'handler_kwargs': kwargs_defaults,
             }
 
-    def __init__(self, name=None, logging_level=logging.INFO, level_formats={}, datefmt=None, console=False, handlers=[], *args, **kwargs):
+    def __init__(self, name=None, logging_level=logging.INFO, level_formats={}, datefmt=None, console=False, handlers=[], level_fields=None, *args, **kwargs):
         '''
         Args:
             name: base name to use for file logs.
@@ -86,6 +113,8 @@ class BaseLogger(object):
             logging_level: level from which logging will be done 
             level_formats: mapping of logging levels to formats to use for constructing message
             datefmt: date format to use
+            level_fields: mapping of logging levels to record fields; when
+                set, files are written as JSON lines (see JsonLinesFormatter)
             process_key: list of record names that would be used to create files
             console_name: when set, records assigned to process_key handler will also routed to global handlers.
             #logging_root: defaults to name if not provided
@@ -103,13 +132,29 @@ class BaseLogger(object):
                 interval=1,
                 utc=False,
                 atTime=None
+              and, to write files through BufferedFileHandler
+                file_buffer_size=0 (0 for unbuffered files),
+                file_flush_interval=1.0,
+                file_flush_level=logging.ERROR,
+                fsync='never',
+                fsync_interval=1.0
+                file_writer='writev' (or 'mmap'),
+                file_segment_size=8MB (with 'mmap')
+                file_format='text' (or 'binary', see binary_log)
+              and, to compress backups in background
+                file_compress=None ('gzip' or 'lzma'),
+                file_compress_workers=1
+              and, to index files by time (see time_index)
+                file_index_records=0 (records per index block),
+                file_index_bytes=0 (bytes per index block)
 
         '''
 
         self.logging_level = logging_level
         self.level_formats = level_formats if level_formats else BaseLogger.logger_info_defaults['level_formats']
         self.datefmt = datefmt if datefmt else BaseLogger.logger_info_defaults['datefmt']
-        self.record_formatter = LevelBasedFormatter(level_formats=self.level_formats, datefmt=self.datefmt)
+        self.level_fields = level_fields
+        self.record_formatter = create_record_formatter(level_formats=self.level_formats, datefmt=self.datefmt, level_fields=level_fields)
         self.logger_initialized = False
         self.handlers = handlers
         # self.process_key = process_key
@@ -175,6 +220,7 @@ class BaseLogger(object):
                 'logging_level': self.logging_level,
                 'level_formats': self.level_formats,
                 'datefmt': self.datefmt,
+                'level_fields': self.level_fields,
                 'handler_kwargs': self.handler_kwargs,
                 'server_host': hostname,
                }
@@ -210,7 +256,7 @@ class BaseLogger(object):
                                   logger=logger,
                                   # logdir=logger_info['logdir'], 
                                   # logging_level=logging_level,
-                                  record_formatter=LevelBasedFormatter(level_formats=level_formats, datefmt=datefmt),
+                                  record_formatter=create_record_formatter(level_formats=level_formats, datefmt=datefmt, level_fields=logger_info.get('level_fields')),
                                   **logger_info['handler_kwargs'],
                                   )
 
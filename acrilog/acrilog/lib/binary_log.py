@@ -0,0 +1,263 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Binary log file format.
+
+A file is a sequence of entries, each a 5 bytes head (payload length and
+entry type) followed by the payload:
+
+    SEGMENT: starts a segment; payload is MAGIC.  Each time a handler
+        opens the file (or rolls it over) a new segment starts.
+    STRING: payload is string id (uint32) followed by utf8 string.  Ids are
+        valid to the end of their segment.
+    RECORD: payload is RECORD_FIELDS packed by _RECORD, followed by utf8
+        message and utf8 exception text (if any).
+
+All numbers are little endian.
+'''
+
+import sys
+import struct
+import logging
+from acrilog.lib.log_compressor import COMPRESSIONS
+
+
+MAGIC = b'ACRLBIN1'
+
+SEGMENT = b'G'
+STRING = b'S'
+RECORD = b'R'
+
+# string fields are sent as ids of strings defined in the segment.
+STRING_FIELDS = ('name', 'processName', 'host', 'module', 'funcName')
+RECORD_FIELDS = ('created', 'levelno', 'process', 'lineno') + STRING_FIELDS
+
+_HEAD = struct.Struct('<Ic')
+_ID = struct.Struct('<I')
+# RECORD_FIELDS, then message length.
+_RECORD = struct.Struct('<diII' + 'I' * len(STRING_FIELDS) + 'I')
+
+# string id of None.
+_NONE = 0xFFFFFFFF
+
+_segment = _HEAD.pack(len(MAGIC), SEGMENT) + MAGIC
+_exception_formatter = logging.Formatter()
+
+
+class BinaryRecordEncoder(object):
+    ''' Encodes LogRecords into entries of one file.
+
+    The first record after reset() is preceded by a SEGMENT entry; strings
+    are preceded by their STRING entry the first time they are used in a
+    segment.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        ''' starts new segment with an empty string dictionary.
+        '''
+        self._strings = dict()
+        self._started = False
+
+    def encode(self, record):
+        ''' Returns bytes of entries encoding record.
+        '''
+        chunks = list()
+        if not self._started:
+            self._started = True
+            chunks.append(_segment)
+
+        strings = self._strings
+        record_dict = record.__dict__
+        ids = list()
+        for field in STRING_FIELDS:
+            value = record_dict.get(field)
+            if value is None:
+                ids.append(_NONE)
+                continue
+            id_ = strings.get(value)
+            if id_ is None:
+                id_ = strings[value] = len(strings)
+                data = str(value).encode('utf8')
+                chunks.append(_HEAD.pack(_ID.size + len(data), STRING))
+                chunks.append(_ID.pack(id_))
+                chunks.append(data)
+            ids.append(id_)
+
+        message = record.getMessage().encode('utf8')
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(
+                record.exc_info)
+        exc_text = record.exc_text
+        if record.stack_info:
+            exc_text = exc_text + '\n' + record.stack_info if exc_text \
+                else record.stack_info
+        exc_text = exc_text.encode('utf8') if exc_text else b''
+
+        fields = _RECORD.pack(record.created, record.levelno,
+                              record.process or 0, record.lineno or 0,
+                              *ids, len(message))
+        chunks.append(_HEAD.pack(len(fields) + len(message) + len(exc_text),
+                                 RECORD))
+        chunks.append(fields)
+        chunks.append(message)
+        if exc_text:
+            chunks.append(exc_text)
+        return b''.join(chunks)
+
+
+def _open(source):
+    if not isinstance(source, str):
+        return source, False
+    for extension, open_ in COMPRESSIONS.values():
+        if source.endswith(extension):
+            return open_(source, 'rb'), True
+    return open(source, 'rb'), True
+
+
+def is_binary_log(head):
+    ''' Returns True if head, the first bytes of a file, starts a binary log.
+    '''
+    return head[:_HEAD.size] == _segment[:_HEAD.size]
+
+
+def read_entries(source, limit=None):
+    ''' Generates (entry type, payload) of binary log file.
+
+    Reading stops at a truncated last entry (e.g., file of crashed process).
+
+    Args:
+        source: file name (compressed by LogCompressor or not), or binary
+            file object positioned at start of a segment.
+        limit: number of bytes to read; None to read to end of file.
+    '''
+    stream, opened = _open(source)
+    try:
+        read = stream.read
+        head_size = _HEAD.size
+        unpack = _HEAD.unpack
+        head = read(head_size)
+        if len(head) == head_size and unpack(head)[1] != SEGMENT:
+            raise ValueError("Not a binary log file: {}.".format(source))
+        consumed = 0
+        while len(head) == head_size and (limit is None or consumed < limit):
+            size, type_ = unpack(head)
+            payload = read(size)
+            if len(payload) < size:
+                break
+            yield type_, payload
+            consumed += head_size + size
+            head = read(head_size)
+    finally:
+        if opened:
+            stream.close()
+
+
+def read_tuples(source, limit=None):
+    ''' Generates records of binary log file as dicts, without building
+    LogRecords.
+
+    Dicts hold RECORD_FIELDS, msg, and exc_text (None if there is none).
+
+    Args:
+        source, limit: as in read_entries.
+    '''
+    strings = dict()
+    record_size = _RECORD.size
+    fields = RECORD_FIELDS
+    string_fields = len(STRING_FIELDS)
+    for type_, payload in read_entries(source, limit):
+        if type_ == RECORD:
+            values = _RECORD.unpack_from(payload)
+            msg_end = record_size + values[-1]
+            record = dict(zip(fields, values[:4]))
+            for field, id_ in zip(STRING_FIELDS, values[4:4 + string_fields]):
+                record[field] = strings.get(id_)
+            record['msg'] = payload[record_size:msg_end].decode('utf8')
+            exc_text = payload[msg_end:]
+            record['exc_text'] = exc_text.decode('utf8') if exc_text else None
+            yield record
+        elif type_ == STRING:
+            strings[_ID.unpack_from(payload)[0]] = \
+                payload[_ID.size:].decode('utf8')
+        elif type_ == SEGMENT:
+            if payload != MAGIC:
+                raise ValueError("Unknown segment version: {!r}."
+                                 .format(payload))
+            strings = dict()
+
+
+def read_records(source, limit=None):
+    ''' Generates LogRecords of binary log file.
+
+    Args:
+        source, limit: as in read_entries.
+    '''
+    for fields in read_tuples(source, limit):
+        created = fields['created']
+        fields['levelname'] = logging.getLevelName(fields['levelno'])
+        fields['msecs'] = (created - int(created)) * 1000
+        fields['args'] = None
+        yield logging.makeLogRecord(fields)
+
+
+def text_formatter(level_formats=None, datefmt=None):
+    ''' Returns LevelBasedFormatter rendering records as logger would.
+
+    Args:
+        level_formats, datefmt: as given to logger; default to BaseLogger
+            defaults.
+    '''
+    # baselogger imports acrilib; readers of records need not.
+    from acrilog.lib.baselogger import BaseLogger
+    from acrilib import LevelBasedFormatter
+    defaults = BaseLogger.logger_info_defaults
+    return LevelBasedFormatter(
+        level_formats=level_formats or defaults['level_formats'],
+        datefmt=datefmt or defaults['datefmt'])
+
+
+def convert_to_text(source, dest=None, level_formats=None, datefmt=None,
+                    formatter=None):
+    ''' Writes records of binary log file as text.
+
+    Args:
+        source: binary log file name or object.
+        dest: text file object; defaults to stdout.
+        level_formats, datefmt: as given to logger; default to BaseLogger
+            defaults.
+        formatter: formatter to use instead of level_formats and datefmt.
+
+    Returns:
+        number of records written.
+    '''
+    if formatter is None:
+        formatter = text_formatter(level_formats, datefmt)
+    if dest is None:
+        dest = sys.stdout
+    count = 0
+    for record in read_records(source):
+        dest.write(formatter.format(record))
+        dest.write('\n')
+        count += 1
+    return count
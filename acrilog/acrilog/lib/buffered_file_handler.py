@@ -0,0 +1,599 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import time
+import weakref
+import logging
+import threading as th
+from logging.handlers import TimedRotatingFileHandler
+from acrilib import TimedSizedRotatingHandler, HierarchicalTimedSizedRotatingHandler
+from acrilog.lib.log_compressor import LogCompressor
+from acrilog.lib.binary_log import BinaryRecordEncoder
+from acrilog.lib.format_cache import SharedFormatter
+from acrilog.lib.handler_pool import HandlerPool
+from acrilog.lib.time_index import TimeIndexWriter, index_filename, \
+    log_filename
+
+
+FSYNC_POLICIES = ('never', 'flush', 'interval')
+
+# handler_kwargs entries selecting and configuring
+# HierarchicalBufferedFileHandler, and the arguments they map to.
+BUFFERED_FILE_KWARGS = {
+    'file_buffer_size': 'buffer_size',
+    'file_flush_interval': 'flush_interval',
+    'file_flush_level': 'flush_level',
+    'fsync': 'fsync',
+    'fsync_interval': 'fsync_interval',
+    'file_compress': 'compress',
+    'file_compress_workers': 'compress_workers',
+    'file_writer': 'writer',
+    'file_segment_size': 'segment_size',
+    'file_format': 'format',
+    'file_index_records': 'index_records',
+    'file_index_bytes': 'index_bytes',
+    }
+
+# how BufferedFileHandler family writes to file.
+FILE_WRITERS = ('writev', 'mmap')
+# what BufferedFileHandler family writes: formatted lines, or binary_log
+# entries.
+FILE_FORMATS = ('text', 'binary')
+
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+def _writev(fd, chunks):
+    ''' writes all chunks to fd, coping with partial writes.
+    '''
+    while chunks:
+        batch = chunks[:_IOV_MAX]
+        written = os.writev(fd, batch)
+        done = 0
+        while done < len(batch) and written >= len(batch[done]):
+            written -= len(batch[done])
+            done += 1
+        chunks = chunks[done:]
+        if written:
+            chunks[0] = chunks[0][written:]
+
+
+class _Flusher(object):
+    ''' Thread, one per process, flushing idle buffers of BufferedFileHandlers
+    once their flush_interval (or fsync_interval) passes.
+    '''
+
+    def __init__(self):
+        self.handlers = weakref.WeakSet()
+        self.lock = th.Lock()
+        self.pid = None
+
+    def add(self, handler):
+        with self.lock:
+            self.handlers.add(handler)
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                thread = th.Thread(name='BufferedFileHandlerFlusher',
+                                   target=self._loop, daemon=True)
+                thread.start()
+
+    def discard(self, handler):
+        with self.lock:
+            self.handlers.discard(handler)
+
+    def _loop(self):
+        pid = os.getpid()
+        while self.pid == pid:
+            with self.lock:
+                handlers = list(self.handlers)
+            tick = min([handler.tick() for handler in handlers], default=1.0)
+            time.sleep(tick)
+            for handler in handlers:
+                handler.flush_due()
+
+
+_flusher = _Flusher()
+
+
+class BufferedFileHandler(TimedSizedRotatingHandler):
+    ''' TimedSizedRotatingHandler that coalesces formatted records in a
+    buffer, and writes the buffer with a single os.writev.
+
+    The buffer is written when it holds buffer_size bytes, when a record of
+    flush_level or above is handled, when flush_interval seconds passed
+    since it was last written, and on flush() and close().
+
+    fsync policy:
+        never: leave it to the operating system.
+        flush: fsync every time the buffer is written.
+        interval: fsync at most every fsync_interval seconds.
+
+    With index_records or index_bytes, a sparse time index of the file is
+    kept along side it (see time_index); index files of backups are rotated
+    with them.
+    '''
+
+    def __init__(self, filename, file_mode='a', maxBytes=0, backupCount=0,
+                 encoding='ascii', delay=False, when='h', interval=1,
+                 utc=False, atTime=None, buffer_size=65536,
+                 flush_interval=1.0, flush_level=logging.ERROR,
+                 fsync='never', fsync_interval=1.0, compressor=None,
+                 binary=False, index_records=0, index_bytes=0, *args,
+                 **kwargs):
+        '''
+        Args:
+            filename, file_mode, maxBytes, backupCount, encoding, delay,
+                when, interval, utc, atTime: as in TimedSizedRotatingHandler.
+            buffer_size: bytes to collect before writing.
+            flush_interval: maximum seconds a record may wait in buffer;
+                must be positive.
+            flush_level: records at this level or above are written
+                immediately.
+            fsync: one of FSYNC_POLICIES.
+            fsync_interval: seconds between fsyncs with 'interval' policy.
+            compressor: LogCompressor to compress backups with.
+            binary: write records in binary_log format instead of
+                formatting them.
+            index_records, index_bytes: records, or bytes, per block of
+                time index; both 0 for no index.
+        '''
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy: {}.".format(fsync))
+        # they pace the flusher thread.
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive: {}."
+                             .format(flush_interval))
+        if fsync == 'interval' and fsync_interval <= 0:
+            raise ValueError("fsync_interval must be positive: {}."
+                             .format(fsync_interval))
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._buffer = list()
+        self._buffered = 0
+        self._unsynced = False
+        self._last_write = self._last_fsync = time.monotonic()
+        super(BufferedFileHandler, self).__init__(
+            filename, file_mode=file_mode, maxBytes=maxBytes,
+            backupCount=backupCount, encoding=encoding, delay=delay,
+            when=when, interval=interval, utc=utc, atTime=atTime)
+        self._size = self._file_size()
+        self.encoder = BinaryRecordEncoder() if binary else None
+        self.index_records = index_records
+        self.index_bytes = index_bytes
+        self.index = None
+        self._open_index()
+        self.compressor = compressor
+        if compressor is not None:
+            self.namer = compressor.namer
+        _flusher.add(self)
+
+    def _file_size(self):
+        try:
+            return os.stat(self.baseFilename).st_size
+        except OSError:
+            return 0
+
+    def _open_index(self):
+        if self.index_records or self.index_bytes:
+            self.index = TimeIndexWriter(
+                self.baseFilename, records=self.index_records,
+                size=self.index_bytes, new=not self._size)
+
+    def _close_index(self):
+        if self.index is not None:
+            index, self.index = self.index, None
+            index.close(self._size + self._buffered)
+
+    def _rotate_index(self):
+        ''' shifts index files the way doRollover shifts backups.
+        '''
+        if self.backupCount <= 0:
+            return
+        for i in range(self.backupCount - 1, 0, -1):
+            source = index_filename("%s.%d" % (self.baseFilename, i))
+            if os.path.exists(source):
+                os.replace(source, index_filename(
+                    "%s.%d" % (self.baseFilename, i + 1)))
+        source = index_filename(self.baseFilename)
+        if os.path.exists(source):
+            os.replace(source, index_filename(self.baseFilename + ".1"))
+
+    def shouldRollover(self, record, size=0):
+        ''' checks time based rollover, and size based rollover counting
+        buffered bytes and size more bytes.
+        '''
+        pending = self._size + self._buffered
+        if self.maxBytes > 0 and pending and \
+                pending + size >= self.maxBytes:
+            return True
+        return TimedRotatingFileHandler.shouldRollover(self, record)
+
+    def doRollover(self):
+        self._write()
+        indexed = self.index is not None
+        self._close_index()
+        if self.compressor is not None and self.backupCount > 0:
+            # backups, and their indexes, are shifted by a worker after
+            # earlier compressions; writing resumes at once.
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.compressor.rollover(self.baseFilename, self.backupCount)
+            if not self.delay:
+                self.stream = self._open()
+        else:
+            super(BufferedFileHandler, self).doRollover()
+            if indexed:
+                self._rotate_index()
+        if self.encoder is not None:
+            self.encoder.reset()
+        self._size = self._file_size()
+        if indexed:
+            self._open_index()
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
+    def emit(self, record):
+        try:
+            index = self.index
+            if index is not None and index.due():
+                index.checkpoint(self._size + self._buffered)
+                if self.encoder is not None:
+                    # blocks are read from their start.
+                    self.encoder.reset()
+            if self.encoder is None:
+                data = self._format_bytes(record)
+            else:
+                data = self.encoder.encode(record)
+            if self.shouldRollover(record, len(data)):
+                self.doRollover()
+                if self.encoder is not None:
+                    # string definitions start over in new file.
+                    data = self.encoder.encode(record)
+                index = self.index
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if index is not None:
+                index.add(record.created, len(data))
+            if self._buffered >= self.buffer_size or \
+                    record.levelno >= self.flush_level or \
+                    time.monotonic() - self._last_write >= \
+                    self.flush_interval:
+                self._write()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _format_bytes(self, record):
+        formatter = self.formatter
+        if isinstance(formatter, SharedFormatter):
+            # other handlers of the listener may have encoded it already.
+            return formatter.format_bytes(record, self.terminator,
+                                          self.encoding or 'utf8')
+        return (self.format(record) + self.terminator)\
+            .encode(self.encoding or 'utf8')
+
+    def _write(self):
+        now = time.monotonic()
+        self._last_write = now
+        if not self._buffer:
+            return
+        if self.stream is None:
+            self.stream = self._open()
+            self._size = self._file_size()
+        self._write_chunks(self._buffer)
+        self._size += self._buffered
+        self._buffer = list()
+        self._buffered = 0
+        self._unsynced = True
+        if self.fsync == 'flush' or (self.fsync == 'interval' and
+                                     now - self._last_fsync >=
+                                     self.fsync_interval):
+            self._fsync(now)
+
+    def _write_chunks(self, chunks):
+        ''' writes list of byte strings to open stream.
+        '''
+        _writev(self.stream.fileno(), chunks)
+
+    def _fsync(self, now):
+        os.fsync(self.stream.fileno())
+        self._last_fsync = now
+        self._unsynced = False
+
+    def tick(self):
+        ''' Returns seconds between checks of flush_due.
+        '''
+        if self.fsync == 'interval':
+            return min(self.flush_interval, self.fsync_interval)
+        return self.flush_interval
+
+    def flush_due(self):
+        ''' writes buffer, or fsyncs, if their interval passed.
+        '''
+        self.acquire()
+        try:
+            now = time.monotonic()
+            if self._buffer and \
+                    now - self._last_write >= self.flush_interval:
+                self._write()
+            if self._unsynced and self.fsync == 'interval' and \
+                    self.stream is not None and \
+                    now - self._last_fsync >= self.fsync_interval:
+                self._fsync(now)
+        except Exception:
+            # the flusher thread must keep running; the next emit reports.
+            pass
+        finally:
+            self.release()
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write()
+        finally:
+            self.release()
+
+    def close(self):
+        _flusher.discard(self)
+        self.acquire()
+        try:
+            try:
+                self._write()
+                if self._unsynced and self.fsync != 'never' and \
+                        self.stream is not None:
+                    self._fsync(time.monotonic())
+            finally:
+                try:
+                    self._close_index()
+                finally:
+                    super(BufferedFileHandler, self).close()
+        finally:
+            self.release()
+
+
+def get_buffered_file_handler(logdir='', name=None, formatter=None,
+                              file_prefix=None, file_suffix=None,
+                              handler_class=None, **kwargs):
+    ''' Returns BufferedFileHandler for name, naming its file the same way
+    acrilib's get_file_handler does.
+
+    Args:
+        handler_class: BufferedFileHandler or subclass of it to create.
+        kwargs: handler_class arguments other than filename.
+    '''
+    if handler_class is None:
+        handler_class = BufferedFileHandler
+    if logdir is None:
+        logdir = ''
+    if logdir and not os.path.isdir(logdir):
+        os.makedirs(logdir, mode=0o744, exist_ok=True)
+
+    if formatter is None:
+        raise RuntimeError("Formatter must be provided, but None found.")
+    filename = log_filename(logdir, name, file_prefix, file_suffix)
+    handler = handler_class(filename=filename, **kwargs)
+    handler.setFormatter(formatter)
+    return handler
+
+
+class HierarchicalBufferedFileHandler(logging.Handler):
+    ''' Maintains BufferedFileHandler handlers according to hierarchy, like
+    acrilib's HierarchicalTimedSizedRotatingHandler.
+
+    Value of LogRecord key is split from the right by separator; e.g., A.B.C
+    is logged into A, A.B, and A.B.C.  With consolidate, records are also
+    logged into that name.
+
+    With compress, backups of all files are compressed by a shared
+    LogCompressor.  With max_open_files, handlers are kept in a HandlerPool
+    and records are handled one at a time, so a shard's listener thread
+    does not write to a handler another one closed.
+    '''
+
+    def __init__(self, key='name', separator='.', consolidate='', *args,
+                 compress=None, compress_workers=1, max_open_files=None,
+                 **kwargs):
+        '''
+        Args:
+            key: name of LogRecord attribute to associate handlers by.
+            separator: used to split key value to hierarchy; None to use
+                value as is.
+            consolidate: name to which all records are also logged.
+            compress: None, or compression method of backups (see
+                log_compressor.COMPRESSIONS).
+            compress_workers: number of compressing threads.
+            max_open_files: maximum number of keys with open files; None for
+                no limit.
+            kwargs: get_buffered_file_handler arguments (logdir, formatter,
+                file_prefix, file_suffix, and BufferedFileHandler's).
+        '''
+        super(HierarchicalBufferedFileHandler, self).__init__()
+        self.name = kwargs.pop('name', None)
+        self.key = key
+        self.separator = separator
+        self.consolidate = consolidate
+        self.handler_args = args
+        self.handler_kwargs = kwargs
+        self.compressor = None
+        if compress:
+            self.compressor = self.handler_kwargs['compressor'] = \
+                LogCompressor(method=compress, workers=compress_workers)
+        self._handlers = dict()
+        self._keys = dict()
+        self.handler_pool = None
+        if max_open_files is not None:
+            self.handler_pool = HandlerPool(self._open_handler,
+                                            max_open=max_open_files)
+
+    def _hierarchy(self, record_key):
+        keys = self._keys.get(record_key)
+        if keys is None:
+            if self.separator is not None:
+                keys = list()
+                left_key = record_key
+                while left_key:
+                    keys.append(left_key)
+                    left_key = left_key.rpartition(self.separator)[0]
+            else:
+                keys = [record_key]
+            if self.consolidate and self.consolidate not in keys:
+                keys.append(self.consolidate)
+            keys = self._keys[record_key] = tuple(keys)
+        return keys
+
+    def handle(self, record):
+        ''' passes record to the handlers of each level of its key.
+        '''
+        rv = self.filter(record)
+        if rv and self.handler_pool is not None:
+            self.acquire()
+            try:
+                for key in self._hierarchy(getattr(record, self.key, '')):
+                    for handler in self.handler_pool.get(key):
+                        handler.handle(record)
+            finally:
+                self.release()
+        elif rv:
+            for key in self._hierarchy(getattr(record, self.key, '')):
+                handler = self._handlers.get(key)
+                if handler is None:
+                    handler = self._create_handler(key)
+                handler.handle(record)
+        return rv
+
+    def _create_handler(self, key):
+        # listener threads of shards share this handler.
+        self.acquire()
+        try:
+            handler = self._handlers.get(key)
+            if handler is None:
+                handler = self._handlers[key] = get_buffered_file_handler(
+                    *self.handler_args, name=key, **self.handler_kwargs)
+            return handler
+        finally:
+            self.release()
+
+    def _open_handler(self, key, reopen):
+        kwargs = self.handler_kwargs
+        if reopen:
+            kwargs = dict(kwargs, file_mode='a')
+        return get_buffered_file_handler(*self.handler_args, name=key,
+                                         **kwargs)
+
+    def _open_handlers(self):
+        if self.handler_pool is None:
+            return list(self._handlers.values())
+        return [handler for handlers in list(self.handler_pool.values())
+                for handler in handlers]
+
+    def emit(self, record):
+        self.handle(record)
+
+    def flush(self):
+        for handler in self._open_handlers():
+            handler.flush()
+        if self.compressor is not None:
+            self.compressor.wait()
+
+    def close(self):
+        for handler in self._open_handlers():
+            handler.close()
+        self._handlers = dict()
+        if self.compressor is not None:
+            self.compressor.shutdown()
+        super(HierarchicalBufferedFileHandler, self).close()
+
+
+class LockedHierarchicalHandler(HierarchicalTimedSizedRotatingHandler):
+    ''' acrilib's HierarchicalTimedSizedRotatingHandler, handling a record
+    at a time.
+
+    acrilib creates the handler of a key on its first record without a lock;
+    listener threads of shards racing on it would create duplicates, and
+    with file_mode 'w' the later one removes the file of the first.
+    '''
+
+    def handle(self, record):
+        self.acquire()
+        try:
+            return super(LockedHierarchicalHandler, self).handle(record)
+        finally:
+            self.release()
+
+
+def create_hierarchical_handler(*args, formatter=None, max_open_files=None,
+                                **kwargs):
+    ''' Returns hierarchical file handler for listener processes.
+
+    When handler kwargs include file_buffer_size, file_compress, file_writer,
+    file_format, or file index options, or when max_open_files is set,
+    HierarchicalBufferedFileHandler is used; otherwise acrilib's
+    HierarchicalTimedSizedRotatingHandler, locked by
+    LockedHierarchicalHandler.  Without file_buffer_size, records are written
+    as they come (buffer_size 0).
+
+    file_writer 'mmap' selects MmapFileHandler, with file_segment_size.
+    file_format 'binary' writes binary_log entries instead of text.
+    file_index_records or file_index_bytes keep a time index of files.
+
+    Args:
+        max_open_files: maximum number of keys with open files; None for no
+            limit.
+        kwargs: handler_kwargs of logger; see BUFFERED_FILE_KWARGS for the
+            entries configuring buffering.
+    '''
+    buffered = dict((arg, kwargs.pop(key))
+                    for key, arg in BUFFERED_FILE_KWARGS.items()
+                    if key in kwargs)
+    if buffered.get('buffer_size') or buffered.get('compress') or \
+            buffered.get('writer') or buffered.get('format') or \
+            buffered.get('index_records') or buffered.get('index_bytes') or \
+            max_open_files is not None:
+        buffered.setdefault('buffer_size', 0)
+        file_format = buffered.pop('format', None) or 'text'
+        if file_format not in FILE_FORMATS:
+            raise ValueError("Unknown file format: {}.".format(file_format))
+        buffered['binary'] = file_format == 'binary'
+        writer = buffered.pop('writer', None) or 'writev'
+        if writer not in FILE_WRITERS:
+            raise ValueError("Unknown file writer: {}.".format(writer))
+        if writer == 'mmap':
+            # mmap_file_handler builds on this module.
+            from acrilog.lib.mmap_file_handler import MmapFileHandler
+            buffered['handler_class'] = MmapFileHandler
+        else:
+            buffered.pop('segment_size', None)
+        kwargs.update(buffered)
+        return HierarchicalBufferedFileHandler(
+            *args, formatter=formatter, max_open_files=max_open_files,
+            **kwargs)
+    return LockedHierarchicalHandler(*args, formatter=formatter, **kwargs)
@@ -0,0 +1,171 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import re
+from datetime import datetime
+from acrilib import LevelBasedFormatter
+
+
+# %(name)spec of '%' style formats; anything else but %% is not compiled.
+_FIELD = re.compile(r'%\((?P<name>\w+)\)(?P<spec>[#0 +-]*\d*(?:\.\d+)?'
+                    r'[diouxXeEfFgGcrsa])|(?P<escape>%%)|(?P<other>%)')
+
+
+def compile_format(fmt):
+    ''' Returns function(record_dict, message, asctime) returning fmt
+    applied to record; None if fmt cannot be compiled.
+
+    Named fields are replaced by positional ones, and the function builds
+    the value tuple directly, taking only the fields fmt references.
+
+    Returns:
+        (function, uses_time)
+    '''
+    parts = list()
+    values = list()
+    pos = 0
+    for match in _FIELD.finditer(fmt):
+        if match.group('other'):
+            return None, False
+        parts.append(fmt[pos:match.start()].replace('%', '%%'))
+        pos = match.end()
+        if match.group('escape'):
+            parts.append('%%')
+            continue
+        name = match.group('name')
+        parts.append('%' + match.group('spec'))
+        if name == 'message':
+            values.append('message')
+        elif name == 'asctime':
+            values.append('asctime')
+        else:
+            values.append('d[%r]' % name)
+    parts.append(fmt[pos:].replace('%', '%%'))
+    source = 'lambda d, message, asctime: %r %% (%s,)' % (
+        ''.join(parts), ', '.join(values))
+    if not values:
+        source = 'lambda d, message, asctime: %r' % fmt.replace('%%', '%')
+    return eval(source, {}), 'asctime' in values
+
+
+class CompiledLevelBasedFormatter(LevelBasedFormatter):
+    ''' LevelBasedFormatter that compiles the format of each level, once,
+    into a function formatting records, producing the same text.
+
+    The function takes only the record attributes its format references,
+    and asctime is computed only if referenced.  The date part of asctime
+    is formatted once per second; microseconds (%f in datefmt, or msecs
+    without datefmt) are formatted per record.  Formats that cannot be
+    compiled (e.g., mapping keys other than %(name)s) are formatted by
+    LevelBasedFormatter.
+    '''
+
+    def __init__(self, level_formats={}, datefmt=None, *args, **kwargs):
+        super(CompiledLevelBasedFormatter, self).__init__(
+            level_formats, datefmt, *args, **kwargs)
+        self._compile()
+
+        if datefmt is None:
+            self._datefmt_parts = None
+        elif '%%' in datefmt:
+            # %%f is not a fraction; such formats are not cached.
+            self._datefmt_parts = False
+        else:
+            self._datefmt_parts = datefmt.split('%f')
+        # (second, formatted parts of datefmt)
+        self._second = (None, None)
+
+    def _compile(self):
+        # level: (function, uses_time, level formatter)
+        self.compiled = dict()
+        for level, formatter in self.formats.items():
+            function, uses_time = compile_format(formatter._fmt)
+            self.compiled[level] = (function, uses_time, formatter)
+        self.default_compiled = self.compiled['default']
+
+    def __getstate__(self):
+        # compiled functions are not picklable; listener processes compile
+        # their own.
+        state = self.__dict__.copy()
+        del state['compiled']
+        del state['default_compiled']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def formatTime(self, record, datefmt=None):
+        ''' Returns asctime as MicrosecondsDatetimeFormatter formats it with
+        this formatter's datefmt.
+        '''
+        parts = self._datefmt_parts
+        if parts is False:
+            return datetime.fromtimestamp(record.created).strftime(
+                self.datefmt)
+        # datetime.fromtimestamp rounds to microseconds half to even.
+        created = record.created
+        second = int(created)
+        usecs = round((created - second) * 1000000)
+        if usecs >= 1000000:
+            second += 1
+            usecs -= 1000000
+        cached = self._second
+        if cached[0] != second:
+            date = datetime.fromtimestamp(second)
+            if parts is None:
+                texts = (date.strftime("%Y-%m-%d %H:%M:%S"),)
+            else:
+                texts = tuple(date.strftime(part) for part in parts)
+            cached = self._second = (second, texts)
+        texts = cached[1]
+        if parts is None:
+            return "%s.%03d" % (texts[0], record.msecs)
+        if len(texts) == 1:
+            return texts[0]
+        return ('%06d' % usecs).join(texts)
+
+    def format(self, record):
+        function, uses_time, formatter = self.compiled.get(
+            record.levelno, self.default_compiled)
+        if function is None:
+            return formatter.format(record)
+
+        message = record.message = record.getMessage()
+        asctime = None
+        if uses_time:
+            asctime = record.asctime = self.formatTime(record)
+        s = function(record.__dict__, message, asctime)
+
+        # as logging.Formatter.format
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = formatter.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + formatter.formatStack(record.stack_info)
+        return s
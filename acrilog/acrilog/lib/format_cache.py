@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import logging
+
+
+class SharedFormatter(logging.Formatter):
+    ''' Formatter shared by the handlers a listener passes a record to, so
+    the record is formatted once rather than once per handler.
+
+    The text of the last record formatted is kept, and returned while the
+    same record is formatted again; format_bytes keeps its encoding the same
+    way.  Handlers of different listener threads may share it: a miss only
+    costs formatting again.
+    '''
+
+    def __init__(self, formatter):
+        '''
+        Args:
+            formatter: formatter to format records with.
+        '''
+        super(SharedFormatter, self).__init__()
+        self.formatter = formatter
+        self._clear()
+
+    @classmethod
+    def of(cls, formatter):
+        ''' Returns formatter wrapped in SharedFormatter, unless it already is
+        one (or None).
+        '''
+        if formatter is None or isinstance(formatter, SharedFormatter):
+            return formatter
+        return cls(formatter)
+
+    def _clear(self):
+        # (record, text) and (record, (terminator, encoding), data); the
+        # record reference keeps its id from being reused.
+        self._text = (None, None)
+        self._bytes = (None, None, None)
+
+    def format(self, record):
+        cached = self._text
+        if cached[0] is record:
+            return cached[1]
+        text = self.formatter.format(record)
+        self._text = (record, text)
+        return text
+
+    def format_bytes(self, record, terminator='\n', encoding='utf8'):
+        ''' Returns formatted record with terminator, encoded.
+        '''
+        key = (terminator, encoding)
+        cached = self._bytes
+        if cached[0] is record and cached[1] == key:
+            return cached[2]
+        data = (self.format(record) + terminator).encode(encoding)
+        self._bytes = (record, key, data)
+        return data
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_text'] = (None, None)
+        state['_bytes'] = (None, None, None)
+        return state
@@ -0,0 +1,138 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import logging
+from collections import OrderedDict
+
+
+class HandlerPool(object):
+    ''' Per key handlers, of which at most max_open are kept open.
+
+    When a new key would exceed the cap, handlers of the least recently used
+    key are flushed and closed.  The next record of an evicted key gets new
+    handlers from factory, which is told to reopen, i.e., to append to
+    existing files rather than truncate them.
+
+    Attributes:
+        hits: gets served by open handlers.
+        misses: gets that called factory.
+        evictions: keys whose handlers were closed to keep the cap.
+    '''
+
+    def __init__(self, factory, max_open=None, on_evict=None):
+        '''
+        Args:
+            factory: callable(key, reopen) returning handler or list of
+                handlers for key.
+            max_open: maximum number of keys with open handlers; None for no
+                limit.
+            on_evict: callable(key) called after handlers of key are closed.
+        '''
+        if max_open is not None and max_open < 1:
+            raise ValueError("max_open must be positive: {}.".format(max_open))
+        self.factory = factory
+        self.max_open = max_open
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._handlers = OrderedDict()
+        self._opened = set()
+
+    def __contains__(self, key):
+        return key in self._handlers
+
+    def __len__(self):
+        return len(self._handlers)
+
+    def values(self):
+        return self._handlers.values()
+
+    def get(self, key):
+        ''' Returns list of open handlers of key, creating them if needed.
+        '''
+        handlers = self._handlers.get(key)
+        if handlers is not None:
+            self.hits += 1
+            self._handlers.move_to_end(key)
+            return handlers
+
+        self.misses += 1
+        if self.max_open is not None:
+            while len(self._handlers) >= self.max_open:
+                self.evict(next(iter(self._handlers)))
+        handlers = self.factory(key, key in self._opened)
+        if isinstance(handlers, logging.Handler):
+            handlers = [handlers]
+        self._handlers[key] = handlers
+        self._opened.add(key)
+        return handlers
+
+    def touch(self, key):
+        ''' Marks key as recently used, for callers that keep handlers
+        returned by get.
+        '''
+        if key in self._handlers:
+            self.hits += 1
+            self._handlers.move_to_end(key)
+
+    def evict(self, key):
+        ''' Flushes and closes handlers of key.
+        '''
+        handlers = self._handlers.pop(key, None)
+        if handlers is None:
+            return
+        for handler in handlers:
+            handler.flush()
+            handler.close()
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def remove(self, handler):
+        ''' Removes handler from the keys holding it, without closing it.
+
+        Returns:
+            True if handler was found.
+        '''
+        found = False
+        for handlers in self._handlers.values():
+            while handler in handlers:
+                handlers.remove(handler)
+                found = True
+        return found
+
+    def stats(self):
+        ''' Returns dict of hits, misses, evictions, and number of open
+        keys.
+        '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'open': len(self._handlers)}
+
+    def close(self):
+        ''' Flushes and closes all handlers.
+        '''
+        for handlers in self._handlers.values():
+            for handler in handlers:
+                handler.flush()
+                handler.close()
+        self._handlers.clear()
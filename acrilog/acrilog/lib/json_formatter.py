@@ -0,0 +1,157 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import math
+import time
+import logging
+from json.encoder import encode_basestring
+from datetime import datetime
+
+
+# JSON has no nan or infinities; they are written as strings, as named by
+# JavaScript.
+_NON_FINITE = {'nan': '"NaN"', 'inf': '"Infinity"', '-inf': '"-Infinity"'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    ''' Formats records as JSON objects, one per line, holding selected
+    record fields.
+
+    Fields are selected by level, the same way LevelBasedFormatter selects
+    formats: level_fields maps level (or 'default') to field names.  Field
+    names are LogRecord attributes, and:
+        asctime: time formatted by datefmt (or as MicrosecondsDatetimeFormatter
+            does without datefmt).
+        message: record message with its arguments.
+    exc_text and stack_info are added when the record has them.
+
+    For each level, the key prefixes ('"name":', ',"other":') are built
+    once.  Strings are escaped by json's C encoder, numbers by repr; other
+    values are converted with str.  Floats that JSON cannot hold (nan and
+    infinities) are written as strings ("NaN", "Infinity", "-Infinity").
+    asctime is formatted once per second, only the fraction is formatted
+    per record.
+    '''
+
+    defaults = {
+        logging.DEBUG: ('asctime', 'levelname', 'host', 'processName',
+                        'message', 'module', 'funcName', 'lineno'),
+        'default': ('asctime', 'levelname', 'host', 'processName',
+                    'message'),
+        }
+
+    def __init__(self, level_fields={}, datefmt=None):
+        '''
+        Args:
+            level_fields: mapping of logging levels to field names; levels
+                not mapped use defaults.
+            datefmt: date format of asctime; may include %f.
+        '''
+        super(JsonLinesFormatter, self).__init__(datefmt=datefmt)
+        fields = dict(JsonLinesFormatter.defaults)
+        if level_fields:
+            fields.update(level_fields)
+        self.level_fields = fields
+        self.prefixes = dict((level, self._prefixes(names))
+                             for level, names in fields.items())
+        self.default_prefixes = self.prefixes['default']
+
+        # formats of text between fractions of second.
+        if datefmt is None:
+            self._second_fmts, self._fraction = \
+                ('%Y-%m-%d %H:%M:%S.',), 'msecs'
+        elif '%%' in datefmt:
+            # %%f is not a fraction; such formats are not cached.
+            self._second_fmts, self._fraction = None, 'datetime'
+        else:
+            self._second_fmts = tuple(datefmt.split('%f'))
+            self._fraction = 'usecs' if len(self._second_fmts) > 1 else None
+        # (second, texts between fractions)
+        self._second = (None, ('',))
+
+    @staticmethod
+    def _prefixes(names):
+        return tuple((('' if i == 0 else ',') + encode_basestring(name) +
+                      ':', name) for i, name in enumerate(names))
+
+    def formatTime(self, record, datefmt=None):
+        if self._fraction == 'datetime':
+            return datetime.fromtimestamp(record.created).strftime(
+                self.datefmt)
+        created = record.created
+        second = int(created)
+        # datetime.fromtimestamp rounds to microseconds half to even.
+        usecs = round((created - second) * 1000000)
+        if usecs >= 1000000:
+            second += 1
+            usecs -= 1000000
+        cached = self._second
+        if cached[0] != second:
+            struct_time = time.localtime(second)
+            cached = self._second = (second, tuple(
+                time.strftime(fmt, struct_time) if fmt else ''
+                for fmt in self._second_fmts))
+        if self._fraction is None:
+            return cached[1][0]
+        if self._fraction == 'msecs':
+            return '%s%03d' % (cached[1][0], record.msecs)
+        return ('%06d' % usecs).join(cached[1])
+
+    def format(self, record):
+        prefixes = self.prefixes.get(record.levelno, self.default_prefixes)
+        parts = ['{']
+        append = parts.append
+        record_dict = record.__dict__
+        for prefix, name in prefixes:
+            append(prefix)
+            if name == 'message':
+                value = record.getMessage()
+            elif name == 'asctime':
+                value = self.formatTime(record)
+            else:
+                value = record_dict.get(name)
+            if value.__class__ is str:
+                append(encode_basestring(value))
+            elif value is None:
+                append('null')
+            elif value.__class__ is int:
+                append(repr(value))
+            elif value.__class__ is float:
+                append(repr(value) if math.isfinite(value)
+                       else _NON_FINITE[repr(value)])
+            elif value.__class__ is bool:
+                append('true' if value else 'false')
+            else:
+                append(encode_basestring(str(value)))
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        separator = ',' if prefixes else ''
+        if record.exc_text:
+            append(separator + '"exc_text":' +
+                   encode_basestring(record.exc_text))
+            separator = ','
+        if record.stack_info:
+            append(separator + '"stack_info":' +
+                   encode_basestring(record.stack_info))
+        append('}')
+        return ''.join(parts)
@@ -0,0 +1,153 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import logging
+import multiprocessing as mp
+
+
+_UNUSED = -1
+
+
+class LevelControl(object):
+    ''' Logging levels, by logger name prefix, shared with child processes.
+
+    The table lives in shared memory together with a generation counter
+    that is incremented on every change.  Loggers attached to the table
+    read the counter when checking whether a level is enabled, and re-set
+    their level only when it changed; hence the cost per record is a single
+    shared integer read.
+
+    A prefix applies to the logger of that name and its descendants
+    (trailing '.*' is ignored); '' applies to all loggers.  The longest
+    matching prefix wins.
+
+    Must be passed to child processes as Process argument (e.g., in
+    logger_info).
+    '''
+
+    def __init__(self, slots=64, prefix_size=128):
+        '''
+        Args:
+            slots: maximum number of prefixes in table.
+            prefix_size: maximum size in bytes of a prefix.
+        '''
+        self.slots = slots
+        self.prefix_size = prefix_size
+        self._generation = mp.RawValue('L', 0)
+        self._levels = mp.RawArray('i', [_UNUSED] * slots)
+        self._prefixes = mp.RawArray('c', slots * prefix_size)
+        self._lock = mp.Lock()
+
+    @staticmethod
+    def _key(prefix):
+        if prefix.endswith('.*'):
+            prefix = prefix[:-2]
+        return '' if prefix == '*' else prefix
+
+    def _prefix(self, slot):
+        start = slot * self.prefix_size
+        return self._prefixes[start:start + self.prefix_size]\
+            .rstrip(b'\0').decode('utf8')
+
+    def _find(self, prefix):
+        for slot in range(self.slots):
+            if self._levels[slot] != _UNUSED and self._prefix(slot) == prefix:
+                return slot
+        return None
+
+    def set_level(self, prefix, level):
+        ''' sets level of loggers matching prefix.
+        '''
+        prefix = self._key(prefix)
+        encoded = prefix.encode('utf8')
+        if len(encoded) > self.prefix_size:
+            raise ValueError("Prefix longer than {} bytes: {}."
+                             .format(self.prefix_size, prefix))
+        if isinstance(level, str):
+            level = logging.getLevelName(level)
+        with self._lock:
+            slot = self._find(prefix)
+            if slot is None:
+                try:
+                    slot = list(self._levels).index(_UNUSED)
+                except ValueError:
+                    raise ValueError("Level table is full ({} prefixes)."
+                                     .format(self.slots))
+                start = slot * self.prefix_size
+                self._prefixes[start:start + self.prefix_size] = \
+                    encoded.ljust(self.prefix_size, b'\0')
+            self._levels[slot] = level
+            self._generation.value += 1
+
+    def reset_level(self, prefix):
+        ''' removes prefix; its loggers go back to their own level.
+        '''
+        prefix = self._key(prefix)
+        with self._lock:
+            slot = self._find(prefix)
+            if slot is not None:
+                self._levels[slot] = _UNUSED
+                self._generation.value += 1
+
+    def levels(self):
+        ''' Returns dict of prefix to level.
+        '''
+        return dict((self._prefix(slot), self._levels[slot])
+                    for slot in range(self.slots)
+                    if self._levels[slot] != _UNUSED)
+
+    def level_for(self, name, default=logging.NOTSET):
+        ''' Returns level of logger name according to table, or default if
+        no prefix matches.
+        '''
+        level, length = default, -1
+        for prefix, prefix_level in self.levels().items():
+            if (prefix == '' or name == prefix or
+                    name.startswith(prefix + '.')) and len(prefix) > length:
+                level, length = prefix_level, len(prefix)
+        return level
+
+    def attach(self, logger, default=logging.NOTSET):
+        ''' Makes logger follow the table.
+
+        Args:
+            logger: logger to attach.
+            default: level of logger when no prefix matches it.
+        '''
+        logger._level_control_default = default
+        logger._level_control_generation = None
+        if getattr(logger, '_level_control', None) is self:
+            return
+        logger._level_control = self
+
+        generation = self._generation
+        is_enabled_for = logging.Logger.isEnabledFor.__get__(logger)
+
+        def isEnabledFor(level):
+            current = generation.value
+            if current != logger._level_control_generation:
+                logger._level_control_generation = current
+                logger.setLevel(self.level_for(
+                    logger.name, logger._level_control_default))
+            return is_enabled_for(level)
+
+        logger.isEnabledFor = isEnabledFor
@@ -0,0 +1,319 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import json
+import time
+import logging
+import threading as th
+from acrilog.lib.format_cache import SharedFormatter
+
+
+# emit times are counted in buckets of powers of 2 microseconds; the last
+# bucket counts all longer ones.
+HISTOGRAM_BUCKETS = 22
+
+
+class StatsHandler(logging.Handler):
+    ''' Wraps a listener handler, counting the records it handled, their
+    size, and the time handling took, in a histogram.
+
+    Size is counted only when records are formatted by a SharedFormatter,
+    whose cache holds the text the handler produced; it is the size of the
+    formatted record with its terminator, counted once per record however
+    many files the handler writes it to.
+    '''
+
+    def __init__(self, handler, formatter=None):
+        '''
+        Args:
+            handler: handler to wrap.
+            formatter: formatter of handler's records, if not its own (e.g.,
+                hierarchical handlers pass it to their file handlers).
+        '''
+        super(StatsHandler, self).__init__(level=handler.level)
+        self.handler = handler
+        self.name = handler.get_name()
+        formatter = formatter if formatter is not None else handler.formatter
+        self.shared_formatter = formatter \
+            if isinstance(formatter, SharedFormatter) else None
+        self.records = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        self._stats_lock = th.Lock()
+
+    def handle(self, record):
+        start = time.perf_counter()
+        rv = self.handler.handle(record)
+        elapsed = time.perf_counter() - start
+        size = 0
+        if self.shared_formatter is not None:
+            handled = rv
+            if handled is None:
+                # handler does not tell (e.g., acrilib's hierarchical
+                # handler); it handles records its filters pass.
+                handled = self.handler.filter(record)
+            if handled:
+                size = len(self.shared_formatter.format(record)) + 1
+        bucket = min(int(elapsed * 1000000).bit_length(),
+                     HISTOGRAM_BUCKETS - 1)
+        with self._stats_lock:
+            self.records += 1
+            self.bytes += size
+            self.seconds += elapsed
+            if elapsed > self.max_seconds:
+                self.max_seconds = elapsed
+            self.histogram[bucket] += 1
+        return rv
+
+    def emit(self, record):
+        self.handle(record)
+
+    def flush(self):
+        self.handler.flush()
+
+    def close(self):
+        self.handler.close()
+        super(StatsHandler, self).close()
+
+    def snapshot(self):
+        ''' Returns dict of handler stats.
+
+        emit_time buckets are [upper bound in seconds, count] of non-empty
+        buckets; the last bucket has no upper bound (None).
+        '''
+        with self._stats_lock:
+            histogram = list(self.histogram)
+            records, size = self.records, self.bytes
+            seconds, max_seconds = self.seconds, self.max_seconds
+        buckets = [[(1 << bucket) / 1000000
+                    if bucket < HISTOGRAM_BUCKETS - 1 else None, count]
+                   for bucket, count in enumerate(histogram) if count]
+        return {
+            'handler': type(self.handler).__name__,
+            'name': self.name,
+            'records': records,
+            'bytes': size if self.shared_formatter is not None else None,
+            'emit_time': {
+                'total': seconds,
+                'mean': seconds / records if records else None,
+                'max': max_seconds,
+                'buckets': buckets,
+                },
+            }
+
+
+def open_files():
+    ''' Returns number of file descriptors open by this process, or None if
+    it cannot be told.
+    '''
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def queue_depth(queue):
+    ''' Returns dict with number of items (items), or bytes (bytes), waiting
+    in queue; None where the queue cannot tell.
+    '''
+    depth = {'items': None, 'bytes': None}
+    if hasattr(queue, 'pending_bytes'):
+        depth['bytes'] = queue.pending_bytes()
+    else:
+        try:
+            depth['items'] = queue.qsize()
+        except (NotImplementedError, AttributeError):
+            pass
+    return depth
+
+
+class ListenerStats(object):
+    ''' Stats of MpLogger listener, or SSHLogger server.
+
+    Handlers are instrumented by wrapping them with wrap(); records in and
+    out are counted by the listeners (RecordQueueListener's received and
+    dispatched), or, when there are none, by count().
+
+    start() starts a thread that samples record rates every second, serves
+    snapshot requests from a control connection (see request()), and
+    writes a snapshot to stats_file every interval seconds and when
+    stopped.
+    '''
+
+    def __init__(self, queues=()):
+        '''
+        Args:
+            queues: queues listener reads from.
+        '''
+        self.queues = list(queues)
+        self.listeners = list()
+        self.handlers = list()
+        self.received = 0
+        self.dispatched = 0
+        self.started = time.time()
+        # (time, records in, records out) at start of rate window, and
+        # rates of the last complete window.
+        self._previous = (self.started, 0, 0)
+        self._rates = (None, None)
+        self._lock = th.Lock()
+        self._stopped = th.Event()
+        self._thread = None
+        self._stats_file = None
+
+    def wrap(self, handler, formatter=None):
+        ''' Returns handler wrapped in StatsHandler.
+        '''
+        handler = StatsHandler(handler, formatter=formatter)
+        self.handlers.append(handler)
+        return handler
+
+    def count(self, records=1):
+        ''' counts records received and dispatched without listeners.
+        '''
+        with self._lock:
+            self.received += records
+            self.dispatched += records
+
+    def _records(self):
+        received, dispatched = self.received, self.dispatched
+        for listener in self.listeners:
+            received += listener.received
+            dispatched += listener.dispatched
+        return received, dispatched
+
+    def _sample(self, window=1.0):
+        now = time.time()
+        previous = self._previous
+        seconds = now - previous[0]
+        if seconds < window:
+            return
+        received, dispatched = self._records()
+        self._rates = ((received - previous[1]) / seconds,
+                       (dispatched - previous[2]) / seconds)
+        self._previous = (now, received, dispatched)
+
+    def snapshot(self):
+        ''' Returns dict of stats.
+
+        Rates are records per second over the last complete second the
+        stats thread sampled (None before start(), and in the first
+        second).
+        '''
+        now = time.time()
+        received, dispatched = self._records()
+        queue_full, rate_limited = 0, 0
+        for listener in self.listeners:
+            queue_full += sum(listener.dropped.values())
+            rate_limited += listener.suppressed
+        transport = sum(queue.dropped() for queue in self.queues
+                        if hasattr(queue, 'dropped'))
+        records_in_per_second, records_out_per_second = self._rates
+        return {
+            'pid': os.getpid(),
+            'time': now,
+            'uptime': now - self.started,
+            'queue_depth': [queue_depth(queue) for queue in self.queues],
+            'records_in': received,
+            'records_out': dispatched,
+            'records_in_per_second': records_in_per_second,
+            'records_out_per_second': records_out_per_second,
+            'dropped': {
+                'queue_full': queue_full,
+                'rate_limited': rate_limited,
+                'transport': transport,
+                },
+            'open_files': open_files(),
+            'handlers': [handler.snapshot() for handler in self.handlers],
+            }
+
+    def write(self, filename):
+        ''' writes snapshot to filename as JSON, replacing it atomically.
+        '''
+        temporary = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temporary, filename)
+
+    def _serve(self, connection, stats_file, interval):
+        next_write = time.time() + interval
+        while not self._stopped.is_set():
+            self._sample()
+            timeout = min(0.1, max(0, next_write - time.time()))
+            try:
+                if connection is not None and connection.poll(timeout):
+                    if connection.recv() is not None:
+                        connection.send(self.snapshot())
+                elif connection is None:
+                    self._stopped.wait(timeout)
+            except (EOFError, OSError):
+                connection = None
+            if stats_file and time.time() >= next_write:
+                self.write(stats_file)
+                next_write = time.time() + interval
+
+    def start(self, connection=None, stats_file=None, interval=60.0):
+        ''' starts thread serving requests from connection, and writing
+        stats_file.
+
+        Args:
+            connection: listener end of multiprocessing Pipe, or None.
+            stats_file: path of snapshot file, or None.
+            interval: seconds between snapshot file writes.
+        '''
+        self._stats_file = stats_file
+        self._thread = th.Thread(name='ListenerStats', target=self._serve,
+                                 args=(connection, stats_file, interval),
+                                 daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        ''' stops serving, and writes last snapshot to stats_file.
+        '''
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if self._stats_file:
+                self.write(self._stats_file)
+
+    @staticmethod
+    def request(connection, lock, timeout=5.0):
+        ''' Returns snapshot from listener serving the other end of
+        connection.
+
+        Args:
+            connection: requesting end of multiprocessing Pipe.
+            lock: serializing requests of this process.
+            timeout: seconds to wait for reply.
+        '''
+        with lock:
+            # replies to requests that timed out.
+            while connection.poll():
+                connection.recv()
+            connection.send('stats')
+            if not connection.poll(timeout):
+                raise TimeoutError("Listener did not reply to stats request "
+                                   "within {} seconds.".format(timeout))
+            return connection.recv()
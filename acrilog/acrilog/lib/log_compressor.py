@@ -0,0 +1,174 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import gzip
+import lzma
+import sys
+import shutil
+import logging
+import itertools
+import traceback
+import threading as th
+import concurrent.futures as cf
+
+
+# compression method: (file extension, open function)
+COMPRESSIONS = {
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open),
+    }
+
+
+class LogCompressor(object):
+    ''' Compresses rotated log files on worker threads.
+
+    Provides namer and rotator for rotating handlers (see
+    logging.handlers.BaseRotatingHandler): namer adds the compression
+    extension to backup names, so retention by backupCount applies to
+    compressed backups.  rotator only renames the closed segment aside
+    (backup name without extension) and queues it; a worker compresses it
+    into the backup name and removes the segment.
+
+    rotator suits handlers whose rollovers are far apart: the backups a
+    rollover shifts by name must have been compressed already.  rollover
+    leaves shifting to the worker as well, so a handler need not wait.
+
+    zlib and lzma release the GIL while compressing, hence worker threads
+    do not hold the listener threads.
+    '''
+
+    def __init__(self, method='gzip', workers=1):
+        '''
+        Args:
+            method: one of COMPRESSIONS.
+            workers: number of compressing threads.
+        '''
+        if method not in COMPRESSIONS:
+            raise ValueError("Unknown compression: {}.".format(method))
+        self.method = method
+        self.extension, self._open = COMPRESSIONS[method]
+        self._executor = cf.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='LogCompressor')
+        self._pending = dict()
+        # latest rollover queued, by file.
+        self._rollovers = dict()
+        self._serial = itertools.count()
+        self._lock = th.Lock()
+
+    def namer(self, name):
+        return name + self.extension
+
+    def rotator(self, source, dest):
+        segment = dest[:-len(self.extension)] \
+            if dest.endswith(self.extension) else dest
+        os.rename(source, segment)
+        with self._lock:
+            future = self._executor.submit(self._compress, segment, dest)
+            self._pending.setdefault(source, set()).add(future)
+        future.add_done_callback(
+            lambda future: self._done(source, future))
+
+    def rollover(self, filename, backup_count):
+        ''' Rolls closed file over the way RotatingFileHandler does, without
+        waiting for earlier compressions.
+
+        filename, and its time index if any, are renamed aside to a unique
+        segment name at once.  A worker then shifts backups .1 .. .N-1 (and
+        their indexes) by one, and compresses the segment into backup .1.
+        Rollovers of a file are carried out in the order they were queued.
+
+        Args:
+            filename: file to roll over; the handler reopens it.
+            backup_count: number of backups kept; must be positive.
+        '''
+        # time_index builds on this module.
+        from acrilog.lib.time_index import index_filename
+        segment = '{}.rolled-{}'.format(filename, next(self._serial))
+        os.rename(filename, segment)
+        if os.path.exists(index_filename(filename)):
+            os.rename(index_filename(filename), index_filename(segment))
+        with self._lock:
+            future = self._executor.submit(
+                self._rollover, filename, segment, backup_count,
+                self._rollovers.get(filename))
+            self._rollovers[filename] = future
+            self._pending.setdefault(filename, set()).add(future)
+        future.add_done_callback(
+            lambda future: self._done(filename, future))
+
+    def _rollover(self, filename, segment, backup_count, previous):
+        from acrilog.lib.time_index import index_filename
+        if previous is not None:
+            # queued before this one, hence already taken by a worker.
+            cf.wait([previous])
+        for i in range(backup_count - 1, 0, -1):
+            source = '{}.{}'.format(filename, i)
+            dest = '{}.{}'.format(filename, i + 1)
+            if os.path.exists(self.namer(source)):
+                os.replace(self.namer(source), self.namer(dest))
+            if os.path.exists(index_filename(source)):
+                os.replace(index_filename(source), index_filename(dest))
+        backup = filename + '.1'
+        self._compress(segment, self.namer(backup))
+        if os.path.exists(index_filename(segment)):
+            os.replace(index_filename(segment), index_filename(backup))
+
+    def _done(self, source, future):
+        with self._lock:
+            pending = self._pending.get(source)
+            if pending is not None:
+                pending.discard(future)
+                if not pending:
+                    del self._pending[source]
+            if self._rollovers.get(source) is future:
+                del self._rollovers[source]
+        error = future.exception()
+        if error is not None and logging.raiseExceptions:
+            # same as logging.Handler.handleError; the segment is left
+            # uncompressed.
+            traceback.print_exception(type(error), error,
+                                      error.__traceback__, file=sys.stderr)
+
+    def _compress(self, segment, dest):
+        temp = dest + '.tmp'
+        with open(segment, 'rb') as fsrc, self._open(temp, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+        os.replace(temp, dest)
+        os.remove(segment)
+
+    def wait(self, source=None):
+        ''' waits for queued compressions of source file (or of all files if
+        None) to complete.
+        '''
+        with self._lock:
+            if source is None:
+                futures = [future for pending in self._pending.values()
+                           for future in pending]
+            else:
+                futures = list(self._pending.get(source, ()))
+        cf.wait(futures)
+
+    def shutdown(self):
+        ''' completes queued compressions and stops workers.
+        '''
+        self._executor.shutdown(wait=True)
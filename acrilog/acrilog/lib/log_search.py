@@ -0,0 +1,308 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Searches log directories written by hierarchical file handlers.
+
+Files of a log directory are named [file_prefix.]key[.file_suffix].log, with
+backups .N (possibly compressed, see log_compressor).  Hierarchical handlers
+log record of key A.B.C into A, A.B, and A.B.C; hence by default only the
+top keys (those with no ancestor file) are searched, so each record is found
+once.
+
+Segments are searched in parallel by a process pool: plain files are mapped
+(mmap) and searched by a bytes regular expression, a chunk of lines at a
+time; compressed files are decompressed into memory first; binary log files
+(see binary_log) are rendered as text and searched line by line.  Matches of
+each key are streamed in segment order, as few chunks ahead of the consumer
+as keep the workers busy, and merged across keys by record time.
+'''
+
+import os
+import re
+import mmap
+import heapq
+import fnmatch
+import collections
+import concurrent.futures as cf
+from datetime import datetime
+from acrilog.lib.log_compressor import COMPRESSIONS
+from acrilog.lib.binary_log import is_binary_log, read_records
+
+
+# BaseLogger's default; baselogger imports acrilib.
+DEFAULT_DATEFMT = '%Y-%m-%d,%H:%M:%S.%f'
+
+# bytes of plain file searched by a task.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# regular expressions of strftime directives, to find time in lines.
+_DIRECTIVES = {
+    'Y': r'\d{4}', 'y': r'\d{2}', 'm': r'\d{1,2}', 'd': r'\d{1,2}',
+    'H': r'\d{1,2}', 'I': r'\d{1,2}', 'M': r'\d{1,2}', 'S': r'\d{1,2}',
+    'f': r'\d{1,6}', 'j': r'\d{1,3}', 'p': r'[AaPp][Mm]',
+    'b': r'[A-Za-z]{3}', 'a': r'[A-Za-z]{3}', 'B': r'[A-Za-z]+',
+    'A': r'[A-Za-z]+', 'z': r'[+-]\d{4}', 'Z': r'[A-Za-z]*', '%': '%',
+    }
+
+
+def datefmt_pattern(datefmt):
+    ''' Returns regular expression (str) matching times formatted by
+    datefmt.
+    '''
+    pattern = list()
+    chars = iter(datefmt)
+    for char in chars:
+        if char == '%':
+            directive = next(chars, '')
+            if directive not in _DIRECTIVES:
+                raise ValueError("Unsupported date format directive: %{}."
+                                 .format(directive))
+            pattern.append(_DIRECTIVES[directive])
+        else:
+            pattern.append(re.escape(char))
+    return ''.join(pattern)
+
+
+def log_files(logdir, file_prefix=None, file_suffix=None, keys=None,
+              separator='.'):
+    ''' Returns dict of key to its files, oldest first.
+
+    Args:
+        logdir: log directory.
+        file_prefix, file_suffix: as given to logger.
+        keys: list of key patterns (fnmatch); default top keys.
+        separator: of key hierarchy; None if keys are not hierarchical.
+    '''
+    pattern = re.compile(r'^{}(?P<key>.+?){}\.log(?:\.(?P<n>\d+))?(?:{})?$'
+                         .format(re.escape(file_prefix + '.')
+                                 if file_prefix else '',
+                                 re.escape('.' + file_suffix)
+                                 if file_suffix else '',
+                                 '|'.join(re.escape(extension) for extension, _
+                                          in COMPRESSIONS.values())))
+    found = dict()
+    for entry in os.listdir(logdir):
+        match = pattern.match(entry)
+        if match is None:
+            continue
+        # current file sorts last.
+        n = int(match.group('n')) if match.group('n') else 0
+        found.setdefault(match.group('key'), list()).append(
+            (-n, os.path.join(logdir, entry)))
+
+    if keys:
+        selected = [key for key in found
+                    if any(fnmatch.fnmatchcase(key, pattern)
+                           for pattern in keys)]
+    elif separator:
+        selected = [key for key in found
+                    if not any(key.startswith(other + separator)
+                               for other in found)]
+    else:
+        selected = list(found)
+    return dict((key, [name for _, name in sorted(found[key])])
+                for key in sorted(selected))
+
+
+def _open(filename):
+    for extension, open_ in COMPRESSIONS.values():
+        if filename.endswith(extension):
+            return open_(filename, 'rb'), True
+    return open(filename, 'rb'), False
+
+
+def _time_of(line, time_re, datefmt, previous):
+    match = time_re.search(line)
+    if match is None:
+        return previous
+    try:
+        return datetime.strptime(match.group().decode('ascii'),
+                                 datefmt).timestamp()
+    except ValueError:
+        return previous
+
+
+def _search_text(data, pattern_re, time_re, datefmt, start=0, stop=None):
+    ''' searches lines starting in data[start:stop].
+    '''
+    matches = list()
+    created = float('-inf')
+    size = len(data)
+    pos = data.find(b'\n', start - 1) + 1 if start else 0
+    if pos == 0 and start:
+        # no line starts in range.
+        return matches
+    if stop is not None and stop < size:
+        # up to the end of the line holding stop - 1.
+        size = data.find(b'\n', stop - 1)
+        if size < 0:
+            size = len(data)
+    while pos < size:
+        match = pattern_re.search(data, pos, size)
+        if match is None:
+            break
+        start = data.rfind(b'\n', 0, match.start()) + 1
+        end = data.find(b'\n', match.end())
+        if end < 0:
+            end = size
+        line = data[start:end]
+        created = _time_of(line, time_re, datefmt, created)
+        matches.append((created, line))
+        pos = end + 1
+    return matches
+
+
+def _search_binary(stream, pattern_re, level_formats, datefmt):
+    from acrilog.lib.binary_log import text_formatter
+    formatter = text_formatter(level_formats, datefmt)
+    matches = list()
+    for record in read_records(stream):
+        text = formatter.format(record).encode('utf8')
+        for line in text.split(b'\n'):
+            if pattern_re.search(line):
+                matches.append((record.created, line))
+    return matches
+
+
+def search_segment(filename, pattern, flags=0, datefmt=None,
+                   level_formats=None, start=0, end=None):
+    ''' Returns list of (time, line) of file lines matching pattern.
+
+    Lines without time take the time of the line matched before them, or
+    -inf.
+
+    Args:
+        filename: log file, compressed or not.
+        pattern: regular expression (bytes or str).
+        flags: re flags.
+        datefmt: date format of records; default BaseLogger's.
+        level_formats: formats to render binary log files with.
+        start, end: byte range of plain text file; lines starting in it are
+            searched.  Compressed and binary files are searched whole.
+    '''
+    if datefmt is None:
+        datefmt = DEFAULT_DATEFMT
+    if isinstance(pattern, str):
+        pattern = pattern.encode('utf8')
+    pattern_re = re.compile(pattern, flags)
+    time_re = re.compile(datefmt_pattern(datefmt).encode('ascii'))
+    stream, compressed = _open(filename)
+    try:
+        if is_binary_log(stream.read(8)):
+            stream.seek(0)
+            return _search_binary(stream, pattern_re, level_formats, datefmt)
+        stream.seek(0)
+        if compressed:
+            return _search_text(stream.read(), pattern_re, time_re, datefmt)
+        if os.fstat(stream.fileno()).st_size == 0:
+            return list()
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _search_text(data, pattern_re, time_re, datefmt, start,
+                                end)
+    finally:
+        stream.close()
+
+
+def _chunks(filename, chunk_size):
+    ''' Returns list of (start, end) byte ranges to search filename by.
+    '''
+    stream, compressed = _open(filename)
+    try:
+        if compressed or is_binary_log(stream.read(8)):
+            return [(0, None)]
+        size = os.fstat(stream.fileno()).st_size
+    finally:
+        stream.close()
+    starts = list(range(0, size, chunk_size)) or [0]
+    # the last one takes what is written meanwhile.
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def search(logdir, pattern, file_prefix=None, file_suffix=None, keys=None,
+           separator='.', flags=0, datefmt=None, level_formats=None,
+           workers=None, untimed=None, chunk_size=CHUNK_SIZE):
+    ''' Generates (time, key, line) of lines matching pattern in log files
+    of logdir, merged by time.
+
+    Args:
+        logdir, file_prefix, file_suffix, keys, separator: select files as in
+            log_files.
+        pattern, flags, datefmt, level_formats: as in search_segment.
+        workers: number of searching processes; default number of CPUs.
+        untimed: callable(filename) called for files with matches but no
+            time found in them (e.g., datefmt does not match their
+            records); their lines are merged first.
+        chunk_size: bytes of plain file searched by a task.  At most
+            workers tasks of a key are ahead of the consumer, so memory
+            does not grow with matches.
+    '''
+    files = log_files(logdir, file_prefix=file_prefix,
+                      file_suffix=file_suffix, keys=keys,
+                      separator=separator)
+    if not files:
+        return
+    executor = cf.ProcessPoolExecutor(max_workers=workers)
+    ahead = workers or os.cpu_count() or 1
+    try:
+        def tasks(key):
+            for filename in files[key]:
+                chunks = _chunks(filename, chunk_size)
+                for i, (start, end) in enumerate(chunks):
+                    yield filename, i == len(chunks) - 1, start, end
+
+        def matches(key):
+            queued = tasks(key)
+            pending = collections.deque()
+
+            def submit():
+                for filename, last, start, end in queued:
+                    pending.append((filename, last, executor.submit(
+                        search_segment, filename, pattern, flags, datefmt,
+                        level_formats, start, end)))
+                    break
+
+            for _ in range(ahead):
+                submit()
+            created = float('-inf')
+            found = False
+            while pending:
+                filename, last, future = pending.popleft()
+                submit()
+                for line_created, line in future.result():
+                    # time of chunk's lines before its first time.
+                    if line_created == float('-inf'):
+                        line_created = created
+                    created = line_created
+                    found = True
+                    yield created, key, line
+                if last:
+                    if untimed is not None and found and \
+                            created == float('-inf'):
+                        untimed(filename)
+                    created = float('-inf')
+                    found = False
+
+        for match in heapq.merge(*[matches(key) for key in files],
+                                 key=lambda match: match[0]):
+            yield match
+    finally:
+        # consumer may stop early (e.g., output pipe closed).
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,181 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import mmap
+import struct
+from acrilog.lib.buffered_file_handler import BufferedFileHandler
+
+
+# sidecar file holding the tail of a log file while it is mapped.
+TAIL_SUFFIX = '.tail'
+TAIL_MAGIC = b'ACRLTAIL'
+_TAIL = struct.Struct('<8sQ')
+
+
+def recover_tail(filename):
+    ''' Truncates log file left mapped by a process that did not close it
+    (e.g., crashed) to the length recorded in its sidecar, and removes the
+    sidecar.
+
+    Returns:
+        True if file was recovered.
+    '''
+    tail_name = filename + TAIL_SUFFIX
+    try:
+        with open(tail_name, 'rb') as tail_file:
+            magic, tail = _TAIL.unpack(tail_file.read(_TAIL.size))
+    except (OSError, struct.error):
+        return False
+    recovered = False
+    if magic == TAIL_MAGIC:
+        try:
+            if tail <= os.stat(filename).st_size:
+                os.truncate(filename, tail)
+                recovered = True
+        except OSError:
+            pass
+    os.remove(tail_name)
+    return recovered
+
+
+class _MmapStream(object):
+    ''' Log file mapped into memory, grown by segment_size.
+
+    The file is extended (with zeros) ahead of the data, and tail points at
+    the end of the data.  tail is kept in a mapped sidecar file, hence
+    recorded without system call; close truncates the file to tail and
+    removes the sidecar.
+    '''
+
+    def __init__(self, filename, segment_size):
+        self.filename = filename
+        self.segment_size = segment_size
+        recover_tail(filename)
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+        self.tail = os.fstat(self._fd).st_size
+
+        tail_fd = os.open(filename + TAIL_SUFFIX,
+                          os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(tail_fd, _TAIL.size)
+            self._header = mmap.mmap(tail_fd, _TAIL.size)
+        finally:
+            os.close(tail_fd)
+        _TAIL.pack_into(self._header, 0, TAIL_MAGIC, self.tail)
+
+        self._map = None
+        self.length = 0
+        self._extend(0)
+
+    def _extend(self, size):
+        segments = (self.tail + size) // self.segment_size + 1
+        length = segments * self.segment_size
+        if self._map is not None:
+            self._map.close()
+        os.ftruncate(self._fd, length)
+        self._map = mmap.mmap(self._fd, length)
+        self.length = length
+
+    def fileno(self):
+        return self._fd
+
+    def write_chunks(self, chunks, size):
+        if self.tail + size > self.length:
+            self._extend(size)
+        pos = self.tail
+        map_ = self._map
+        for chunk in chunks:
+            end = pos + len(chunk)
+            map_[pos:end] = chunk
+            pos = end
+        self.tail = pos
+        _TAIL.pack_into(self._header, 0, TAIL_MAGIC, pos)
+
+    def sync(self):
+        self._map.flush()
+        os.fsync(self._fd)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._fd is None:
+            return
+        self._map.close()
+        os.ftruncate(self._fd, self.tail)
+        os.close(self._fd)
+        self._fd = None
+        self._header.close()
+        os.remove(self.filename + TAIL_SUFFIX)
+
+
+class MmapFileHandler(BufferedFileHandler):
+    ''' BufferedFileHandler that copies records into a memory map of the
+    file instead of writing them.
+
+    The file is preallocated in segments of segment_size bytes; on close and
+    on rollover it is truncated to its data.  While open, a sidecar file
+    (file name + TAIL_SUFFIX) records the data length, and opening the file
+    again after a crash truncates it accordingly (see recover_tail).
+
+    Rollover (maxBytes, when) is as in BufferedFileHandler.
+    '''
+
+    def __init__(self, filename, *args, segment_size=8 * 1024 * 1024,
+                 delay=False, **kwargs):
+        '''
+        Args:
+            filename, args, kwargs: as in BufferedFileHandler.
+            segment_size: bytes the file is extended by when full.
+        '''
+        if segment_size < mmap.ALLOCATIONGRANULARITY:
+            raise ValueError("segment_size must be at least {}: {}."
+                             .format(mmap.ALLOCATIONGRANULARITY,
+                                     segment_size))
+        self.segment_size = segment_size
+        # base class sizes the file, and opens its time index, by it; a
+        # crashed file holds preallocated zeros past its data.
+        recover_tail(os.path.abspath(filename))
+        # the base classes open file in text mode unless delayed.
+        super(MmapFileHandler, self).__init__(filename, *args, delay=True,
+                                              **kwargs)
+        self.delay = delay
+        if not delay:
+            self.stream = self._open()
+            self._size = self._file_size()
+
+    def _open(self):
+        return _MmapStream(self.baseFilename, self.segment_size)
+
+    def _file_size(self):
+        if self.stream is not None:
+            return self.stream.tail
+        return super(MmapFileHandler, self)._file_size()
+
+    def _write_chunks(self, chunks):
+        self.stream.write_chunks(chunks, self._buffered)
+
+    def _fsync(self, now):
+        self.stream.sync()
+        self._last_fsync = now
+        self._unsynced = False
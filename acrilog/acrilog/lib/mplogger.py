@@ -20,33 +20,40 @@
 #
 ##############################################################################
 
+import os
+import queue
 import logging
 import signal
+import weakref
+import threading as th
 from logging.handlers import QueueListener, QueueHandler
 import multiprocessing as mp
-from acrilog.lib.baselogger import BaseLogger, create_stream_handler, get_file_handler
+# registers Connection reducers before 'thread' mode pickles its first queue.
+import multiprocessing.queues
+from acrilog.lib.baselogger import BaseLogger, create_stream_handler, get_file_handler, console_formatter
+from acrilog.lib.format_cache import SharedFormatter
+from acrilog.lib.repeat_aggregator import RepeatAggregator
+from acrilog.lib.mpqueue_handler import MpQueueHandler
+from acrilog.lib.shm_queue import SharedMemoryQueue
+from acrilog.lib.queue_listener import RecordQueueListener
+from acrilog.lib.threaded_handler import ThreadedHandler
+from acrilog.lib.async_listener import AsyncLogListener
+from acrilog.lib.level_control import LevelControl
+from acrilog.lib.rate_limit import RateLimitFilter
+from acrilog.lib.listener_stats import ListenerStats
+from acrilog.lib.handler_pool import HandlerPool
+from acrilog.lib.buffered_file_handler import create_hierarchical_handler
 # from acrilib import LoggerAddHostFilter
-from acrilib import logging_record_add_host, HierarchicalTimedSizedRotatingHandler
+from acrilib import logging_record_add_host
 # import threading as th
 
-
-class _QueueListener(QueueListener):
-    def __init__(self, started, *args, **kwargs):
-        super(_QueueListener, self).__init__(*args, **kwargs)
-        started.set()
-
-    def dequeue(self, block,):
-        ''' adding capture to EOF
-        '''
-        try:
-            item = self.queue.get(block)
-        except EOFError:
-            item = None
-        return item
+# seconds the listener process waits, once aborted, to read records
+# MpLogger.stop put before its sentinel.
+STOP_DRAIN_TIMEOUT = 5.0
 
 
 class MpQueueListener(QueueListener):
-    def __init__(self, queue, name=None, logging_level=logging.INFO, logdir=None, formatter=None, process_key=['processName'], global_handlers=[], **kwargs):
+    def __init__(self, queue, name=None, logging_level=logging.INFO, logdir=None, formatter=None, process_key=['processName'], global_handlers=[], max_open_files=None, **kwargs):
         super(MpQueueListener, self).__init__(queue, *global_handlers)
         """ Initialize an instance with the specified queue and
         handlers.
@@ -57,10 +64,14 @@ class MpQueueListener(QueueListener):
                 handlers that don't have any key are classified as global handlers.
                 if record doens't have any matching key, global handlers will be used.
                 if records match, only matching handlers will be used. 
+            max_open_files: maximum number of process key values with open
+                file handlers; least recently used are closed, and reopened
+                in append mode on their next record.  None for no limit.
         """
         self.process_key = process_key
         self.logdir = logdir
-        self.formatter = formatter
+        # key handlers share formatter, hence format a record once.
+        self.formatter = SharedFormatter.of(formatter)
         self.name = name
         self.kwargs = kwargs
 
@@ -70,54 +81,104 @@ class MpQueueListener(QueueListener):
         self.global_handlers = global_handlers
         self.console_handlers = list()
         self.logging_level = logging_level
+        self.handler_pool = HandlerPool(self._open_handlers, max_open=max_open_files, on_evict=self._evicted)
+        self._handler_names = dict()
+        self._routes = dict()
 
-    def handle(self, record):
-        """ Override handle a record.
-        This just loops through the handlers offering them the record
-        to handle.
-        Args:
-            record: The record to handle.
-        """
+    def _open_handlers(self, key, reopen):
+        kwargs = self.kwargs
+        if reopen:
+            kwargs = dict(kwargs, file_mode='a')
+        return get_file_handler(logging_level=self.logging_level, logdir=self.logdir, name=self._handler_names[key], formatter=self.formatter, **kwargs)
 
-        # Find handlers that match process keys
+    def _evicted(self, key):
+        process_key, record_key = key
+        index = self.process_key.index(process_key)
+        for route_key in [route_key for route_key in self._routes if route_key[index] == record_key]:
+            del self._routes[route_key]
+
+    def _route(self, record):
+        """ Builds route of records with the same process key values.
+
+        Returns:
+            tuple of (handler, level) pairs, in order and without repeats,
+            and tuple of handler pool keys used.
+        """
         handlers = list()
+        pool_keys = list()
         record_name = record.__dict__.get('name', None)
         for process_key in self.process_key:
             record_key = record.__dict__.get(process_key, None)
-            # print('record_key[process_key]: %s[%s]' %(record_key, process_key))
-            # print('record_key[processName]: %s' %(repr(record.__dict__)))
-            if record_key: 
+            if record_key:
                 process_handlers = self.key_handlers[process_key]
                 key_handlers = process_handlers.get(record_key, [])
 
-                # avoid getting dedicated handler in special case when in consolidated mode and record with 
+                # avoid getting dedicated handler in special case when in consolidated mode and record with
                 # name equal to the global one (QueueListiner name)
                 need_handler = len(key_handlers) ==0 and (record_key != self.name or len(self.global_handlers) ==0)
                 if need_handler:
-                    name = record_name
-                    # file_prefix=self.kwargs.get('file_prefix')
-                    # if file_prefix is None: file_prefix=name
-                    # print('file_prefix, record_key, record_name:', file_prefix, record_key, record_name)
-                    if record_name != record_key:
-                        name = "%s.%s" % (name, record_key)
-                    key_handlers = get_file_handler(logging_level=self.logging_level, logdir=self.logdir, process_key=name, formatter=self.formatter, **self.kwargs)
-                    process_handlers[record_key] = key_handlers
+                    pool_key = (process_key, record_key)
+                    if pool_key not in self._handler_names:
+                        name = record_name
+                        if record_name != record_key:
+                            name = "%s.%s" % (name, record_key)
+                        self._handler_names[pool_key] = name
+                    key_handlers = self.handler_pool.get(pool_key)
+                    pool_keys.append(pool_key)
                 handlers.extend(key_handlers)
 
-        if len(self.global_handlers) > 0:
-            handlers.extend(self.global_handlers)
+        handlers.extend(self.global_handlers)
+        handlers.extend(self.console_handlers)
 
-        if len(self.console_handlers) > 0:
-            handlers.extend(self.console_handlers)
+        route = list()
+        seen = set()
+        for handler in handlers:
+            if handler not in seen:
+                seen.add(handler)
+                route.append((handler, handler.level))
+        return tuple(route), tuple(pool_keys)
+
+    def handle(self, record):
+        """ Override handle a record.
+        This just loops through the handlers offering them the record
+        to handle.
+
+        Routes are cached by the record's process key values, and are
+        rebuilt only after handlers are added, removed, or evicted from
+        handler_pool.
+
+        Args:
+            record: The record to handle.
+        """
+        record_dict = record.__dict__
+        route_key = tuple([record_dict.get(process_key, None) for process_key in self.process_key])
+        try:
+            route, level, pool_keys = self._routes[route_key]
+            for pool_key in pool_keys:
+                self.handler_pool.touch(pool_key)
+        except KeyError:
+            route, pool_keys = self._route(record)
+            level = min([handler_level for _, handler_level in route], default=logging.CRITICAL + 1)
+            self._routes[route_key] = route, level, pool_keys
+
+        if record.levelno < level:
+            return
 
         record = self.prepare(record)
 
-        for handler in list(set(handlers)):
-            if record.levelno >= handler.level: # This check is not in the parent class
+        for handler, handler_level in route:
+            if record.levelno >= handler_level: # This check is not in the parent class
                 handler.handle(record)
 
+    def invalidate_routes(self):
+        """ Drops cached routes; needed only if handler levels are changed
+        after records were handled.
+        """
+        self._routes.clear()
+
     def addConsoleHandler(self, handler):
         self.console_handlers.append(handler)
+        self.invalidate_routes()
 
     def addHandler(self, handler):
         """
@@ -137,51 +198,135 @@ class MpQueueListener(QueueListener):
                 key_bind=True
         if not key_bind:
             self.global_handlers.append(handler)
+        self.invalidate_routes()
 
     def removeHandler(self, hdlr):
         """
         Remove the specified handler from this logger.
         """
-        if hdlr in self.handlers:
+        handler_lists = [self.global_handlers, self.console_handlers]
+        for process_handlers in self.key_handlers.values():
+            handler_lists.extend(process_handlers.values())
+        found = self.handler_pool.remove(hdlr)
+        for handlers in handler_lists:
+            while hdlr in handlers:
+                handlers.remove(hdlr)
+                found = True
+        if found:
             hdlr.close()
-            self.handlers.remove(hdlr)
+            self.invalidate_routes()
+
+
+def _create_handlers(handlers=[], logging_level=None, formatter=None,
+                     level_formats=None, datefmt=None, console=False,
+                     parallel_handlers=False, handler_queue_size=10000,
+                     repeat_window=None, repeat_max_keys=10000,
+                     max_open_files=None, stats=None, args=(), kwargs={},):
+    # file handlers of all levels of a key, and console, format a record
+    # once.
+    formatter = SharedFormatter.of(formatter)
+    hierarchical_handler = create_hierarchical_handler(
+        *args, formatter=formatter, max_open_files=max_open_files, **kwargs)
+    handlers = handlers + [hierarchical_handler]
+
+    if console:
+        console_handlers = \
+            create_stream_handler(logging_level=logging_level,
+                                  level_formats=level_formats, datefmt=datefmt,
+                                  formatter=console_formatter(formatter))
+        handlers.extend(console_handlers)
+
+    if stats is not None:
+        # innermost, so emit time is the handler's own.
+        handlers = [stats.wrap(handler, formatter=formatter
+                               if handler is hierarchical_handler else None)
+                    for handler in handlers]
+
+    if parallel_handlers:
+        # each handler is given its own worker thread, so a slow handler
+        # does not hold the others.
+        handlers = [ThreadedHandler(handler, maxsize=handler_queue_size)
+                    for handler in handlers]
+
+    if repeat_window:
+        handlers = [RepeatAggregator(*handlers, window=repeat_window,
+                                     max_keys=repeat_max_keys)]
+    return handlers
+
+
+def _create_listeners(name=None, queues=[], handlers=[], engine='threading',
+                      tcp_host=None, tcp_port=None):
+    if engine == 'asyncio':
+        # a single event loop serves all shards and the TCP intake.
+        async_listener = AsyncLogListener(*handlers, name=name)
+        for queue in queues:
+            async_listener.add_queue(queue)
+        if tcp_port:
+            async_listener.add_tcp(tcp_host, tcp_port)
+        return [async_listener]
+    # a drain thread per shard; all feed the same handlers, which
+    # serialize on their own locks.  A producer uses a single shard, so
+    # its records keep their order.
+    return [RecordQueueListener(None, queue, *handlers, name=name)
+            for queue in queues]
 
 
 def _start(name=None, loggerq=None, handlers=[], logging_level=None,
            formatter=None, level_formats=None, datefmt=None,
            console=False, started=None, abort=None, finished=None,
-           verbose=False,
-           args=(), kwargs={},):
+           verbose=False, shards=None, parallel_handlers=False,
+           handler_queue_size=10000, engine='threading', tcp_host=None,
+           tcp_port=None, repeat_window=None, repeat_max_keys=10000,
+           max_open_files=None, stats=False, stats_connection=None, stats_file=None,
+           stats_interval=60.0, args=(), kwargs={},):
     logger = logging.getLogger(name)
     logger.setLevel(logging_level)
     logging_record_add_host()
     # logger.addFilter(LoggerAddHostFilter())
 
-    handlers += [HierarchicalTimedSizedRotatingHandler(
-        *args, formatter=formatter, **kwargs)]
-
-    if console:
-        console_handlers = \
-            create_stream_handler(logging_level=logging_level,
-                                  level_formats=level_formats, datefmt=datefmt)
-        handlers.extend(console_handlers)
+    queues = shards if shards else [loggerq]
+    listener_stats = ListenerStats(queues) if stats else None
+    handlers = _create_handlers(
+        handlers=handlers, logging_level=logging_level, formatter=formatter,
+        level_formats=level_formats, datefmt=datefmt, console=console,
+        parallel_handlers=parallel_handlers,
+        handler_queue_size=handler_queue_size, repeat_window=repeat_window,
+        repeat_max_keys=repeat_max_keys, max_open_files=max_open_files,
+        stats=listener_stats, args=args, kwargs=kwargs)
 
     for handler in handlers:
         logger.addHandler(handler)
 
-    queue_listener = _QueueListener(started, loggerq, *handlers)
+    queue_listeners = _create_listeners(
+        name=name, queues=queues, handlers=handlers, engine=engine,
+        tcp_host=tcp_host, tcp_port=tcp_port)
+    if listener_stats is not None:
+        listener_stats.listeners = queue_listeners
+        listener_stats.start(stats_connection, stats_file, stats_interval)
 
     # queue_listener = LogRecordQueueListener(loggerq, verbose=verbose)
     if verbose:
         print('start_mplogger: starting listener.')
-    queue_listener.start()
-    # started.set()
+    for queue_listener in queue_listeners:
+        queue_listener.start()
+    started.set()
     if verbose:
         print('start_mplogger: listener started.')
     # return queue_listener
 
+    def stop_listeners():
+        for queue_listener in queue_listeners:
+            queue_listener.stop()
+        # closing completes files (e.g., truncates memory mapped ones); the
+        # process ends without logging shutdown.
+        for handler in handlers:
+            handler.flush()
+            handler.close()
+        if listener_stats is not None:
+            listener_stats.stop()
+
     def exit_gracefully(signo, stack_frame, *args, **kwargs):
-        queue_listener.stop()
+        stop_listeners()
         finished.set()
 
     # set exits
@@ -193,19 +338,89 @@ def _start(name=None, loggerq=None, handlers=[], logging_level=None,
     # looging shutdown therefore will not be called automatically.
     # therefore, shutdown needs to be explicit.
     abort.wait()
-    queue_listener.stop()
+    if engine != 'asyncio':
+        # MpLogger.stop put a sentinel after its records; reading them may
+        # lag behind abort, as they pass through the queue feeder thread.
+        for queue_listener in queue_listeners:
+            queue_listener.join(timeout=STOP_DRAIN_TIMEOUT)
+    stop_listeners()
     if verbose:
         print('start_mplogger: setting finished.')
     finished.set()
 
 
+class _ThreadModeQueue(object):
+    ''' Queue used by producers of MpLogger in 'thread' mode.
+
+    Puts go to an in-process SimpleQueue drained by a listener thread, until
+    the queue is about to be used by another process (fork, or pickling for
+    spawn).  Then MpLogger starts its listener process and the queue
+    forwards puts to that listener's multiprocessing queue.
+    '''
+
+    def __init__(self, promote):
+        '''
+        Args:
+            promote: weak method to call before the queue is used by another
+                process.
+        '''
+        self.local_queue = queue.SimpleQueue()
+        self._target = self.local_queue
+        self._promote = promote
+
+    def promote(self, target):
+        self._target = target
+
+    @property
+    def promoted(self):
+        return self._target is not self.local_queue
+
+    def put(self, item, block=True, timeout=None):
+        self._target.put(item, block, timeout)
+
+    def put_nowait(self, item):
+        self._target.put_nowait(item)
+
+    def get_nowait(self):
+        return self._target.get_nowait()
+
+    def __getstate__(self):
+        promote = self._promote() if self._promote is not None else None
+        if promote is not None:
+            promote()
+        return {'_target': self._target}
+
+    def __setstate__(self, state):
+        self._target = state['_target']
+        self.local_queue = None
+        self._promote = None
+
+
 class MpLogger(BaseLogger):
     ''' Builds Multiprocessing logger such all process share the same
     logging mechanism
     '''
 
+    transports = ('queue', 'shm')
+    engines = ('threading', 'asyncio')
+    modes = ('process', 'thread')
+
+    # logger_info entries that are only meaningful to processes started by
+    # this host's multiprocessing (e.g., cannot be passed over SSH).
+    local_info_keys = ('loggerq', 'shards', 'level_control')
+
     def __init__(self, name=None, logging_level=logging.INFO, handlers=[],
-                 verbose=False, *args, **kwargs):
+                 verbose=False, batch_size=1, batch_interval=0.5,
+                 transport='queue', transport_size=4 * 1024 * 1024,
+                 codec=None, shards=1, max_queue=0, queue_policy='block',
+                 drop_level=logging.WARNING, parallel_handlers=False,
+                 handler_queue_size=10000, engine='threading',
+                 tcp_host='localhost', tcp_port=None, level_control=False,
+                 defer_format=False, mode='process', repeat_window=None,
+                 repeat_max_keys=10000, rate_limits=None,
+                 rate_limit_interval=10.0, stats=False, stats_file=None,
+                 stats_interval=60.0, max_open_files=None,
+                 *args, **kwargs):
         '''Initiates MpLogger service
 
         Args:
@@ -216,12 +431,82 @@ class MpLogger(BaseLogger):
             level_formats: mapping of logging levels to formats to use for
                 constructing message
             datefmt: date format to use
+            level_fields: mapping of logging levels to record fields; when
+                set, files are written as JSON lines (JsonLinesFormatter)
+                instead of level_formats.
             process_key: list of record names that would be used to create
                 files
             console_name: when set, records assigned to process_key handler
                 will also routed to global handlers.
             encoding: used in defining file handlers; default 'ascii'
             handlers: list of global handlers
+            batch_size: number of records producers pack into a single
+                queue item; default 1 (no batching).
+            batch_interval: maximum seconds a record is held in a producer
+                batch before it is put on the queue.
+            transport: 'queue' (default) uses multiprocessing Queue; 'shm'
+                uses SharedMemoryQueue ring buffer.
+            transport_size: size in bytes of 'shm' ring buffer.
+            codec: None sends pickled LogRecords; 'compact' sends compact
+                tuples with per producer string table (see record_codec).
+            shards: number of queues, each drained by its own listener
+                thread; a producer process uses queue pid % shards.
+            max_queue: maximum number of items in queue ('queue' transport);
+                default 0 (unbounded).  'shm' transport is bounded by
+                transport_size.
+            queue_policy: what producers do when queue is full; one of
+                'block', 'drop_newest', 'drop_oldest', 'drop_below_level'.
+                Dropped records are reported by the listener.
+            drop_level: with 'drop_below_level', records at this level or
+                above are never dropped.
+            parallel_handlers: when set, listener passes records to each
+                handler through its own bounded queue and thread
+                (ThreadedHandler), so a slow handler delays only itself.
+            handler_queue_size: size of each handler queue with
+                parallel_handlers.
+            engine: listener implementation; 'threading' (default) drains
+                each queue with a QueueListener thread, 'asyncio' serves all
+                queues on a single event loop (AsyncLogListener).
+            tcp_host, tcp_port: with 'asyncio' engine, when tcp_port is set,
+                listener also accepts records over TCP as SSHLogger server
+                does; SSHLogger.get_logger(logger_info()) then connects to
+                it.
+            level_control: when set, levels of loggers returned by
+                get_logger, in all processes, can be changed at runtime with
+                set_level() (see LevelControl).
+            defer_format: when set, producers send message and its
+                arguments, and the listener merges them; records with
+                arguments that are not of simple types are formatted by
+                producer.
+            mode: 'process' (default) runs listener in a process of its
+                own; 'thread' runs it on threads of this process reading an
+                in-process queue, which is cheaper for single process
+                programs.  In 'thread' mode, the listener moves to a process
+                once logger_info is passed to (or inherited by) another
+                process; a single queue is used regardless of shards.
+            repeat_window: when set, listener collapses records repeating
+                the same logger, level and message template within
+                repeat_window seconds into periodic summaries (see
+                RepeatAggregator).
+            repeat_max_keys: maximum number of distinct repeating records
+                tracked.
+            rate_limits: list of rules (prefix, level, rate, burst, sample)
+                applied by producers before records are queued; e.g.,
+                ('acrilog.procly.*', logging.DEBUG, 200, 200, 0.01) passes
+                at most 200 DEBUG records per second of acrilog.procly
+                loggers, then samples 1% (see RateLimitFilter).
+                Suppressed records are reported by the listener.
+            rate_limit_interval: minimum seconds between a producer's
+                reports of suppressed records.
+            stats: when set, listener keeps stats of queues, records and
+                handlers, returned by stats() (see ListenerStats).
+            stats_file: when set (implies stats), listener writes stats to
+                this file, as JSON, every stats_interval seconds and when
+                stopped.
+            stats_interval: seconds between writes of stats_file.
+            max_open_files: when set, listener keeps at most this many log
+                files open; the least recently used is closed, and reopened
+                in append mode on its next record (see HandlerPool).
             kwargs: pass-through to hierarchical handler defining its policy
                 key='name'
                 separator='.'
@@ -243,16 +528,89 @@ class MpLogger(BaseLogger):
                                        logging_level=logging_level, **kwargs)
 
         self._queue_listener = None
+        self._queues = list()
+        self._thread_queue = None
+        self._thread_listeners = list()
+        self._thread_handlers = list()
+        self._promoting = False
+        self._promoter = None
+        self._pid = None
         self.abort = None
         self.logger_initialized = False
         self.handlers = handlers
         self.verbose = verbose
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        if transport not in MpLogger.transports:
+            raise ValueError("Unknown transport: {}.".format(transport))
+        self.transport = transport
+        self.transport_size = transport_size
+        self.codec = codec
+        self.shards = shards
+        if queue_policy not in MpQueueHandler.queue_policies:
+            raise ValueError("Unknown queue policy: {}.".format(queue_policy))
+        if queue_policy == 'drop_oldest' and \
+                (transport != 'queue' or codec is not None):
+            # taking an item off the queue is only possible with multiple
+            # consumers queue, and would lose definitions of compact codec.
+            raise ValueError("queue_policy 'drop_oldest' requires 'queue' "
+                             "transport without codec.")
+        self.max_queue = max_queue
+        self.queue_policy = queue_policy
+        self.drop_level = drop_level
+        self.parallel_handlers = parallel_handlers
+        self.handler_queue_size = handler_queue_size
+        if engine not in MpLogger.engines:
+            raise ValueError("Unknown engine: {}.".format(engine))
+        if tcp_port and engine != 'asyncio':
+            raise ValueError("tcp_port requires 'asyncio' engine.")
+        self.engine = engine
+        self.tcp_host = tcp_host
+        self.tcp_port = tcp_port
+        self.level_control = LevelControl() if level_control else None
+        self.defer_format = defer_format
+        if mode not in MpLogger.modes:
+            raise ValueError("Unknown mode: {}.".format(mode))
+        self.mode = mode
+        self.repeat_window = repeat_window
+        self.repeat_max_keys = repeat_max_keys
+        if rate_limits:
+            # validates rules.
+            RateLimitFilter(rate_limits)
+        self.rate_limits = rate_limits
+        self.rate_limit_interval = rate_limit_interval
+        self.collect_stats = bool(stats or stats_file)
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        if max_open_files is not None and max_open_files < 1:
+            raise ValueError("max_open_files must be positive: {}.".format(
+                max_open_files))
+        self.max_open_files = max_open_files
+        self._stats_connection = None
+        self._stats_lock = th.Lock()
+        self._thread_stats = None
+        self.loggerqs = list()
 
     def logger_info(self):
         info = super(MpLogger, self).logger_info()
         info.update({
                 'loggerq': self.loggerq,
+                'shards': self.loggerqs,
+                'batch_size': self.batch_size,
+                'batch_interval': self.batch_interval,
+                'codec': self.codec,
+                'queue_policy': self.queue_policy,
+                'drop_level': self.drop_level,
+                'level_control': self.level_control,
+                'defer_format': self.defer_format,
+                'rate_limits': self.rate_limits,
+                'rate_limit_interval': self.rate_limit_interval,
                })
+        if self.tcp_port:
+            info.update({
+                'host': self.tcp_host,
+                'port': self.tcp_port,
+                })
         return info
 
     @classmethod
@@ -264,19 +622,79 @@ class MpLogger(BaseLogger):
         # logger.addFilter(LoggerAddHostFilter())
         logging_record_add_host()
         loggerq = logger_info['loggerq']
+        shards = logger_info.get('shards')
+        if shards:
+            loggerq = shards[os.getpid() % len(shards)]
 
         # check logger has already proper handlers or not
         already_set = False
         for handler in logger.handlers:
             if isinstance(handler, QueueHandler):
+                if shards and handler.queue in shards:
+                    # inherited by forked child; move to child's own shard.
+                    handler.queue = loggerq
                 already_set = already_set or (handler.queue == loggerq)
 
         if not already_set:
-            queue_handler = QueueHandler(loggerq)
+            rate_limits = logger_info.get('rate_limits')
+            rate_limit = RateLimitFilter(
+                rate_limits, logger_info.get('rate_limit_interval', 10.0)) \
+                if rate_limits else None
+            queue_handler = MpQueueHandler(
+                loggerq, batch_size=logger_info.get('batch_size', 1),
+                batch_interval=logger_info.get('batch_interval', 0.5),
+                codec=logger_info.get('codec'),
+                queue_policy=logger_info.get('queue_policy', 'block'),
+                drop_level=logger_info.get('drop_level', logging.WARNING),
+                defer_format=logger_info.get('defer_format', False),
+                rate_limit=rate_limit)
             logger.addHandler(queue_handler)
 
+        level_control = logger_info.get('level_control')
+        if level_control is not None:
+            level_control.attach(logger, logger.level)
+
         return logger
 
+    def set_level(self, prefix, level):
+        ''' changes, at runtime, level of loggers matching name prefix in all
+        processes; requires level_control.
+        '''
+        if self.level_control is None:
+            raise RuntimeError("MpLogger was created without level_control.")
+        self.level_control.set_level(prefix, level)
+
+    def reset_level(self, prefix):
+        ''' returns loggers matching prefix to their original level.
+        '''
+        if self.level_control is None:
+            raise RuntimeError("MpLogger was created without level_control.")
+        self.level_control.reset_level(prefix)
+
+    def stats(self, timeout=5.0):
+        ''' Returns dict of listener stats (see ListenerStats.snapshot);
+        requires stats.
+
+        Args:
+            timeout: seconds to wait for listener process to reply.
+        '''
+        if not self.collect_stats:
+            raise RuntimeError("MpLogger was created without stats.")
+        if self._thread_stats is not None:
+            return self._thread_stats.snapshot()
+        if self._stats_connection is None or self._queue_listener is None \
+                or not self._queue_listener.is_alive():
+            raise RuntimeError("MpLogger listener is not running.")
+        return ListenerStats.request(self._stats_connection, self._stats_lock,
+                                     timeout=timeout)
+
+    def create_queue(self):
+        ''' creates queue for the selected transport.
+        '''
+        if self.transport == 'shm':
+            return SharedMemoryQueue(size=self.transport_size)
+        return mp.Queue(maxsize=self.max_queue)
+
     def start(self, name=None):
         ''' starts logger for multiprocessing using queue.
 
@@ -294,7 +712,19 @@ class MpLogger(BaseLogger):
 
         self.logger_initialized = True
 
-        self.loggerq = mp.Queue()
+        if self.mode == 'thread':
+            self._start_thread()
+        else:
+            self.loggerqs = [self.create_queue() for _ in range(self.shards)]
+            self.loggerq = self.loggerqs[0]
+            self._start_process(self.loggerqs, self.handler_kwargs)
+
+        logger_info = self.logger_info()
+        logger = MpLogger.get_logger(logger_info=logger_info, name=name)
+        return logger
+
+    def _start_process(self, queues, handler_kwargs):
+        self._queues = queues
 
         # self._manager = manager = mp.Manager()
         self.abort = mp.Event()
@@ -303,7 +733,8 @@ class MpLogger(BaseLogger):
 
         start_kwargs = {
             'name': self.name,
-            'loggerq': self.loggerq,
+            'loggerq': queues[0],
+            'shards': queues,
             'handlers': self.handlers,
             'logging_level': self.logging_level,
             'formatter': self.record_formatter,
@@ -314,9 +745,23 @@ class MpLogger(BaseLogger):
             'abort': self.abort,
             'finished': self.finished,
             'args': self.handler_args,
-            'kwargs': self.handler_kwargs,
+            'kwargs': handler_kwargs,
             'verbose': self.verbose,
+            'parallel_handlers': self.parallel_handlers,
+            'handler_queue_size': self.handler_queue_size,
+            'engine': self.engine,
+            'tcp_host': self.tcp_host,
+            'tcp_port': self.tcp_port,
+            'repeat_window': self.repeat_window,
+            'repeat_max_keys': self.repeat_max_keys,
+            'max_open_files': self.max_open_files,
+            'stats': self.collect_stats,
+            'stats_file': self.stats_file,
+            'stats_interval': self.stats_interval,
             }
+        if self.collect_stats:
+            self._stats_connection, start_kwargs['stats_connection'] = \
+                mp.Pipe()
 
         #self._queue_listener = _start(**start_kwargs)
 
@@ -328,9 +773,93 @@ class MpLogger(BaseLogger):
 
         started.wait()
 
-        logger_info = self.logger_info()
-        logger = MpLogger.get_logger(logger_info=logger_info, name=name)
-        return logger
+    def _start_thread(self):
+        ''' starts listener on threads of this process, reading from an
+        in-process queue.
+        '''
+        self._pid = os.getpid()
+        self._thread_queue = _ThreadModeQueue(weakref.WeakMethod(self._promote))
+        self.loggerq = self._thread_queue
+        self.loggerqs = [self.loggerq]
+
+        logging_record_add_host()
+        self._thread_stats = ListenerStats([self._thread_queue.local_queue]) \
+            if self.collect_stats else None
+        self._thread_handlers = _create_handlers(
+            handlers=self.handlers, logging_level=self.logging_level,
+            formatter=self.record_formatter, level_formats=self.level_formats,
+            datefmt=self.datefmt, console=self.console,
+            parallel_handlers=self.parallel_handlers,
+            handler_queue_size=self.handler_queue_size,
+            repeat_window=self.repeat_window,
+            repeat_max_keys=self.repeat_max_keys,
+            max_open_files=self.max_open_files, stats=self._thread_stats,
+            args=self.handler_args, kwargs=self.handler_kwargs)
+        self._thread_listeners = _create_listeners(
+            name=self.name, queues=[self._thread_queue.local_queue],
+            handlers=self._thread_handlers, engine=self.engine,
+            tcp_host=self.tcp_host, tcp_port=self.tcp_port)
+        for queue_listener in self._thread_listeners:
+            queue_listener.start()
+        if self._thread_stats is not None:
+            self._thread_stats.listeners = self._thread_listeners
+            self._thread_stats.start(None, self.stats_file,
+                                     self.stats_interval)
+
+        mplogger = weakref.ref(self)
+
+        def before_fork():
+            if mplogger() is not None:
+                mplogger()._promote()
+
+        os.register_at_fork(before=before_fork)
+
+    def _stop_thread(self):
+        for queue_listener in self._thread_listeners:
+            queue_listener.stop()
+        self._thread_listeners = list()
+        for handler in self._thread_handlers:
+            handler.flush()
+            handler.close()
+        self._thread_handlers = list()
+        if self._thread_stats is not None:
+            self._thread_stats.stop()
+            self._thread_stats = None
+
+    def _promote(self):
+        ''' moves 'thread' mode listener to a process, once other processes
+        are about to use the queue.
+        '''
+        thread_queue = self._thread_queue
+        if self._promoting or thread_queue is None or thread_queue.promoted \
+                or os.getpid() != self._pid:
+            return
+        self._promoting = True
+        try:
+            target = self.create_queue()
+            thread_queue.promote(target)
+            self._stop_thread()
+            # records put before promotion, but after listener stopped.
+            while True:
+                try:
+                    item = thread_queue.local_queue.get_nowait()
+                except queue.Empty:
+                    break
+                target.put(item)
+            # files were already opened by the thread listener.
+            handler_kwargs = dict(self.handler_kwargs, file_mode='a')
+            if mp.context.get_spawning_popen() is None:
+                self._start_process([target], handler_kwargs)
+            else:
+                # called while pickling arguments of a spawned process; a
+                # nested spawn would break passing of the outer process
+                # descriptors.  Records wait in target until it starts.
+                self._promoter = th.Thread(
+                    target=self._start_process,
+                    args=([target], handler_kwargs), daemon=True)
+                self._promoter.start()
+        finally:
+            self._promoting = False
 
     def __exit__(self):
         self.__del__()
@@ -338,14 +867,36 @@ class MpLogger(BaseLogger):
     def __del__(self):
         self.stop()
 
+    def flush(self):
+        ''' puts pending producer batches of this process on the queue.
+        '''
+        for logger in list(logging.Logger.manager.loggerDict.values()):
+            for handler in getattr(logger, 'handlers', []):
+                if isinstance(handler, MpQueueHandler) and \
+                        handler.queue in self.loggerqs:
+                    handler.flush()
+
     def stop(self,):
         # self._queue_listener.join()
         # return
         if self.verbose:
             print('mplogger stopping.')
+        if self._thread_listeners:
+            self.flush()
+            self._stop_thread()
+        if self._promoter is not None:
+            self._promoter.join()
+            self._promoter = None
         if self._queue_listener:
+            self.flush()
             if self.verbose:
                 print('mplogger stop: stopping queue listener.')
+            if self.engine == 'threading' and self._queue_listener.is_alive():
+                # records of this process may still be in queue feeder
+                # threads; a sentinel put after them ends each listener
+                # thread once it read them (see _start).
+                for loggerq in self._queues:
+                    loggerq.put(None)
             if self.abort:
                 if self.verbose:
                     print('mplogger stop: setting abort.')
@@ -357,6 +908,10 @@ class MpLogger(BaseLogger):
                 if self.verbose:
                     print('mplogger stop: joining process.')
                 self._queue_listener.join()
+                for loggerq in self._queues:
+                    if isinstance(loggerq, SharedMemoryQueue):
+                        loggerq.close()
+                        loggerq.unlink()
 
 
 if __name__ == '__main__':
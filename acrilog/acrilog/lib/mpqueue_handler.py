@@ -0,0 +1,308 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import copy
+import time
+import queue
+import logging
+import threading as th
+import multiprocessing as mp
+from logging.handlers import QueueHandler
+from multiprocessing.util import Finalize
+from acrilog.lib.record_codec import RecordEncoder, LEVELNO
+
+
+# control item put on queue by producer reporting records it dropped:
+# (DROPPED_RECORDS, pid, processName, count)
+DROPPED_RECORDS = 'dropped'
+
+# control item put on queue by producer reporting records its rate limit
+# suppressed: (RATE_LIMITED, pid, processName, RateLimitFilter.report())
+RATE_LIMITED = 'rate_limited'
+
+# argument types that are sent as is with defer_format; records with
+# arguments of other types are formatted by producer.
+_DEFERRABLE_TYPES = frozenset([str, int, float, bool, bytes, type(None)])
+
+
+def _levelno(item):
+    return item[4][LEVELNO] if type(item) is tuple else item.levelno
+
+
+class MpQueueHandler(QueueHandler):
+    ''' QueueHandler used by MpLogger producers.
+
+    When batch_size is greater than 1, prepared records are packed into a
+    list and the list is put on the queue as a single item.  A batch is
+    flushed when it reaches batch_size, when batch_interval seconds passed
+    since its first record, when a record of flush_level or above is
+    handled, or when the process exits.
+
+    When codec is 'compact', records are sent as compact tuples (see
+    record_codec) instead of pickled LogRecords.
+
+    queue_policy defines what happens when a bounded queue is full:
+        block: wait for room.
+        drop_newest: discard the item being put.
+        drop_oldest: take the oldest item off the queue to make room.
+        drop_below_level: discard records below drop_level; wait for room
+            for the others.
+    Discarded records are counted and reported to the listener with a
+    DROPPED_RECORDS item once the queue has room again.
+
+    With defer_format, msg and args are sent untouched and merged by the
+    listener's handlers; only records whose msg is str and whose args are
+    of simple types (_DEFERRABLE_TYPES), and that carry no exception or
+    stack info, are deferred.  Others are formatted as usual.
+
+    rate_limit (RateLimitFilter) is added to the handler's filters, so
+    records it rejects are neither copied nor pickled.  Its suppression
+    counts are reported to the listener with a RATE_LIMITED item when due,
+    and when the handler is flushed.
+    '''
+
+    queue_policies = ('block', 'drop_newest', 'drop_oldest',
+                      'drop_below_level')
+
+    def __init__(self, queue, batch_size=1, batch_interval=0.5,
+                 flush_level=logging.ERROR, codec=None, queue_policy='block',
+                 drop_level=logging.WARNING, defer_format=False,
+                 rate_limit=None):
+        '''
+        Args:
+            queue: queue to put records (or batches of records) on.
+            batch_size: maximum number of records in a batch; 1 disables
+                batching.
+            batch_interval: maximum seconds a record may wait in a batch.
+            flush_level: records at this level or above flush the batch
+                immediately.
+            codec: None to send LogRecords, or 'compact'.
+            queue_policy: one of queue_policies.
+            drop_level: with drop_below_level policy, records at this level
+                or above are never discarded.
+            defer_format: leave message formatting to the listener.
+            rate_limit: RateLimitFilter applied to records.
+        '''
+        super(MpQueueHandler, self).__init__(queue)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.flush_level = flush_level
+        self._batch = list()
+        self._batch_start = 0
+        self._pid = None
+        self._closed = None
+        if codec not in (None, 'compact'):
+            raise ValueError("Unknown codec: {}.".format(codec))
+        self._encoder = RecordEncoder() if codec == 'compact' else None
+        if queue_policy not in self.queue_policies:
+            raise ValueError("Unknown queue policy: {}.".format(queue_policy))
+        self.queue_policy = queue_policy
+        self.drop_level = drop_level
+        self.dropped = 0
+        self._unreported = 0
+        self.defer_format = defer_format
+        self.rate_limit = rate_limit
+        self._rate_limit_pid = None
+        if rate_limit is not None:
+            self.addFilter(rate_limit)
+
+    def _start_batching(self):
+        ''' (Re)initiate batching state for the current process.
+
+        A forked child inherits the parent's pending batch but not its
+        flusher thread; both are reset here the first time the child emits.
+        '''
+        self._pid = os.getpid()
+        self._batch = list()
+        self._closed = th.Event()
+        flusher = th.Thread(name='MpQueueHandlerFlusher',
+                            target=self._flush_loop, daemon=True)
+        flusher.start()
+        # multiprocessing children exit without logging.shutdown();
+        # exitpriority above mp.Queue's own finalizer (10) makes sure the
+        # last batch is put before the queue's feeder thread is closed.
+        Finalize(self, self.flush, exitpriority=20)
+
+    def _flush_loop(self):
+        closed = self._closed
+        while not closed.wait(self.batch_interval):
+            if self._batch and \
+                    time.time() - self._batch_start >= self.batch_interval:
+                self.flush()
+
+    @staticmethod
+    def deferrable(record):
+        ''' Returns True if record can be sent without formatting.
+        '''
+        if record.exc_info or record.stack_info or type(record.msg) is not str:
+            return False
+        args = record.args
+        if not args:
+            return True
+        if isinstance(args, dict):
+            args = args.values()
+        return _DEFERRABLE_TYPES.issuperset(map(type, args))
+
+    def prepare(self, record):
+        if self.defer_format and self.deferrable(record):
+            if self._encoder is None:
+                # record may still be changed by other handlers while it
+                # waits in a batch or queue feeder.
+                return copy.copy(record)
+            return self._encoder.encode(record)
+        if self._encoder is None:
+            return super(MpQueueHandler, self).prepare(record)
+        # same as QueueHandler.prepare, without copying the record: message
+        # (including exception and stack text) is merged into msg.
+        return self._encoder.encode(record, msg=self.format(record))
+
+    def enqueue(self, record):
+        # put() lets bounded transports (e.g., SharedMemoryQueue) apply their
+        # overflow policy instead of failing with Full.
+        if self.queue_policy == 'block':
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._enqueue_full(record)
+        else:
+            if self._unreported:
+                self._report_dropped()
+
+    def _enqueue_full(self, item):
+        if self.queue_policy == 'drop_oldest':
+            try:
+                oldest = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self._count_dropped(len(oldest)
+                                    if isinstance(oldest, list) else 1)
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        elif self.queue_policy == 'drop_below_level':
+            items = item if isinstance(item, list) else [item]
+            below = [_levelno(i) < self.drop_level for i in items]
+            if not all(below):
+                if self._encoder is not None:
+                    # later records may use strings defined by dropped ones.
+                    keep = [RecordEncoder.definitions(i) if drop else i
+                            for i, drop in zip(items, below)]
+                    keep = [i for i in keep if i is not None]
+                else:
+                    keep = [i for i, drop in zip(items, below) if not drop]
+                self._count_dropped(sum(below))
+                self.queue.put(keep if isinstance(item, list) else keep[0])
+                return
+        self._drop(item)
+
+    def _drop(self, item):
+        items = item if isinstance(item, list) else [item]
+        if self._encoder is not None:
+            for i in reversed(items):
+                self._encoder.unregister(i)
+        self._count_dropped(len(items))
+
+    def _count_dropped(self, count):
+        self.dropped += count
+        self._unreported += count
+
+    def _report_dropped(self):
+        report = (DROPPED_RECORDS, os.getpid(), mp.current_process().name,
+                  self._unreported)
+        try:
+            self.queue.put_nowait(report)
+        except queue.Full:
+            pass
+        else:
+            self._unreported = 0
+
+    def _report_rate_limited(self):
+        report = self.rate_limit.report()
+        if not report:
+            return
+        item = (RATE_LIMITED, os.getpid(), mp.current_process().name, report)
+        try:
+            if self.queue_policy == 'block':
+                self.queue.put(item)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            pass
+
+    def handle(self, record):
+        rv = super(MpQueueHandler, self).handle(record)
+        if self.rate_limit is not None:
+            if not rv and self._rate_limit_pid != os.getpid():
+                # counts pending at exit are reported by flush.
+                self._rate_limit_pid = os.getpid()
+                Finalize(self, self.flush, exitpriority=20)
+            if self.rate_limit.due():
+                self._report_rate_limited()
+        return rv
+
+    def emit(self, record):
+        if self.batch_size <= 1:
+            super(MpQueueHandler, self).emit(record)
+            return
+
+        try:
+            if self._pid != os.getpid():
+                self._start_batching()
+            if not self._batch:
+                self._batch_start = time.time()
+            self._batch.append(self.prepare(record))
+            if len(self._batch) >= self.batch_size \
+                    or record.levelno >= self.flush_level \
+                    or time.time() - self._batch_start >= self.batch_interval:
+                self._flush_batch()
+        except Exception:
+            self.handleError(record)
+
+    def _flush_batch(self):
+        batch, self._batch = self._batch, list()
+        if batch:
+            self.enqueue(batch)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._pid == os.getpid():
+                self._flush_batch()
+            if self._unreported:
+                self._report_dropped()
+            if self.rate_limit is not None:
+                self._report_rate_limited()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        if self._closed is not None:
+            self._closed.set()
+        super(MpQueueHandler, self).close()
@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import logging
+from logging.handlers import QueueListener
+from acrilog.lib.mpqueue_handler import DROPPED_RECORDS, RATE_LIMITED
+from acrilog.lib.record_codec import RecordDecoder
+
+
+class RecordQueueListener(QueueListener):
+    ''' QueueListener of MpLogger.
+
+    Items on queue may be LogRecords, compact records (see record_codec),
+    DROPPED_RECORDS and RATE_LIMITED reports, or lists of these (batches).
+    '''
+
+    def __init__(self, started, *args, name=None, **kwargs):
+        super(RecordQueueListener, self).__init__(*args, **kwargs)
+        self.name = name
+        self.decoder = RecordDecoder()
+        # total records dropped by producers, by pid.
+        self.dropped = dict()
+        # total records suppressed by producers' rate limits.
+        self.suppressed = 0
+        # records taken off queue, and records passed to handlers.
+        self.received = 0
+        self.dispatched = 0
+        if started is not None:
+            started.set()
+
+    def dequeue(self, block,):
+        ''' adding capture to EOF
+        '''
+        try:
+            item = self.queue.get(block)
+        except EOFError:
+            item = None
+        return item
+
+    def join(self, timeout=None):
+        ''' waits for the drain thread to end on a sentinel put by a
+        producer.
+        '''
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def handle(self, record):
+        ''' unpacks batches and decodes compact records put by
+        MpQueueHandler.
+        '''
+        if isinstance(record, list):
+            for item in record:
+                self.handle_item(item)
+        else:
+            self.handle_item(record)
+
+    def handle_item(self, item):
+        if RecordDecoder.is_encoded(item):
+            # without respect_handler_level every handler needs the record.
+            level = min([handler.level for handler in self.handlers]) \
+                if self.respect_handler_level and self.handlers else 0
+            item = self.decoder.decode(item, level)
+            while self.decoder.lost:
+                self.dispatched += 1
+                self.dispatch(self.lost_table_record(
+                    *self.decoder.lost.pop(0)))
+            if item is None:
+                return
+            self.received += 1
+        elif type(item) is tuple and item[0] == DROPPED_RECORDS:
+            item = self.dropped_record(*item[1:])
+        elif type(item) is tuple and item[0] == RATE_LIMITED:
+            for record in self.rate_limited_records(*item[1:]):
+                self.dispatched += 1
+                self.dispatch(record)
+            return
+        else:
+            self.received += 1
+        self.dispatched += 1
+        self.dispatch(item)
+
+    def dispatch(self, record):
+        ''' passes record to handlers.
+        '''
+        super(RecordQueueListener, self).handle(record)
+
+    def rate_limited_records(self, pid, process_name, report):
+        ''' returns warning records reporting, by rule, records suppressed
+        by producer's rate limit (see RateLimitFilter).
+        '''
+        self.suppressed += sum(suppressed for _, _, suppressed, _, _
+                               in report)
+        return [logging.makeLogRecord({
+            'name': self.name,
+            'levelno': logging.WARNING,
+            'levelname': logging.getLevelName(logging.WARNING),
+            'msg': 'Rate limit: %s (pid %s) suppressed %s records of %r at '
+                   '%s or below in %.1f seconds; %s sampled.',
+            'args': (process_name, pid, suppressed, prefix or '*',
+                     logging.getLevelName(level), seconds, sampled),
+            'processName': process_name,
+            'process': pid,
+            }) for prefix, level, suppressed, sampled, seconds in report]
+
+    def dropped_record(self, pid, process_name, count):
+        ''' accounts records dropped by producer and returns a warning
+        record reporting them.
+        '''
+        total = self.dropped[pid] = self.dropped.get(pid, 0) + count
+        return logging.makeLogRecord({
+            'name': self.name,
+            'levelno': logging.WARNING,
+            'levelname': logging.getLevelName(logging.WARNING),
+            'msg': 'Queue full: %s (pid %s) dropped %s records; %s in total.',
+            'args': (process_name, pid, count, total),
+            'processName': process_name,
+            'process': pid,
+            })
+
+    def lost_table_record(self, pid, serial):
+        ''' returns a warning record reporting a producer whose string table
+        was dropped by the decoder (see RecordDecoder).
+        '''
+        return logging.makeLogRecord({
+            'name': self.name,
+            'levelno': logging.WARNING,
+            'levelname': logging.getLevelName(logging.WARNING),
+            'msg': 'Codec: string table of pid %s (encoder %s) was dropped; '
+                   'its records carry raw string ids.',
+            'args': (pid, serial),
+            'process': pid,
+            })
@@ -0,0 +1,174 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import os
+import time
+import random
+import logging
+import threading as th
+
+
+class RateLimitFilter(logging.Filter):
+    ''' Limits, per logger name prefix and level, the rate of records that
+    pass, and samples the records above the rate.
+
+    Each rule is (prefix, level, rate, burst, sample), or a dict with these
+    keys; burst and sample are optional.  A rule applies to records of
+    loggers matching prefix (as in LevelControl: the logger of that name and
+    its descendants, trailing '.*' is ignored, '' applies to all), at level
+    or below.  The rule with the longest matching prefix, then the lowest
+    level, wins; the rule is looked up once per logger name and level.
+
+    Records of a rule are passed by a token bucket holding up to burst
+    (default rate) tokens, refilled at rate tokens per second.  When the
+    bucket is empty, records are passed with probability sample (default 0)
+    and suppressed otherwise.
+
+    Suppressed records are counted by rule; when counts are pending and
+    interval seconds passed since the last report, due() returns True and
+    report() hands them over (MpQueueHandler sends them to the listener).
+    State is per process; a forked child starts with full buckets and no
+    counts.
+    '''
+
+    def __init__(self, rules, interval=10.0):
+        '''
+        Args:
+            rules: list of rules.
+            interval: minimum seconds between reports.
+        '''
+        super(RateLimitFilter, self).__init__()
+        self.rules = [self._rule(rule) for rule in rules]
+        self.interval = interval
+        self._reset()
+
+    @staticmethod
+    def _rule(rule):
+        if isinstance(rule, dict):
+            rule = (rule['prefix'], rule['level'], rule['rate'],
+                    rule.get('burst'), rule.get('sample', 0.0))
+        prefix, level, rate = rule[:3]
+        burst = rule[3] if len(rule) > 3 else None
+        sample = rule[4] if len(rule) > 4 else 0.0
+        if prefix.endswith('.*'):
+            prefix = prefix[:-2]
+        if prefix == '*':
+            prefix = ''
+        if isinstance(level, str):
+            level = logging.getLevelName(level)
+        if rate < 0 or not 0 <= sample <= 1:
+            raise ValueError("Invalid rate limit rule: {}.".format(rule))
+        return (prefix, level, float(rate),
+                float(burst if burst is not None else rate), sample)
+
+    def _reset(self):
+        # a forked child may inherit the lock held by a thread of the
+        # parent.
+        self._lock = th.Lock()
+        self._pid = os.getpid()
+        # (name, levelno): rule index, or None
+        self._matches = dict()
+        # rule index: [tokens, time of last refill]
+        now = time.time()
+        self._buckets = [[burst, now] for _, _, _, burst, _ in self.rules]
+        # rule index: [suppressed, sampled]
+        self._counts = dict()
+        self._reported = now
+        self._now = now
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def match(self, name, levelno):
+        ''' Returns index of rule applying to records of logger name at
+        levelno, or None.
+        '''
+        found, key = None, None
+        for index, (prefix, level, _, _, _) in enumerate(self.rules):
+            if levelno > level:
+                continue
+            if prefix and name != prefix and \
+                    not name.startswith(prefix + '.'):
+                continue
+            # longer prefix, then lower level
+            rank = (-len(prefix), level)
+            if key is None or rank < key:
+                found, key = index, rank
+        return found
+
+    def filter(self, record):
+        if self._pid != os.getpid():
+            self._reset()
+        try:
+            index = self._matches[(record.name, record.levelno)]
+        except KeyError:
+            index = self._matches[(record.name, record.levelno)] = \
+                self.match(record.name, record.levelno)
+        if index is None:
+            return True
+
+        # threads of the process share buckets and counts.
+        with self._lock:
+            now = self._now = time.time()
+            bucket = self._buckets[index]
+            _, _, rate, burst, sample = self.rules[index]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True
+            bucket[0] = tokens
+
+            counts = self._counts.get(index)
+            if counts is None:
+                counts = self._counts[index] = [0, 0]
+            if sample and random.random() < sample:
+                counts[1] += 1
+                return True
+            counts[0] += 1
+            return False
+
+    def due(self):
+        ''' Returns True if suppression counts should be reported.
+        '''
+        return bool(self._counts) and \
+            self._now - self._reported >= self.interval
+
+    def report(self):
+        ''' Returns list of (prefix, level, suppressed, sampled, seconds) of
+        rules that suppressed records since the last report, and resets
+        their counts.
+        '''
+        with self._lock:
+            counts, self._counts = self._counts, dict()
+            now = time.time()
+            seconds, self._reported = now - self._reported, now
+        return [(self.rules[index][0], self.rules[index][1], suppressed,
+                 sampled, seconds)
+                for index, (suppressed, sampled) in sorted(counts.items())
+                if suppressed]
@@ -0,0 +1,219 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Compact encoding of LogRecords for MpLogger queue.
+
+A record is sent as a tuple:
+
+    (RECORD, producer, definitions, interned, values, extra)
+
+producer identifies the encoder (pid and serial).  interned holds small
+integer ids in place of the strings of INTERNED_FIELDS; the first record that
+uses a string carries its (id, string) pair in definitions.  values holds
+VALUE_FIELDS in order.  extra is a dict of non standard record attributes, or
+None.
+
+Items from one producer must reach the decoder in the order they were
+encoded, since a definition travels only once.
+'''
+
+import os
+import logging
+import itertools
+import weakref
+from collections import OrderedDict
+
+
+RECORD = 'R'
+DEFINITIONS = 'D'
+
+INTERNED_FIELDS = ('name', 'levelname', 'pathname', 'filename', 'module',
+                   'funcName', 'threadName', 'processName', 'host',)
+VALUE_FIELDS = ('levelno', 'lineno', 'created', 'msecs', 'relativeCreated',
+                'thread', 'process', 'msg', 'args',)
+LEVELNO = VALUE_FIELDS.index('levelno')
+UNKNOWN_STRING = '?%s'
+
+_STANDARD_FIELDS = frozenset(
+    INTERNED_FIELDS + VALUE_FIELDS +
+    ('exc_info', 'exc_text', 'stack_info', 'message', 'taskName'))
+
+_serial = itertools.count()
+_encoders = weakref.WeakSet()
+
+
+def _reset_encoders():
+    for encoder in list(_encoders):
+        encoder.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_encoders)
+
+
+class RecordEncoder(object):
+    ''' Producer side of compact codec; one per MpQueueHandler.
+
+    Not thread safe; callers serialize on handler lock.
+    '''
+
+    def __init__(self):
+        self.reset()
+        _encoders.add(self)
+
+    def reset(self):
+        ''' starts a new string table; called in forked child.
+        '''
+        self.producer = (os.getpid(), next(_serial))
+        self._strings = dict()
+
+    def encode(self, record, msg=None):
+        ''' Encodes record into compact tuple.
+
+        Args:
+            record: LogRecord to encode.
+            msg: formatted message to send instead of record.msg; when
+                provided, args are dropped.
+        '''
+        strings = self._strings
+        definitions = None
+        record_dict = record.__dict__
+        interned = list()
+        for field in INTERNED_FIELDS:
+            value = record_dict.get(field)
+            if value is None:
+                interned.append(None)
+                continue
+            id_ = strings.get(value)
+            if id_ is None:
+                id_ = strings[value] = len(strings)
+                if definitions is None:
+                    definitions = list()
+                definitions.append((id_, value))
+            interned.append(id_)
+
+        values = [record_dict.get(field) for field in VALUE_FIELDS]
+        if msg is not None:
+            values[-2:] = [msg, None]
+
+        extra = None
+        if not _STANDARD_FIELDS.issuperset(record_dict):
+            extra = dict((key, value) for key, value in record_dict.items()
+                         if key not in _STANDARD_FIELDS)
+
+        return (RECORD, self.producer, definitions, tuple(interned),
+                tuple(values), extra)
+
+    def unregister(self, item):
+        ''' Rolls back definitions of the latest encoded item that is
+        discarded before it was put on the queue.
+        '''
+        definitions = item[2]
+        if definitions and item[1] == self.producer:
+            for _, value in definitions:
+                self._strings.pop(value, None)
+
+    @staticmethod
+    def definitions(item):
+        ''' Returns DEFINITIONS item to put in place of a discarded item whose
+        followers may use its definitions, or None if there are none.
+        '''
+        if not item[2]:
+            return None
+        return (DEFINITIONS, item[1], item[2])
+
+
+class RecordDecoder(object):
+    ''' Listener side of compact codec, keeping string table per producer.
+
+    Tables are kept for the max_producers producers that sent items most
+    recently; the table of the least recent is dropped to make room for a
+    new producer, so replaced workers do not accumulate.  Should a dropped
+    producer send again, strings it defined earlier are unknown: they are
+    decoded as UNKNOWN_STRING of their raw id, and the producer is added to
+    lost for the listener to report.
+    '''
+
+    def __init__(self, max_producers=1024):
+        '''
+        Args:
+            max_producers: maximum number of string tables kept.
+        '''
+        self.max_producers = max_producers
+        self._tables = OrderedDict()
+        # producers with unknown string ids not yet reported.
+        self.lost = list()
+
+    @staticmethod
+    def is_encoded(item):
+        return type(item) is tuple and item and \
+            item[0] in (RECORD, DEFINITIONS)
+
+    def decode(self, item, level=logging.NOTSET):
+        ''' Rebuilds LogRecord from compact item.
+
+        Args:
+            item: encoded tuple.
+            level: records below level are not rebuilt.
+
+        Returns:
+            LogRecord, or None if item carried only definitions or its level
+            is below level.
+        '''
+        tables = self._tables
+        table = tables.get(item[1])
+        if table is None:
+            if len(tables) >= self.max_producers:
+                tables.popitem(last=False)
+            table = tables[item[1]] = dict()
+        else:
+            tables.move_to_end(item[1])
+        definitions = item[2]
+        if definitions:
+            table.update(definitions)
+        if item[0] != RECORD:
+            return None
+
+        _, _, _, interned, values, extra = item
+        if values[LEVELNO] < level:
+            return None
+
+        record = logging.LogRecord.__new__(logging.LogRecord)
+        record_dict = record.__dict__
+        for field, id_ in zip(INTERNED_FIELDS, interned):
+            if id_ is None:
+                record_dict[field] = None
+                continue
+            value = table.get(id_)
+            if value is None:
+                if not table.get(None):
+                    # reported once per table.
+                    table[None] = True
+                    self.lost.append(item[1])
+                value = table[id_] = UNKNOWN_STRING % id_
+            record_dict[field] = value
+        record_dict.update(zip(VALUE_FIELDS, values))
+        record_dict['exc_info'] = None
+        record_dict['exc_text'] = None
+        record_dict['stack_info'] = None
+        if extra:
+            record_dict.update(extra)
+        return record
@@ -0,0 +1,168 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import time
+import logging
+import threading as th
+from collections import OrderedDict
+
+
+class RepeatAggregator(logging.Handler):
+    ''' Handler passing records to a group of handlers, collapsing repeated
+    records into summaries.
+
+    Records are repeats when they have the same logger name, level, and msg
+    (the message template; records formatted by producers repeat only if
+    their text is the same).  The first record of a key is passed; repeats
+    within the following window seconds are counted instead.  At the end of
+    each window with repeats, a summary record is passed: the last repeat
+    with "[repeated N times in S seconds]" appended to its message, and
+    attribute repeated set to N.  A key quiet for a whole window is
+    dropped, so its next record is passed again.
+
+    The table of keys holds at most max_keys; the least recently repeated
+    key is dropped (after its summary is passed) to make room.
+    '''
+
+    def __init__(self, *handlers, window=10.0, max_keys=10000, name=None):
+        '''
+        Args:
+            handlers: handlers to pass records to.
+            window: seconds repeats are counted before their summary.
+            max_keys: maximum number of keys tracked.
+            name: name of thread passing summaries of idle keys.
+        '''
+        if window <= 0:
+            raise ValueError("window must be positive: {}.".format(window))
+        super(RepeatAggregator, self).__init__()
+        self.handlers = handlers
+        self.window = window
+        self.max_keys = max_keys
+        # key: [window start, repeats, last repeat]
+        self._table = OrderedDict()
+        # total records counted as repeats.
+        self.suppressed = 0
+        self._stop = th.Event()
+        if name is None:
+            name = 'RepeatAggregator'
+        self._thread = th.Thread(name=name, target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def _pass(self, records):
+        for record in records:
+            for handler in self.handlers:
+                handler.handle(record)
+
+    @staticmethod
+    def _summary(entry, now):
+        last, count = entry[2], entry[1]
+        summary = logging.makeLogRecord(last.__dict__)
+        summary.msg = "%s [repeated %d times in %.1f seconds]" % (
+            last.getMessage(), count, now - entry[0])
+        summary.args = None
+        summary.exc_info = None
+        summary.exc_text = None
+        summary.stack_info = None
+        summary.repeated = count
+        return summary
+
+    def handle(self, record):
+        rv = self.filter(record)
+        if not rv:
+            return rv
+        msg = record.msg
+        key = (record.name, record.levelno,
+               msg if msg.__class__ is str else repr(msg))
+        now = time.monotonic()
+        records = list()
+        self.acquire()
+        try:
+            table = self._table
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [now, 0, None]
+                records.append(record)
+                if len(table) > self.max_keys:
+                    _, evicted = table.popitem(last=False)
+                    if evicted[1]:
+                        records.append(self._summary(evicted, now))
+            else:
+                table.move_to_end(key)
+                entry[1] += 1
+                entry[2] = record
+                self.suppressed += 1
+                if now - entry[0] >= self.window:
+                    records.append(self._summary(entry, now))
+                    entry[0], entry[1], entry[2] = now, 0, None
+        finally:
+            self.release()
+        # handlers have locks of their own.
+        self._pass(records)
+        return rv
+
+    def emit(self, record):
+        self.handle(record)
+
+    def _expire(self, everything=False):
+        ''' passes summaries of keys whose window ended (or of all keys
+        with repeats), and drops keys quiet for a window.
+        '''
+        now = time.monotonic()
+        records = list()
+        self.acquire()
+        try:
+            table = self._table
+            for key, entry in list(table.items()):
+                expired = now - entry[0] >= self.window
+                if entry[1]:
+                    if expired or everything:
+                        records.append(self._summary(entry, now))
+                        entry[0], entry[1], entry[2] = now, 0, None
+                elif expired:
+                    del table[key]
+        finally:
+            self.release()
+        self._pass(records)
+
+    def _monitor(self):
+        while not self._stop.wait(self.window / 2):
+            try:
+                self._expire()
+            except Exception:
+                # handlers report their own errors; keep monitoring.
+                pass
+
+    def flush(self):
+        ''' passes summaries of pending repeats, then flushes the group.
+        '''
+        self._expire(everything=True)
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._expire(everything=True)
+        for handler in self.handlers:
+            handler.close()
+        super(RepeatAggregator, self).close()
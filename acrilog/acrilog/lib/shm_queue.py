@@ -0,0 +1,226 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import time
+import pickle
+import struct
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+
+class SharedMemoryQueue(object):
+    ''' Multiple producers, single consumer queue over a shared memory ring
+    buffer.
+
+    The buffer starts with a header of four counters: head (bytes ever
+    written), tail (bytes ever read), dropped (items discarded on overflow)
+    and waiting (set while the consumer sleeps).  Each item is written as a
+    4 bytes length followed by its pickle, wrapping around the end of the
+    buffer.
+
+    Producers serialize on a lock only among themselves; the consumer never
+    takes it.  A producer publishes an item by advancing head after the item
+    bytes are in place.  The consumer reads while head is ahead of tail;
+    when the queue is empty it sets waiting and sleeps on an event, which a
+    producer sets only when it finds waiting set after publishing.  Hence,
+    under load, there are no pipe writes, feeder threads or wakeups.
+
+    The object can be passed to processes the same way a multiprocessing
+    Queue is (as Process argument); the other side attaches to the same
+    shared memory block by name.
+    '''
+
+    _HEADER = struct.Struct('QQQQ')
+    _COUNTER = struct.Struct('Q')
+    _LENGTH = struct.Struct('I')
+    _HEAD, _TAIL, _DROPPED, _WAITING = 0, 8, 16, 24
+
+    # longest sleep of consumer between checks of an empty queue; a safety
+    # net only, the event wakes it.
+    _IDLE_WAIT = 1.0
+
+    OVERFLOW_BLOCK = 'block'
+    OVERFLOW_DROP = 'drop'
+
+    def __init__(self, size=4 * 1024 * 1024, overflow='block',
+                 poll_interval=0.001):
+        '''
+        Args:
+            size: size in bytes of the ring buffer.
+            overflow: what put() does when there is no room for an item;
+                'block' waits for the consumer, 'drop' discards the item and
+                counts it in dropped.
+            poll_interval: seconds to sleep between polls when waiting for
+                room (producer).
+        '''
+        if overflow not in (self.OVERFLOW_BLOCK, self.OVERFLOW_DROP):
+            raise ValueError("Unknown overflow policy: {}.".format(overflow))
+        self._size = size
+        self._overflow = overflow
+        self._poll_interval = poll_interval
+        self._lock = mp.Lock()
+        self._ready = mp.Event()
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self._HEADER.size + size)
+        self._owner = True
+        self._attach()
+        self._HEADER.pack_into(self._buf, 0, 0, 0, 0, 0)
+
+    def _attach(self):
+        self._buf = self._shm.buf
+        self._offset = self._HEADER.size
+
+    def __getstate__(self):
+        mp.context.assert_spawning(self)
+        return (self._shm.name, self._size, self._overflow,
+                self._poll_interval, self._lock, self._ready)
+
+    def __setstate__(self, state):
+        (name, self._size, self._overflow, self._poll_interval,
+         self._lock, self._ready) = state
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = False
+        self._attach()
+
+    def _counter(self, position):
+        return self._COUNTER.unpack_from(self._buf, position)[0]
+
+    def _write(self, position, data):
+        start = position % self._size
+        first = min(len(data), self._size - start)
+        offset = self._offset + start
+        self._buf[offset:offset + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self._buf[self._offset:self._offset + rest] = data[first:]
+
+    def _read(self, position, length):
+        start = position % self._size
+        first = min(length, self._size - start)
+        offset = self._offset + start
+        data = bytes(self._buf[offset:offset + first])
+        if first < length:
+            data += bytes(self._buf[self._offset:self._offset + length - first])
+        return data
+
+    def _check_closed(self):
+        if self._buf is None:
+            raise ValueError("Queue {} is closed.".format(self._shm.name))
+
+    def put(self, obj, block=True, timeout=None):
+        self._check_closed()
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        data = self._LENGTH.pack(len(data)) + data
+        if len(data) > self._size:
+            raise ValueError("Item of {} bytes does not fit queue of {} bytes."
+                             .format(len(data), self._size))
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._lock:
+                head = self._counter(self._HEAD)
+                tail = self._counter(self._TAIL)
+                published = self._size - (head - tail) >= len(data)
+                if published:
+                    self._write(head, data)
+                    self._COUNTER.pack_into(self._buf, self._HEAD,
+                                            head + len(data))
+                elif block and self._overflow == self.OVERFLOW_DROP:
+                    dropped = self._counter(self._DROPPED)
+                    self._COUNTER.pack_into(self._buf, self._DROPPED,
+                                            dropped + 1)
+                    return
+            if published:
+                # releasing the lock orders head before reading waiting.
+                if self._counter(self._WAITING):
+                    self._ready.set()
+                return
+            if not block or (deadline is not None and time.time() > deadline):
+                raise queue.Full
+            time.sleep(self._poll_interval)
+
+    def put_nowait(self, obj):
+        return self.put(obj, block=False)
+
+    def get(self, block=True, timeout=None):
+        self._check_closed()
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            tail = self._counter(self._TAIL)
+            if self._counter(self._HEAD) != tail:
+                break
+            if not block:
+                raise queue.Empty
+            wait = self._IDLE_WAIT
+            if deadline is not None:
+                wait = min(wait, deadline - time.time())
+                if wait <= 0:
+                    raise queue.Empty
+            self._wait(tail, wait)
+        length = self._LENGTH.unpack(self._read(tail, self._LENGTH.size))[0]
+        data = self._read(tail + self._LENGTH.size, length)
+        self._COUNTER.pack_into(self._buf, self._TAIL,
+                                tail + self._LENGTH.size + length)
+        return pickle.loads(data)
+
+    def _wait(self, tail, timeout):
+        ''' sleeps until a producer publishes after tail, or timeout.
+        '''
+        self._COUNTER.pack_into(self._buf, self._WAITING, 1)
+        # clear() takes the event's lock, ordering waiting before reading
+        # head.
+        self._ready.clear()
+        if self._counter(self._HEAD) == tail:
+            self._ready.wait(timeout)
+        self._COUNTER.pack_into(self._buf, self._WAITING, 0)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def empty(self):
+        return self._counter(self._HEAD) == self._counter(self._TAIL)
+
+    def pending_bytes(self):
+        ''' number of bytes of items waiting to be read.
+        '''
+        return self._counter(self._HEAD) - self._counter(self._TAIL)
+
+    def dropped(self):
+        ''' number of items discarded since queue was created.
+        '''
+        return self._counter(self._DROPPED)
+
+    def close(self):
+        ''' detaches this process from the shared memory block; put() and
+        get() raise ValueError afterwards.
+        '''
+        if self._shm is not None:
+            self._buf = None
+            self._shm.close()
+
+    def unlink(self):
+        ''' removes the shared memory block; called by the creating process
+        once all users are done with the queue.
+        '''
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
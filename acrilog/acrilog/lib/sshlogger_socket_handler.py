@@ -100,10 +100,11 @@ class SSHLoggerClientHandler(logging.Handler):
         logging_record_add_host()
         # self.addFilter(LoggerAddHostFilter())
 
-        # there is no need to pass loggerq via ssh.
+        # there is no need to pass loggerq (or shards) via ssh.
         # also, it wont work anyhow.
         # but it does need port
-        del mp_logger_info['loggerq']
+        for key in MpLogger.local_info_keys:
+            mp_logger_info.pop(key, None)
         mp_logger_info['port'] = logger_info['port']
         # mp_logger_info['console'] = False
 
@@ -27,9 +27,13 @@ import socketserver
 import struct
 import multiprocessing as mp
 import threading as th
-from acrilog.lib.baselogger import BaseLogger, create_stream_handler
+from acrilog.lib.baselogger import BaseLogger, create_stream_handler, \
+    console_formatter
+from acrilog.lib.format_cache import SharedFormatter
+from acrilog.lib.repeat_aggregator import RepeatAggregator
+from acrilog.lib.listener_stats import ListenerStats
 from acrilib import logging_record_add_host, get_free_port  # LoggerAddHostFilter
-from acrilib import HierarchicalTimedSizedRotatingHandler
+from acrilog.lib.buffered_file_handler import create_hierarchical_handler
 
 
 # TODO: get USE_QUEUE = True working without warnings at the end.
@@ -60,14 +64,16 @@ class LoggerQueueReceiver(object):
     def receiver(self,):
         logger = logging.getLogger(name=self.name)
         logger.setLevel(self.logging_level)
-        handler = HierarchicalTimedSizedRotatingHandler(
-            *self.args, formatter=self.formatter, **self.kwargs)
+        formatter = SharedFormatter.of(self.formatter)
+        handler = create_hierarchical_handler(
+            *self.args, formatter=formatter, **self.kwargs)
         logger.addHandler(handler)
 
         if self.console:
             handlers = create_stream_handler(
                 logging_level=self.logging_level,
-                level_formats=self.level_formats, datefmt=self.datefmt)
+                level_formats=self.level_formats, datefmt=self.datefmt,
+                formatter=console_formatter(formatter))
             for handler in handlers:
                 logger.addHandler(handler)
 
@@ -104,7 +110,8 @@ def local_logger(record, name=None):
     logger.handle(record)
 
 
-def get_log_record_tcp_request_handler(logger_queue=None, name=None):
+def get_log_record_tcp_request_handler(logger_queue=None, name=None,
+                                       stats=None):
     class LogRecordTCPRequestHandler(socketserver.BaseRequestHandler):
         """Handler for a streaming logging request.
 
@@ -133,6 +140,8 @@ def get_log_record_tcp_request_handler(logger_queue=None, name=None):
             return pickle.loads(data)
 
         def handleLogRecord(self, record):
+            if stats is not None:
+                stats.count()
             if logger_queue is None:
                 # set name to None so record.name will be used
                 local_logger(record, name=None)
@@ -161,7 +170,9 @@ class KeyFilter(logging.Filter):
 def start_sshlogger(name=None, host=None, port=None, handlers=[],
                     logging_level=None, formatter=None, level_formats=None,
                     datefmt=None, console=False, started=None, abort=None,
-                    finished=None, args=(), kwargs={},):
+                    finished=None, repeat_window=None, repeat_max_keys=10000,
+                    stats=False, stats_connection=None, stats_file=None,
+                    stats_interval=60.0, args=(), kwargs={},):
     ''' starts logger for multiprocessing using queue.
 
     Returns:
@@ -173,6 +184,7 @@ def start_sshlogger(name=None, host=None, port=None, handlers=[],
     logger.setLevel(logging_level)
     logging_record_add_host()
     # logger.addFilter(LoggerAddHostFilter())
+    listener_stats = ListenerStats() if stats else None
 
     if USE_QUEUE:
         logger_queue_receiver = LoggerQueueReceiver(
@@ -183,24 +195,37 @@ def start_sshlogger(name=None, host=None, port=None, handlers=[],
         logger_queue = logger_queue_receiver.logger_queue
     else:
         logger_queue = None
-        handlers += [
-            HierarchicalTimedSizedRotatingHandler(*args,
-                                                  formatter=formatter,
-                                                  **kwargs)]
+        # file handlers of all levels of a key, and console, format a
+        # record once.
+        formatter = SharedFormatter.of(formatter)
+        hierarchical_handler = create_hierarchical_handler(
+            *args, formatter=formatter, **kwargs)
+        handlers += [hierarchical_handler]
         if console:
-            handlers += create_stream_handler(logging_level=logging_level,
-                                              level_formats=level_formats,
-                                              datefmt=datefmt)
+            handlers += create_stream_handler(
+                logging_level=logging_level, level_formats=level_formats,
+                datefmt=datefmt, formatter=console_formatter(formatter))
+        if listener_stats is not None:
+            handlers = [listener_stats.wrap(
+                handler, formatter=formatter
+                if handler is hierarchical_handler else None)
+                for handler in handlers]
+        if repeat_window:
+            handlers = [RepeatAggregator(*handlers, window=repeat_window,
+                                         max_keys=repeat_max_keys)]
         for handler in handlers:
             logger.addHandler(handler)
 
     handler = get_log_record_tcp_request_handler(logger_queue=logger_queue,
-                                                 name=name)
+                                                 name=name,
+                                                 stats=listener_stats)
     tcpserver = socketserver.ThreadingTCPServer((host, port), handler)
     tcpserver.allow_reuse_address = True
     tcpserverproc = th.Thread(name='ThreadingTCPServer',
                               target=tcpserver.serve_forever, daemon=True)
     tcpserverproc.start()
+    if listener_stats is not None:
+        listener_stats.start(stats_connection, stats_file, stats_interval)
     # notify caller, process started
     started.set()
     # wait for abort notification
@@ -211,14 +236,40 @@ def start_sshlogger(name=None, host=None, port=None, handlers=[],
     tcpserverproc.join()
     if USE_QUEUE:
         logger_queue_receiver.stop()
+    else:
+        # buffering handlers must be flushed, and files completed; process
+        # ends without logging shutdown.
+        for handler in handlers:
+            handler.flush()
+            handler.close()
+    if listener_stats is not None:
+        listener_stats.stop()
     finished.set()
 
 
 class SSHLogger(BaseLogger):
     def __init__(self, name=None, host='localhost', port=None,
-                 logging_level=logging.INFO, handlers=[], *args, **kwargs):
+                 logging_level=logging.INFO, handlers=[], repeat_window=None,
+                 repeat_max_keys=10000, stats=False, stats_file=None,
+                 stats_interval=60.0, *args, **kwargs):
+        '''
+        Args:
+            repeat_window, repeat_max_keys: as in MpLogger; repeats are
+                collapsed by the server.
+            stats, stats_file, stats_interval: as in MpLogger; stats are
+                kept by the server.
+            args, kwargs: as in BaseLogger.
+        '''
         super(SSHLogger, self).__init__(*args, name=name,
                                         logging_level=logging_level, **kwargs)
+        self.repeat_window = repeat_window
+        self.repeat_max_keys = repeat_max_keys
+        self.collect_stats = bool(stats or stats_file)
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        self._stats_connection = None
+        self._stats_lock = th.Lock()
+        self.tcpserver = None
 
         self.host = host
         self.logger_initialized = False
@@ -298,9 +349,17 @@ class SSHLogger(BaseLogger):
             'started': self.started,
             'abort': self.abort,
             'finished': self.finished,
+            'repeat_window': self.repeat_window,
+            'repeat_max_keys': self.repeat_max_keys,
+            'stats': self.collect_stats,
+            'stats_file': self.stats_file,
+            'stats_interval': self.stats_interval,
             'args': self.handler_args,
             'kwargs': self.handler_kwargs,
         }
+        if self.collect_stats:
+            self._stats_connection, start_nwlogger_kwargs['stats_connection'] \
+                = mp.Pipe()
 
         self.tcpserver = mp.Process(name='NwLogger', target=start_sshlogger,
                                     kwargs=start_nwlogger_kwargs, daemon=False)
@@ -310,6 +369,21 @@ class SSHLogger(BaseLogger):
         logger = SSHLogger.get_logger(self.logger_info(), name=name)
         return logger
 
+    def stats(self, timeout=5.0):
+        ''' Returns dict of server stats (see ListenerStats.snapshot);
+        requires stats.
+
+        Args:
+            timeout: seconds to wait for server process to reply.
+        '''
+        if not self.collect_stats:
+            raise RuntimeError("SSHLogger was created without stats.")
+        if self._stats_connection is None or self.tcpserver is None \
+                or not self.tcpserver.is_alive():
+            raise RuntimeError("SSHLogger server is not running.")
+        return ListenerStats.request(self._stats_connection, self._stats_lock,
+                                     timeout=timeout)
+
     def stop(self,):
         if self.abort:
             self.abort.set()
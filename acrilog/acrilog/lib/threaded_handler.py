@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import time
+import queue
+import logging
+import threading as th
+
+
+class ThreadedHandler(logging.Handler):
+    ''' Handler passing records to a group of handlers on its own thread.
+
+    Records are put on a bounded queue and handled, in order, by a worker
+    thread; hence a slow handler delays only its own group.  When the queue
+    is full, emit waits for room.  Records handled after close are dropped.
+
+    Attributes:
+        last_lag: seconds the last handled record waited in queue.
+        max_lag: maximum seconds a record waited in queue.
+    '''
+
+    _STOP = None
+
+    def __init__(self, *handlers, maxsize=10000, name=None):
+        '''
+        Args:
+            handlers: handlers to pass records to.
+            maxsize: maximum number of records waiting for the group.
+            name: name of worker thread.
+        '''
+        super(ThreadedHandler, self).__init__()
+        self.handlers = handlers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.closed = False
+        if name is None:
+            name = 'ThreadedHandler({})'.format(
+                ', '.join([type(handler).__name__ for handler in handlers]))
+        self._thread = th.Thread(name=name, target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def _monitor(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._STOP:
+                    break
+                record, enqueued = item
+                lag = time.monotonic() - enqueued
+                self.last_lag = lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                for handler in self.handlers:
+                    handler.handle(record)
+            finally:
+                self.queue.task_done()
+
+    def lag(self):
+        ''' Returns (pending records, last lag, max lag).
+        '''
+        return self.queue.qsize(), self.last_lag, self.max_lag
+
+    def handle(self, record):
+        # filtering and locking are done by the group's handlers.
+        if self.closed:
+            # no worker would take it off a full queue.
+            return False
+        self.queue.put((record, time.monotonic()))
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+    def flush(self):
+        ''' waits for queued records to be handled, then flushes the group.
+        '''
+        if self._thread.is_alive():
+            self.queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        self.closed = True
+        if self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join()
+        for handler in self.handlers:
+            handler.close()
+        super(ThreadedHandler, self).close()
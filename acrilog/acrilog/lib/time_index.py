@@ -0,0 +1,291 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Sparse time index of log files.
+
+Handlers split their file into blocks of some records (or bytes), and for
+each block append an entry to the index file (log file name + INDEX_SUFFIX):
+
+    offset: byte offset of the end of the block.
+    block_min: smallest record time (created) in the block.
+    running_max: largest record time up to offset.
+
+Records before an entry's offset are all before its running_max, and records
+of a block are all at or after its block_min.  Hence the start of a time
+range is found by binary search on running_max, and its end at the first
+block whose block_min is past the range.  Records logged out of time order
+(e.g., by processes whose queues drain at different paces) are still found,
+provided disorder does not span blocks beyond the one searched.
+
+Binary log files (see binary_log) are filtered to exact range; text files
+are returned by block, hence may include records around the range.
+
+Seeking into a compressed segment decompresses it up to the offset.
+'''
+
+import os
+import re
+import struct
+from acrilog.lib.log_compressor import COMPRESSIONS
+from acrilog.lib.binary_log import is_binary_log, read_records
+
+
+INDEX_SUFFIX = '.idx'
+
+_ENTRY = struct.Struct('<Qdd')
+
+
+def log_filename(logdir='', name=None, file_prefix=None, file_suffix=None):
+    ''' Returns name of the current log file of name, as named by file
+    handlers ([file_prefix.]name[.file_suffix].log in logdir).
+    '''
+    if file_suffix:
+        name = "%s.%s" % (name, file_suffix)
+    name = "%s.log" % name if name else 'logger.log'
+    if file_prefix:
+        name = "%s.%s" % (file_prefix, name)
+    return os.path.join(logdir or '', name)
+
+
+def index_filename(filename):
+    ''' Returns name of index file of log file filename (compressed or
+    not).
+    '''
+    for extension, _ in COMPRESSIONS.values():
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+            break
+    return filename + INDEX_SUFFIX
+
+
+class TimeIndexWriter(object):
+    ''' Appends index entries of a log file as records are written to it.
+
+    Caller (handler) calls due() before placing a record; if it returns True,
+    checkpoint() with the offset the record will be placed at.  After placing
+    the record, add() with its time and size.
+    '''
+
+    def __init__(self, filename, records=0, size=0, new=False):
+        '''
+        Args:
+            filename: log file name.
+            records: records per block; 0 for no limit.
+            size: bytes per block; 0 for no limit.
+            new: log file starts empty; existing index is dropped.
+        '''
+        if not records and not size:
+            raise ValueError("Index needs records or size per block.")
+        self.filename = index_filename(filename)
+        self.records = records
+        self.size = size
+        self._max = float('-inf')
+        if not new:
+            # appending to log file; carry on its running max.
+            with TimeIndex(self.filename) as index:
+                last = index.last()
+            if last is not None:
+                self._max = last[2]
+        self._file = open(self.filename, 'wb' if new else 'ab', buffering=0)
+        self._start_block()
+
+    def _start_block(self):
+        self._count = 0
+        self._bytes = 0
+        self._min = float('inf')
+
+    def due(self):
+        ''' Returns True if current block is full.
+        '''
+        return bool((self.records and self._count >= self.records) or
+                    (self.size and self._bytes >= self.size))
+
+    def add(self, created, size):
+        ''' accounts record of time created and size bytes in current block.
+        '''
+        self._count += 1
+        self._bytes += size
+        if created < self._min:
+            self._min = created
+        if created > self._max:
+            self._max = created
+
+    def checkpoint(self, offset):
+        ''' ends current block at offset.
+        '''
+        if self._count:
+            self._file.write(_ENTRY.pack(offset, self._min, self._max))
+        self._start_block()
+
+    def close(self, offset):
+        ''' ends last block at offset, and closes index file.
+        '''
+        if self._file is None:
+            return
+        try:
+            self.checkpoint(offset)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class TimeIndex(object):
+    ''' Reads index file; entries are read by seeking, not loaded.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            self._file = open(filename, 'rb')
+        except FileNotFoundError:
+            self._file = None
+
+    def __len__(self):
+        if self._file is None:
+            return 0
+        return os.fstat(self._file.fileno()).st_size // _ENTRY.size
+
+    def __getitem__(self, i):
+        ''' Returns entry i as (offset, block_min, running_max).
+        '''
+        self._file.seek(i * _ENTRY.size)
+        return _ENTRY.unpack(self._file.read(_ENTRY.size))
+
+    def last(self):
+        count = len(self)
+        return self[count - 1] if count else None
+
+    def range(self, start=None, end=None):
+        ''' Returns (begin, stop) offsets of log file holding records from
+        start to end time; stop is None for end of file.
+
+        begin is found by binary search; stop by reading forward from there
+        to the first block starting after end.
+        '''
+        count = len(self)
+        lo = 0
+        begin_entry = -1
+        if start is not None:
+            # last entry whose running_max is before start.
+            hi = count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self[mid][2] < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            begin_entry = lo - 1
+        begin = self[begin_entry][0] if begin_entry >= 0 else 0
+        stop = None
+        if end is not None:
+            for i in range(begin_entry + 1, count):
+                if self[i][1] > end:
+                    stop = self[i - 1][0] if i > 0 else 0
+                    break
+        return begin, stop
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def segments(filename):
+    ''' Returns files of log file filename, oldest first: its backups
+    (filename.N, compressed or not) from highest N, then filename.
+    '''
+    directory, base = os.path.split(filename)
+    pattern = re.compile(r'^{}\.(\d+)({})?$'.format(
+        re.escape(base), '|'.join(re.escape(extension) for extension, _
+                                  in COMPRESSIONS.values())))
+    backups = list()
+    for entry in os.listdir(directory or '.'):
+        match = pattern.match(entry)
+        if match:
+            backups.append((int(match.group(1)),
+                            os.path.join(directory, entry)))
+    files = [name for _, name in sorted(backups, reverse=True)]
+    if os.path.exists(filename):
+        files.append(filename)
+    return files
+
+
+def _open(filename):
+    for extension, open_ in COMPRESSIONS.values():
+        if filename.endswith(extension):
+            return open_(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def query_segment(filename, start=None, end=None):
+    ''' Generates records of a single log file from start to end time.
+
+    Binary log files yield LogRecords within range; text files yield lines
+    (bytes) of the blocks overlapping range.  Without index file, the whole
+    file is read.
+
+    Args:
+        filename: log file, compressed or not.
+        start, end: epoch seconds; None for open range.
+    '''
+    with TimeIndex(index_filename(filename)) as index:
+        begin, stop = index.range(start, end)
+    if stop is not None and stop <= begin:
+        return
+    limit = stop - begin if stop is not None else None
+    with _open(filename) as stream:
+        binary = is_binary_log(stream.read(8))
+        stream.seek(begin)
+        if binary:
+            for record in read_records(stream, limit):
+                if (start is None or record.created >= start) and \
+                        (end is None or record.created <= end):
+                    yield record
+            return
+        read = 0
+        for line in stream:
+            yield line
+            read += len(line)
+            if limit is not None and read >= limit:
+                break
+
+
+def query(filename, start=None, end=None):
+    ''' Generates records from start to end time across all segments of log
+    file filename (see query_segment).
+
+    Args:
+        filename: current log file of name (see log_filename).
+        start, end: epoch seconds; None for open range.
+    '''
+    for segment in segments(filename):
+        try:
+            for item in query_segment(segment, start, end):
+                yield item
+        except FileNotFoundError:
+            # rotated away, or compressed, while querying.
+            continue
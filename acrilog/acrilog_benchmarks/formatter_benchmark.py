@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Compares CompiledLevelBasedFormatter with LevelBasedFormatter on the
+same records, after checking both produce the same text.
+
+    python formatter_benchmark.py --records 100000
+'''
+
+import os
+import sys
+import time
+import logging
+from acrilib import LevelBasedFormatter, logging_record_add_host
+from acrilog.lib.baselogger import BaseLogger
+from acrilog.lib.compiled_formatter import CompiledLevelBasedFormatter
+
+
+def make_records(count):
+    logging_record_add_host()
+    logger = logging.getLogger('acrilog.benchmark')
+    levels = (logging.DEBUG, logging.INFO, logging.INFO, logging.WARNING)
+    records = list()
+    for i in range(count):
+        records.append(logger.makeRecord(
+            logger.name, levels[i % len(levels)], __file__, i,
+            "record %s of %s", (i, count), None, func='make_records'))
+    return records
+
+
+def format_all(formatter, records):
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return time.perf_counter() - start
+
+
+def main(records=100000, repeat=5, datefmt=None):
+    defaults = BaseLogger.logger_info_defaults
+    level_formats = defaults['level_formats']
+    datefmt = datefmt or defaults['datefmt']
+    records = make_records(records)
+    formatters = [
+        ('LevelBasedFormatter', LevelBasedFormatter(
+            level_formats=level_formats, datefmt=datefmt)),
+        ('CompiledLevelBasedFormatter', CompiledLevelBasedFormatter(
+            level_formats=level_formats, datefmt=datefmt)),
+        ]
+
+    base, compiled = (formatter for _, formatter in formatters)
+    for record in records:
+        if base.format(record) != compiled.format(record):
+            sys.stderr.write("Formatters differ: %r != %r\n"
+                             % (base.format(record), compiled.format(record)))
+            return 1
+
+    results = dict()
+    for name, formatter in formatters:
+        results[name] = min(format_all(formatter, records)
+                            for _ in range(repeat))
+        print("%-28s %8.3f usec/record" % (
+            name, results[name] * 1e6 / len(records)))
+    print("speedup %.2fx" % (results['LevelBasedFormatter'] /
+                             results['CompiledLevelBasedFormatter']))
+    return 0
+
+
+def cmdargs():
+    import argparse
+
+    filename = os.path.basename(__file__)
+    progname = filename.rpartition('.')[0]
+
+    parser = argparse.ArgumentParser(
+        description="%s compares record formatters" % progname)
+    parser.add_argument('--records', type=int, default=100000,
+                        help="""Records to format per run.""")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="""Runs per formatter; best is reported.""")
+    parser.add_argument('--datefmt', type=str,
+                        help="""Date format; default is logger default.""")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = cmdargs()
+    sys.exit(main(**vars(args)))
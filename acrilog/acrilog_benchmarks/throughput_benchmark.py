@@ -0,0 +1,285 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Measures throughput and end-to-end latency of MpLogger and SSHLogger.
+
+Every combination of the selected loggers, producer processes, threads per
+process, message sizes, formatters, number of process_key files and console
+on/off is run; results are written as JSON so runs can be compared.
+
+    python throughput_benchmark.py --producers 1 4 --output results.json
+
+Latency of a record is the time from its creation in a producer until the
+listener (or SSHLogger server) handlers, file handlers among them, are done
+with it.  Throughput
+is records per second from the first record created to the last record
+handled.
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import itertools
+import threading as th
+import multiprocessing as mp
+from array import array
+import acrilog
+from acrilog import MpLogger, SSHLogger
+
+
+class LatencyHandler(logging.Handler):
+    ''' Records creation and handling times of benchmark records, and writes
+    them to filename when closed.
+
+    Runs in the listener process; it is given to the logger as a global
+    handler, before which the listener places it: the listener's file (and
+    console) handlers follow it among the handlers of the logger of prefix.
+    On its first record, it wraps the last of them, so a record is timed
+    when it was written.
+    '''
+
+    def __init__(self, filename, prefix='benchmark'):
+        super(LatencyHandler, self).__init__()
+        self.filename = filename
+        self.prefix = prefix
+        self.times = array('d')
+        self._wrapped = False
+
+    def __reduce__(self):
+        return (LatencyHandler, (self.filename, self.prefix))
+
+    def emit(self, record):
+        if not self._wrapped:
+            self._wrapped = True
+            last = logging.getLogger(self.prefix).handlers[-1]
+            handle = last.handle
+
+            def timed_handle(record):
+                result = handle(record)
+                self.stamp(record)
+                return result
+
+            last.handle = timed_handle
+
+    def stamp(self, record):
+        if record.name.startswith(self.prefix):
+            self.times.append(record.created)
+            self.times.append(time.time())
+
+    def close(self):
+        if self.times:
+            with open(self.filename, 'wb') as file:
+                self.times.tofile(file)
+            self.times = array('d')
+        super(LatencyHandler, self).close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def produce(logger_class, logger_info, names, threads, records, size,
+            started):
+    message = 'x' * size
+    loggers = [logger_class.get_logger(logger_info, name=name)
+               for name in names]
+    started.wait()
+
+    def run(thread):
+        for i in range(records):
+            loggers[(thread + i) % len(loggers)].info(
+                'record %s %s', i, message)
+
+    workers = [th.Thread(target=run, args=(thread,))
+               for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    for logger in loggers:
+        for handler in logger.handlers:
+            handler.flush()
+
+
+def run_case(logger_name, producers, threads, size, formatter, files,
+             console, records, logdir):
+    ''' Runs one combination; returns its result dict.
+    '''
+    casedir = tempfile.mkdtemp(dir=logdir)
+    latency_file = os.path.join(casedir, 'latency.bin')
+    kwargs = dict(name='benchmark', logdir=casedir, console=console,
+                  handlers=[LatencyHandler(latency_file)])
+    if formatter == 'json':
+        kwargs['level_fields'] = {}
+    logger_class = MpLogger if logger_name == 'mp' else SSHLogger
+    logger = logger_class(**kwargs)
+
+    # console output is discarded; listener inherits the descriptors.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    if console:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+    try:
+        logger.start()
+        logger_info = logger.logger_info()
+        # each file key is a logger name, under the top logger.
+        names = ['benchmark.k%d' % key for key in range(files)]
+        started = mp.Event()
+        processes = [mp.Process(target=produce, args=(
+            logger_class, logger_info, names, threads, records, size,
+            started)) for _ in range(producers)]
+        for process in processes:
+            process.start()
+        started.set()
+        for process in processes:
+            process.join()
+        logger.stop()
+    finally:
+        for fd, copy in enumerate(saved, 1):
+            os.dup2(copy, fd)
+            os.close(copy)
+        os.close(devnull)
+
+    times = array('d')
+    if os.path.isfile(latency_file):
+        with open(latency_file, 'rb') as file:
+            times.frombytes(file.read())
+    shutil.rmtree(casedir, ignore_errors=True)
+    created, handled = times[0::2], times[1::2]
+    expected = producers * threads * records
+    result = dict(logger=logger_name, producers=producers, threads=threads,
+                  size=size, formatter=formatter, files=files,
+                  console=console, records=expected, handled=len(created))
+    if not created:
+        return result
+    seconds = max(handled) - min(created)
+    latencies = sorted(h - c for c, h in zip(created, handled))
+    result.update(
+        seconds=seconds,
+        records_per_second=len(created) / seconds if seconds else None,
+        latency=dict(p50=percentile(latencies, 0.5),
+                     p99=percentile(latencies, 0.99),
+                     p999=percentile(latencies, 0.999),
+                     max=latencies[-1]))
+    return result
+
+
+def main(loggers=('mp', 'ssh'), producers=(1, 4), threads=(1,),
+         sizes=(100,), formatters=('text',), files=(1,), console=('off',),
+         records=10000, logdir=None, output=None):
+    cases = list(itertools.product(loggers, producers, threads, sizes,
+                                   formatters, files, console))
+    logdir = tempfile.mkdtemp(dir=logdir, prefix='acrilog_benchmark.')
+    results = list()
+    try:
+        for n, case in enumerate(cases, 1):
+            logger_name, producer_count, thread_count, size, formatter, \
+                file_count, console_on = case
+            result = run_case(logger_name, producer_count, thread_count,
+                              size, formatter, file_count,
+                              console_on == 'on', records, logdir)
+            results.append(result)
+            latency = result.get('latency', {})
+            sys.stderr.write(
+                "[%d/%d] %s producers=%d threads=%d size=%d formatter=%s "
+                "files=%d console=%s: %s records/sec, p50 %s, p99 %s, "
+                "p999 %s sec; handled %d of %d\n"
+                % (n, len(cases), logger_name, producer_count, thread_count,
+                   size, formatter, file_count, console_on,
+                   '%.0f' % result['records_per_second']
+                   if result.get('records_per_second') else '-',
+                   '%.6f' % latency['p50'] if latency else '-',
+                   '%.6f' % latency['p99'] if latency else '-',
+                   '%.6f' % latency['p999'] if latency else '-',
+                   result['handled'], result['records']))
+    finally:
+        shutil.rmtree(logdir, ignore_errors=True)
+
+    report = dict(
+        acrilog=acrilog.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        time=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        records_per_thread=records,
+        results=results)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    return 0 if all(result['handled'] == result['records']
+                    for result in results) else 1
+
+
+def cmdargs():
+    import argparse
+
+    filename = os.path.basename(__file__)
+    progname = filename.rpartition('.')[0]
+
+    parser = argparse.ArgumentParser(
+        description="%s measures logger throughput and latency" % progname)
+    parser.add_argument('--loggers', nargs='+', choices=['mp', 'ssh'],
+                        default=['mp', 'ssh'],
+                        help="""Loggers to run; ssh is SSHLogger over
+                        localhost.""")
+    parser.add_argument('--producers', nargs='+', type=int, default=[1, 4],
+                        help="""Producer process counts.""")
+    parser.add_argument('--threads', nargs='+', type=int, default=[1],
+                        help="""Threads per producer process.""")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100],
+                        help="""Message sizes in characters.""")
+    parser.add_argument('--formatters', nargs='+', choices=['text', 'json'],
+                        default=['text'],
+                        help="""text uses level_formats, json level_fields
+                        (JsonLinesFormatter).""")
+    parser.add_argument('--files', nargs='+', type=int, default=[1],
+                        help="""Numbers of logger names (process_key files)
+                        records are spread over.""")
+    parser.add_argument('--console', nargs='+', choices=['on', 'off'],
+                        default=['off'],
+                        help="""Console handler on and/or off; console
+                        output is discarded.""")
+    parser.add_argument('--records', type=int, default=10000,
+                        help="""Records per producer thread.""")
+    parser.add_argument('--logdir', type=str,
+                        help="""Directory for temporary log files; default
+                        system temporary directory.""")
+    parser.add_argument('--output', '-o', type=str,
+                        help="""JSON results file; default stdout.""")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = cmdargs()
+    sys.exit(main(**vars(args)))
@@ -61,6 +61,10 @@ setup_info = {
     'keywords': 'library logger multiprocessing',
     'packages': packages,
     'scripts': scripts,
+    'entry_points': {
+        'console_scripts': [
+            'acrilog-grep=acrilog.bin.acrilog_grep:run',
+            ]},
     'install_requires': required,
     'extras_require': {'dev': [], 'test': []},
     'classifiers': [
@@ -0,0 +1,41 @@
+import os
+import logging
+import multiprocessing as mp
+import pytest
+
+
+def produce(logger_class, logger_info, name, count, level=logging.INFO):
+    logger = logger_class.get_logger(logger_info, name=name)
+    for i in range(count):
+        logger.log(level, 'record %s %s', name, i)
+
+
+@pytest.fixture
+def run_producers():
+    ''' Returns function running producer processes, each logging count
+    records to its logger name, and waiting for them.
+    '''
+    def run(logger_class, logger_info, names, count, level=logging.INFO,
+            target=produce):
+        processes = [mp.Process(target=target, args=(
+            logger_class, logger_info, name, count, level))
+            for name in names]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return [process.exitcode for process in processes]
+    return run
+
+
+@pytest.fixture
+def read_log(tmp_path):
+    ''' Returns function returning lines of log file of name in tmp_path.
+    '''
+    def read(name, logdir=None):
+        filename = os.path.join(str(logdir or tmp_path), name + '.log')
+        if not os.path.isfile(filename):
+            return []
+        with open(filename) as file:
+            return file.read().splitlines()
+    return read
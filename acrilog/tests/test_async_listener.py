@@ -0,0 +1,80 @@
+import time
+import logging
+import logging.handlers
+import multiprocessing as mp
+import pytest
+from acrilog import AsyncLogListener
+from acrilib import get_free_port
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, delay=0.0):
+        super(ListHandler, self).__init__()
+        self.messages = list()
+        self.delay = delay
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append(record.getMessage())
+
+
+def make_record(msg):
+    return logging.LogRecord('acrilog.test', logging.INFO, __file__, 1, msg,
+                             (), None)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.mark.parametrize('transport', ['queue', 'shm'])
+def test_busy_queue_yields_to_event_loop(transport):
+    if transport == 'shm':
+        from acrilog import SharedMemoryQueue
+        q = SharedMemoryQueue(size=1024 * 1024)
+    else:
+        q = mp.Queue()
+    for i in range(100):
+        q.put(make_record('record %d' % i))
+    time.sleep(0.1)
+
+    handler = ListHandler(delay=0.002)
+    listener = AsyncLogListener(handler, drain_limit=5)
+    listener.add_queue(q)
+    listener.start()
+    handled_at_callback = list()
+    listener.loop.call_soon_threadsafe(
+        lambda: handled_at_callback.append(len(handler.messages)))
+    try:
+        assert wait_for(lambda: len(handler.messages) == 100)
+        # the callback ran while the queue was still being drained.
+        assert handled_at_callback[0] < 100
+        assert handler.messages == ['record %d' % i for i in range(100)]
+    finally:
+        listener.stop()
+        if transport == 'shm':
+            q.close()
+            q.unlink()
+
+
+def test_queue_and_tcp_records_are_handled():
+    q = mp.Queue()
+    port = get_free_port()
+    handler = ListHandler()
+    listener = AsyncLogListener(handler)
+    listener.add_queue(q).add_tcp('localhost', port)
+    listener.start()
+    try:
+        q.put(make_record('from queue'))
+        socket_handler = logging.handlers.SocketHandler('localhost', port)
+        socket_handler.handle(make_record('from socket'))
+        socket_handler.close()
+        assert wait_for(lambda: len(handler.messages) == 2)
+        assert sorted(handler.messages) == ['from queue', 'from socket']
+    finally:
+        listener.stop()
@@ -0,0 +1,100 @@
+import io
+import sys
+import logging
+import pytest
+from acrilog import BinaryRecordEncoder, BufferedFileHandler, \
+    LogCompressor, read_records, convert_to_text
+from acrilog.lib.binary_log import read_tuples, is_binary_log
+
+
+def make_record(msg, args=(), level=logging.INFO, name='acrilog.test'):
+    record = logging.LogRecord(name, level, __file__, 10, msg, args, None,
+                               func='test')
+    record.host = 'localhost'
+    return record
+
+
+def encode(records):
+    encoder = BinaryRecordEncoder()
+    return io.BytesIO(b''.join([encoder.encode(record)
+                                for record in records]))
+
+
+def test_records_round_trip():
+    record = make_record('record %s', args=(0,))
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        failed = make_record('failed', level=logging.ERROR)
+        failed.exc_info = sys.exc_info()
+    del failed.host
+    decoded = list(read_records(encode([record, failed])))
+
+    assert [r.getMessage() for r in decoded] == ['record 0', 'failed']
+    assert decoded[0].created == record.created
+    for field in ('name', 'levelno', 'levelname', 'process', 'processName',
+                  'lineno', 'module', 'funcName', 'host'):
+        assert getattr(decoded[0], field) == getattr(record, field)
+    assert decoded[0].exc_text is None
+    assert decoded[1].host is None
+    assert decoded[1].exc_text.endswith('ValueError: failed')
+
+
+@pytest.mark.parametrize('level', [-1, 5, 70000])
+def test_custom_levels_round_trip(level):
+    decoded, = read_tuples(encode([make_record('custom', level=level)]))
+    assert decoded['levelno'] == level
+
+
+def test_strings_are_defined_once_per_segment():
+    encoder = BinaryRecordEncoder()
+    first = encoder.encode(make_record('record 0'))
+    second = encoder.encode(make_record('record 1'))
+    assert is_binary_log(first) and not is_binary_log(second)
+    assert b'acrilog.test' in first and b'acrilog.test' not in second
+    encoder.reset()
+    assert is_binary_log(encoder.encode(make_record('record 2')))
+
+
+def test_truncated_last_entry_is_ignored():
+    data = encode([make_record('record 0'), make_record('record 1')])\
+        .getvalue()
+    records = list(read_tuples(io.BytesIO(data[:-1])))
+    assert [record['msg'] for record in records] == ['record 0']
+
+
+def test_text_file_is_rejected():
+    with pytest.raises(ValueError):
+        list(read_tuples(io.BytesIO(b'not a binary log file\n')))
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_handler_rollover_starts_segment_in_each_file(tmp_path, compress):
+    compressor = LogCompressor() if compress else None
+    handler = BufferedFileHandler(str(tmp_path / 'test.log'), maxBytes=300,
+                                  backupCount=20, buffer_size=1024,
+                                  binary=True, compressor=compressor)
+    for i in range(30):
+        handler.handle(make_record('record %02d' % i))
+    handler.close()
+    if compressor is not None:
+        compressor.shutdown()
+
+    extension = compressor.extension if compress else ''
+    files = [tmp_path / ('test.log.%d%s' % (i, extension))
+             for i in range(20, 0, -1)] + [tmp_path / 'test.log']
+    files = [f for f in files if f.exists()]
+    assert len(files) > 1
+    messages = list()
+    for f in files:
+        messages.extend([record['msg'] for record in read_tuples(str(f))])
+    assert messages == ['record %02d' % i for i in range(30)]
+
+
+def test_convert_to_text():
+    dest = io.StringIO()
+    count = convert_to_text(
+        encode([make_record('record 0'), make_record('record 1')]), dest,
+        formatter=logging.Formatter('%(levelname)s %(message)s'))
+    assert count == 2
+    assert dest.getvalue() == 'INFO record 0\nINFO record 1\n'
@@ -0,0 +1,81 @@
+import logging
+import pytest
+from acrilog import BufferedFileHandler, HierarchicalBufferedFileHandler
+from acrilog.lib.buffered_file_handler import create_hierarchical_handler
+
+
+def make_record(msg, level=logging.INFO, name='acrilog.test'):
+    return logging.LogRecord(name, level, __file__, 1, msg, (), None)
+
+
+def create_handler(filename, **kwargs):
+    kwargs.setdefault('flush_interval', 60)
+    handler = BufferedFileHandler(str(filename), **kwargs)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+def lines_of(filename):
+    return filename.read_text().splitlines() if filename.exists() else []
+
+
+def test_buffer_is_written_on_size_level_and_flush(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename, buffer_size=30)
+    handler.handle(make_record('record 0'))
+    handler.handle(make_record('record 1'))
+    assert lines_of(filename) == []
+    handler.handle(make_record('record 2'))
+    handler.handle(make_record('record 3'))
+    assert lines_of(filename) == ['record %d' % i for i in range(4)]
+    handler.handle(make_record('record 4'))
+    handler.handle(make_record('record 5', level=logging.ERROR))
+    assert lines_of(filename) == ['record %d' % i for i in range(6)]
+    handler.handle(make_record('record 6'))
+    handler.flush()
+    assert lines_of(filename) == ['record %d' % i for i in range(7)]
+    handler.handle(make_record('record 7'))
+    handler.close()
+    assert lines_of(filename) == ['record %d' % i for i in range(8)]
+
+
+def test_size_rollover_counts_buffered_bytes(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename, buffer_size=1024, maxBytes=100,
+                             backupCount=20)
+    for i in range(50):
+        handler.handle(make_record('record %02d' % i))
+    handler.close()
+
+    files = [tmp_path / ('test.log.%d' % i) for i in range(20, 0, -1)] + \
+        [filename]
+    files = [f for f in files if f.exists()]
+    assert len(files) > 1
+    for f in files:
+        assert f.stat().st_size <= 100
+    assert sum([lines_of(f) for f in files], []) == \
+        ['record %02d' % i for i in range(50)]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'flush_interval': 0},
+    {'flush_interval': -1},
+    {'fsync': 'interval', 'fsync_interval': 0},
+    {'fsync': 'always'},
+    ])
+def test_invalid_arguments_are_rejected(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        create_handler(tmp_path / 'test.log', **kwargs)
+
+
+def test_hierarchical_handler_logs_each_level_of_key(tmp_path):
+    handler = create_hierarchical_handler(
+        logdir=str(tmp_path), formatter=logging.Formatter('%(message)s'),
+        consolidate='all', file_buffer_size=4096)
+    assert isinstance(handler, HierarchicalBufferedFileHandler)
+    handler.handle(make_record('record 0', name='app.db'))
+    handler.handle(make_record('record 1', name='app'))
+    handler.close()
+    assert lines_of(tmp_path / 'app.db.log') == ['record 0']
+    assert lines_of(tmp_path / 'app.log') == ['record 0', 'record 1']
+    assert lines_of(tmp_path / 'all.log') == ['record 0', 'record 1']
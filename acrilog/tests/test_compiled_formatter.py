@@ -0,0 +1,69 @@
+import sys
+import pickle
+import logging
+import pytest
+from acrilog import CompiledLevelBasedFormatter, LevelBasedFormatter
+from acrilog.lib.baselogger import BaseLogger
+from acrilog.lib.compiled_formatter import compile_format
+
+LEVEL_FORMATS = BaseLogger.logger_info_defaults['level_formats']
+
+
+def make_records():
+    records = list()
+    for i, created in enumerate((1500000000.25, 1500000000.1234565,
+                                 1500000000.9999996, 1500000001.0)):
+        for level in (logging.DEBUG, logging.INFO, logging.ERROR):
+            record = logging.LogRecord('acrilog.test', level, __file__, 10,
+                                       'record %s of %d%%', ('é', i), None,
+                                       func='test')
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+            record.host = 'localhost'
+            records.append(record)
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        record = logging.LogRecord('acrilog.test', logging.ERROR, __file__,
+                                   10, 'failed', (), sys.exc_info(),
+                                   sinfo='stack')
+        record.host = 'localhost'
+        records.append(record)
+    return records
+
+
+@pytest.mark.parametrize('level_formats', [
+    LEVEL_FORMATS,
+    {'default': '%(levelname)-8s|%(lineno)05d|%(message)r 100%%',
+     logging.ERROR: '%(asctime)s %(name)s: %(message)s'},
+    # not compiled.
+    {'default': '%(asctime)s %(lineno)ld %(message)s'},
+    ])
+@pytest.mark.parametrize('datefmt', [
+    None, '%Y-%m-%d,%H:%M:%S.%f', '%H:%M:%S.%f %Y %f', '%Y-%m-%d %H:%M',
+    '%H:%M:%S.%%f'])
+def test_output_is_as_level_based_formatter(level_formats, datefmt):
+    compiled = CompiledLevelBasedFormatter(level_formats=level_formats,
+                                           datefmt=datefmt)
+    expected = LevelBasedFormatter(level_formats=level_formats,
+                                   datefmt=datefmt)
+    for record in make_records():
+        text = expected.format(record)
+        record.exc_text = None
+        assert compiled.format(record) == text
+
+
+def test_format_compiles_referenced_fields():
+    function, uses_time = compile_format('%(name)s: %(message)s')
+    assert not uses_time
+    assert function({'name': 'app'}, 'message', None) == 'app: message'
+    assert compile_format('100%% done')[0]({}, None, None) == '100% done'
+    assert compile_format('%(lineno)ld') == (None, False)
+
+
+def test_pickled_formatter_is_compiled_again():
+    formatter = CompiledLevelBasedFormatter(level_formats=LEVEL_FORMATS,
+                                            datefmt='%H:%M:%S.%f')
+    copy = pickle.loads(pickle.dumps(formatter))
+    for record in make_records()[:-1]:
+        assert copy.format(record) == formatter.format(record)
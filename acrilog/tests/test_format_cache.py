@@ -0,0 +1,78 @@
+import pickle
+import logging
+from acrilog.lib.format_cache import SharedFormatter
+
+
+class CountingFormatter(logging.Formatter):
+    def __init__(self):
+        super(CountingFormatter, self).__init__('%(levelname)s %(message)s')
+        self.count = 0
+
+    def format(self, record):
+        self.count += 1
+        return super(CountingFormatter, self).format(record)
+
+
+class TextStream(object):
+    def __init__(self):
+        self.text = ''
+
+    def write(self, text):
+        self.text += text
+
+    def flush(self):
+        pass
+
+
+def make_record(msg):
+    return logging.LogRecord('acrilog.test', logging.INFO, __file__, 1, msg,
+                             (), None)
+
+
+def test_record_is_formatted_once():
+    formatter = SharedFormatter(CountingFormatter())
+    record = make_record('record 0')
+    assert formatter.format(record) == 'INFO record 0'
+    assert formatter.format(record) == 'INFO record 0'
+    assert formatter.format_bytes(record) == b'INFO record 0\n'
+    assert formatter.format_bytes(record) == b'INFO record 0\n'
+    assert formatter.formatter.count == 1
+
+    assert formatter.format(make_record('record 1')) == 'INFO record 1'
+    assert formatter.formatter.count == 2
+
+
+def test_bytes_are_cached_by_terminator_and_encoding():
+    formatter = SharedFormatter(CountingFormatter())
+    record = make_record('récord')
+    assert formatter.format_bytes(record) == 'INFO récord\n'.encode('utf8')
+    assert formatter.format_bytes(record, '\r\n', 'latin1') == \
+        'INFO récord\r\n'.encode('latin1')
+    assert formatter.formatter.count == 1
+
+
+def test_handlers_share_formatting():
+    formatter = SharedFormatter.of(CountingFormatter())
+    assert SharedFormatter.of(formatter) is formatter
+    assert SharedFormatter.of(None) is None
+    handlers = list()
+    for _ in range(3):
+        handler = logging.StreamHandler(stream=TextStream())
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    record = make_record('record 0')
+    for handler in handlers:
+        handler.handle(record)
+    assert [handler.stream.text for handler in handlers] == \
+        ['INFO record 0\n'] * 3
+    assert formatter.formatter.count == 1
+
+
+def test_cache_is_not_pickled():
+    formatter = SharedFormatter(CountingFormatter())
+    record = make_record('record 0')
+    formatter.format_bytes(record)
+    copy = pickle.loads(pickle.dumps(formatter))
+    assert copy._text == (None, None)
+    assert copy._bytes == (None, None, None)
+    assert copy.format(record) == 'INFO record 0'
@@ -0,0 +1,105 @@
+import logging
+import pytest
+from acrilog import HandlerPool
+from acrilog.lib.mplogger import MpQueueListener
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super(ListHandler, self).__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+
+
+def file_factory(tmp_path, calls):
+    def factory(key, reopen):
+        calls.append((key, reopen))
+        handler = logging.FileHandler(str(tmp_path / ('%s.log' % key)),
+                                      mode='a' if reopen else 'w')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        return handler
+    return factory
+
+
+def log(handlers, msg):
+    for handler in handlers:
+        handler.handle(logging.makeLogRecord({'msg': msg}))
+
+
+def test_least_recently_used_key_is_evicted(tmp_path):
+    calls = list()
+    evicted = list()
+    pool = HandlerPool(file_factory(tmp_path, calls), max_open=2,
+                       on_evict=evicted.append)
+    log(pool.get('a'), 'a 0')
+    log(pool.get('b'), 'b 0')
+    pool.touch('a')
+    log(pool.get('c'), 'c 0')
+    assert evicted == ['b']
+    assert 'a' in pool and 'b' not in pool and len(pool) == 2
+    assert pool.stats() == {'hits': 1, 'misses': 3, 'evictions': 1,
+                            'open': 2}
+    pool.close()
+
+
+def test_evicted_key_is_reopened_in_append_mode(tmp_path):
+    calls = list()
+    pool = HandlerPool(file_factory(tmp_path, calls), max_open=1)
+    log(pool.get('a'), 'a 0')
+    log(pool.get('b'), 'b 0')
+    log(pool.get('a'), 'a 1')
+    pool.close()
+    assert calls == [('a', False), ('b', False), ('a', True)]
+    assert (tmp_path / 'a.log').read_text().split() == ['a', '0', 'a', '1']
+
+
+def test_remove_keeps_handler_open(tmp_path):
+    pool = HandlerPool(file_factory(tmp_path, list()))
+    handler, = pool.get('a')
+    assert pool.remove(handler)
+    assert not pool.remove(handler)
+    assert pool.get('a') == []
+    log([handler], 'a 0')
+    handler.close()
+
+
+def test_max_open_must_be_positive():
+    with pytest.raises(ValueError):
+        HandlerPool(lambda key, reopen: [], max_open=0)
+
+
+def test_listener_eviction_drops_routes():
+    opened = dict()
+
+    def factory(key, reopen):
+        handler = opened[key, reopen] = ListHandler()
+        return [handler]
+
+    listener = MpQueueListener(None, name='test', max_open_files=1)
+    listener.handler_pool.factory = factory
+    for msg, process_name in [('p1 0', 'p1'), ('p2 0', 'p2'),
+                              ('p1 1', 'p1')]:
+        listener.handle(logging.makeLogRecord({
+            'name': 'test', 'msg': msg, 'levelno': logging.INFO,
+            'processName': process_name}))
+    assert list(listener._routes) == [('p1',)]
+    assert opened[('processName', 'p1'), False].records == ['p1 0']
+    assert opened[('processName', 'p2'), False].records == ['p2 0']
+    assert opened[('processName', 'p1'), True].records == ['p1 1']
+
+
+def test_listener_reopens_file_of_each_key(tmp_path, read_log):
+    listener = MpQueueListener(
+        None, name='test', logdir=str(tmp_path), max_open_files=1,
+        formatter=logging.Formatter('%(message)s'), file_mode='w')
+    for msg, process_name in [('p1 0', 'p1'), ('p2 0', 'p2'),
+                              ('p1 1', 'p1')]:
+        listener.handle(logging.makeLogRecord({
+            'name': 'test', 'msg': msg, 'levelno': logging.INFO,
+            'processName': process_name}))
+    assert listener.handler_pool.stats()['evictions'] == 2
+    listener.handler_pool.evict(('processName', 'p1'))
+    assert read_log('test.p1') == ['p1 0', 'p1 1']
+    assert read_log('test.p2') == ['p2 0']
@@ -0,0 +1,74 @@
+import sys
+import json
+import logging
+from datetime import datetime
+import pytest
+from acrilog import JsonLinesFormatter
+
+
+def make_record(msg='record %s', args=(0,), level=logging.INFO, **kwargs):
+    record = logging.LogRecord('acrilog.test', level, __file__, 10, msg,
+                               args, None, func='test')
+    record.__dict__.update(kwargs)
+    return record
+
+
+def test_fields_by_level():
+    formatter = JsonLinesFormatter(level_fields={
+        logging.ERROR: ('levelname', 'message', 'lineno')})
+    record = make_record(host='localhost')
+    assert json.loads(formatter.format(record)) == {
+        'asctime': formatter.formatTime(record), 'levelname': 'INFO',
+        'host': 'localhost', 'processName': record.processName,
+        'message': 'record 0'}
+    record = make_record(level=logging.ERROR)
+    assert json.loads(formatter.format(record)) == {
+        'levelname': 'ERROR', 'message': 'record 0', 'lineno': 10}
+
+
+def test_values_are_valid_json():
+    formatter = JsonLinesFormatter(level_fields={'default': (
+        'message', 'text', 'number', 'ratio', 'flag', 'missing', 'other',
+        'nan', 'inf', 'ninf')})
+    record = make_record(msg='say "%s"\n', args=('é',), text='a\tb',
+                         number=2 ** 70, ratio=0.1, flag=True, other=(1, 2),
+                         nan=float('nan'), inf=float('inf'),
+                         ninf=float('-inf'))
+    assert json.loads(formatter.format(record)) == {
+        'message': 'say "é"\n', 'text': 'a\tb', 'number': 2 ** 70,
+        'ratio': 0.1, 'flag': True, 'missing': None, 'other': '(1, 2)',
+        'nan': 'NaN', 'inf': 'Infinity', 'ninf': '-Infinity'}
+
+
+@pytest.mark.parametrize('fields', [(), ('message',)])
+def test_exception_and_stack_are_added(fields):
+    formatter = JsonLinesFormatter(level_fields={'default': fields})
+    assert formatter.format(make_record()) == \
+        ('{"message":"record 0"}' if fields else '{}')
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        record = make_record(exc_info=sys.exc_info(), stack_info='stack')
+    formatted = json.loads(formatter.format(record))
+    assert formatted['exc_text'].endswith('ValueError: failed')
+    assert formatted['stack_info'] == 'stack'
+
+
+@pytest.mark.parametrize('datefmt', [None, '%Y-%m-%d,%H:%M:%S.%f',
+                                     '%H:%M:%S.%f %Y %f', '%Y-%m-%d %H:%M',
+                                     '%H:%M:%S.%%f', '%%%H:%M:%S.%f'])
+def test_time_is_formatted_as_datetime_does(datefmt):
+    formatter = JsonLinesFormatter(datefmt=datefmt)
+    # fractions that do not round, round up, and carry to next second.
+    for created in (1500000000.25, 1500000000.1234565, 1500000000.9999996,
+                    1500000001.0000004):
+        record = make_record()
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        date = datetime.fromtimestamp(created)
+        if datefmt is None:
+            expected = '%s.%03d' % (date.strftime('%Y-%m-%d %H:%M:%S'),
+                                    record.msecs)
+        else:
+            expected = date.strftime(datefmt)
+        assert formatter.formatTime(record) == expected
@@ -0,0 +1,52 @@
+import logging
+import multiprocessing as mp
+from acrilog import LevelControl, MpLogger
+
+
+def test_longest_prefix_wins():
+    control = LevelControl(slots=4)
+    control.set_level('app.*', logging.WARNING)
+    control.set_level('app.db', 'DEBUG')
+    assert control.level_for('app.db.pool') == logging.DEBUG
+    assert control.level_for('app.web') == logging.WARNING
+    assert control.level_for('application') == logging.NOTSET
+    control.reset_level('app.db')
+    assert control.level_for('app.db.pool') == logging.WARNING
+
+
+def test_attached_logger_follows_table():
+    control = LevelControl(slots=4)
+    logger = logging.getLogger('acrilog.test.level_control')
+    control.attach(logger, logging.INFO)
+    assert logger.isEnabledFor(logging.INFO)
+    control.set_level('acrilog.test', logging.ERROR)
+    assert not logger.isEnabledFor(logging.WARNING)
+    control.reset_level('acrilog.test')
+    assert logger.isEnabledFor(logging.INFO)
+
+
+def child(logger_info, name, changed, logged):
+    logger = MpLogger.get_logger(logger_info, name=name)
+    logger.info('before change')
+    changed.wait(10)
+    logger.info('info after change')
+    logger.warning('warning after change')
+    logged.set()
+
+
+def test_forked_children_see_level_changes(tmp_path, read_log):
+    mplogger = MpLogger(name='lc', logdir=str(tmp_path), level_control=True)
+    mplogger.start()
+    changed, logged = mp.Event(), mp.Event()
+    process = mp.Process(target=child, args=(
+        mplogger.logger_info(), 'lc.child', changed, logged))
+    process.start()
+    mplogger.set_level('lc.*', logging.WARNING)
+    changed.set()
+    logged.wait(10)
+    process.join()
+    mplogger.stop()
+    lines = read_log('lc.child')
+    messages = [line for line in lines if 'change' in line]
+    assert 'info after change' not in '\n'.join(messages)
+    assert any('warning after change' in line for line in messages)
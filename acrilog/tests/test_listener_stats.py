@@ -0,0 +1,80 @@
+import json
+import time
+import logging
+import pytest
+from acrilog import ListenerStats, MpLogger
+from acrilog.lib.buffered_file_handler import create_hierarchical_handler
+from acrilog.lib.format_cache import SharedFormatter
+
+
+class RejectFilter(logging.Filter):
+    def filter(self, record):
+        return 'rejected' not in record.msg
+
+
+def make_record(msg, name='app'):
+    return logging.LogRecord(name, logging.INFO, __file__, 1, msg, (), None)
+
+
+# acrilib's hierarchical handler, the default, does not apply filters.
+@pytest.mark.parametrize('kwargs, rejected', [
+    ({}, False), ({'file_buffer_size': 4096}, False),
+    ({'file_buffer_size': 4096}, True)])
+def test_handler_bytes_are_those_written(tmp_path, kwargs, rejected):
+    formatter = SharedFormatter(logging.Formatter('%(message)s'))
+    handler = create_hierarchical_handler(logdir=str(tmp_path),
+                                          formatter=formatter, **kwargs)
+    stats = ListenerStats()
+    wrapped = stats.wrap(handler, formatter=formatter)
+    for i in range(10):
+        wrapped.handle(make_record('record %d' % i))
+    if rejected:
+        handler.addFilter(RejectFilter())
+        wrapped.handle(make_record('rejected'))
+    wrapped.close()
+
+    snapshot, = stats.snapshot()['handlers']
+    assert snapshot['handler'] == type(handler).__name__
+    assert snapshot['records'] == 10 + rejected
+    assert snapshot['bytes'] == (tmp_path / 'app.log').stat().st_size
+    assert snapshot['bytes'] == sum(len('record %d\n' % i)
+                                    for i in range(10))
+    assert sum(count for _, count in snapshot['emit_time']['buckets']) == \
+        10 + rejected
+    assert snapshot['emit_time']['max'] >= snapshot['emit_time']['mean']
+
+
+def test_bytes_are_unknown_without_shared_formatter():
+    handler = logging.NullHandler()
+    wrapped = ListenerStats().wrap(handler)
+    wrapped.handle(make_record('record 0'))
+    assert wrapped.snapshot()['bytes'] is None
+    assert wrapped.snapshot()['records'] == 1
+
+
+def test_snapshot_of_listener(tmp_path, read_log):
+    stats_file = tmp_path / 'stats.json'
+    mplogger = MpLogger(name='st', logdir=str(tmp_path), stats=True,
+                        stats_file=str(stats_file), stats_interval=60)
+    logger = mplogger.start(name='st.main')
+    try:
+        for i in range(10):
+            logger.info('record %d', i)
+        deadline = time.time() + 10
+        snapshot = mplogger.stats()
+        while snapshot['records_out'] < 10 and time.time() < deadline:
+            time.sleep(0.1)
+            snapshot = mplogger.stats()
+    finally:
+        mplogger.stop()
+    assert snapshot['records_in'] == snapshot['records_out'] == 10
+    assert snapshot['dropped'] == {'queue_full': 0, 'rate_limited': 0,
+                                   'transport': 0}
+    assert snapshot['queue_depth'] == [{'items': 0, 'bytes': None}]
+    handler, = snapshot['handlers']
+    assert handler['records'] == 10
+    assert handler['bytes'] == len(''.join(read_log('st.main'))) + 10
+
+    # written when the listener stops.
+    with open(str(stats_file)) as file:
+        assert json.load(file)['records_out'] == 10
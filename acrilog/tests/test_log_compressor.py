@@ -0,0 +1,94 @@
+import time
+import logging
+import threading as th
+import pytest
+from acrilog import BufferedFileHandler, LogCompressor
+from acrilog.lib.log_compressor import COMPRESSIONS
+
+
+def make_record(msg):
+    return logging.LogRecord('acrilog.test', logging.INFO, __file__, 1, msg,
+                             (), None)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        LogCompressor(method='zip')
+
+
+@pytest.mark.parametrize('method', sorted(COMPRESSIONS))
+def test_rotator_compresses_segment_into_backup_name(tmp_path, method):
+    extension, open_ = COMPRESSIONS[method]
+    compressor = LogCompressor(method=method)
+    source = tmp_path / 'test.log'
+    source.write_text('record 0\n')
+    dest = compressor.namer(str(source) + '.1')
+    assert dest == str(source) + '.1' + extension
+
+    compressor.rotator(str(source), dest)
+    compressor.wait(str(source))
+    assert not source.exists()
+    # segment is renamed aside without extension, then removed.
+    assert not (tmp_path / 'test.log.1').exists()
+    with open_(dest, 'rt') as f:
+        assert f.read() == 'record 0\n'
+    compressor.shutdown()
+
+
+@pytest.mark.parametrize('method', sorted(COMPRESSIONS))
+def test_handler_keeps_backup_count_of_compressed_segments(tmp_path, method):
+    extension, open_ = COMPRESSIONS[method]
+    compressor = LogCompressor(method=method)
+    handler = BufferedFileHandler(str(tmp_path / 'test.log'), maxBytes=30,
+                                  backupCount=2, buffer_size=0,
+                                  compressor=compressor)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(12):
+        handler.handle(make_record('record %02d' % i))
+    handler.close()
+    compressor.shutdown()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ['test.log', 'test.log.1' + extension, 'test.log.2' + extension]
+    lines = list()
+    for i in (2, 1):
+        with open_(str(tmp_path / ('test.log.%d%s' % (i, extension))),
+                   'rt') as f:
+            lines.extend(f.read().splitlines())
+    lines.extend((tmp_path / 'test.log').read_text().splitlines())
+    assert lines == ['record %02d' % i for i in range(12 - len(lines), 12)]
+
+
+def test_rollover_does_not_wait_for_compression(tmp_path, monkeypatch):
+    extension, open_ = COMPRESSIONS['gzip']
+    compressor = LogCompressor()
+    gate = th.Event()
+    compress = compressor._compress
+
+    def slow_compress(segment, dest):
+        gate.wait(10)
+        compress(segment, dest)
+
+    monkeypatch.setattr(compressor, '_compress', slow_compress)
+    handler = BufferedFileHandler(str(tmp_path / 'test.log'), maxBytes=30,
+                                  backupCount=3, buffer_size=0,
+                                  compressor=compressor)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    start = time.monotonic()
+    for i in range(12):
+        handler.handle(make_record('record %02d' % i))
+    # five rollovers queued behind the gate.
+    assert time.monotonic() - start < 5
+    gate.set()
+    handler.close()
+    compressor.shutdown()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ['test.log'] + ['test.log.%d%s' % (i, extension) for i in (1, 2, 3)]
+    lines = list()
+    for i in (3, 2, 1):
+        with open_(str(tmp_path / ('test.log.%d%s' % (i, extension))),
+                   'rt') as f:
+            lines.extend(f.read().splitlines())
+    lines.extend((tmp_path / 'test.log').read_text().splitlines())
+    assert lines == ['record %02d' % i for i in range(12 - len(lines), 12)]
@@ -0,0 +1,91 @@
+import os
+import sys
+import gzip
+import subprocess
+from datetime import datetime
+from acrilog.lib.log_search import search, log_files, DEFAULT_DATEFMT
+
+BASE = datetime(2018, 1, 1).timestamp()
+
+
+def line(i, key):
+    created = datetime.fromtimestamp(BASE + i).strftime(DEFAULT_DATEFMT)
+    return '[ %s ][ INFO ][ %s record %03d ]\n' % (created, key, i)
+
+
+def write(path, key, numbers, open_=open):
+    with open_(str(path), 'wt') as f:
+        for i in numbers:
+            f.write(line(i, key))
+
+
+def test_top_keys_are_searched(tmp_path):
+    write(tmp_path / 'app.log', 'app', [0])
+    write(tmp_path / 'app.db.log', 'app.db', [0])
+    write(tmp_path / 'app.log.1', 'app', [0])
+    write(tmp_path / 'other.log', 'other', [0])
+    assert log_files(str(tmp_path)) == {
+        'app': [str(tmp_path / 'app.log.1'), str(tmp_path / 'app.log')],
+        'other': [str(tmp_path / 'other.log')]}
+    assert list(log_files(str(tmp_path), keys=['app.*'])) == ['app.db']
+
+
+def test_matches_are_merged_by_time(tmp_path):
+    write(tmp_path / 'a.log.2.gz', 'a', range(0, 30, 3), gzip.open)
+    write(tmp_path / 'a.log.1', 'a', range(30, 60, 3))
+    write(tmp_path / 'a.log', 'a', range(60, 90, 3))
+    write(tmp_path / 'b.log', 'b', range(1, 90, 3))
+    write(tmp_path / 'c.log.1', 'c', range(2, 45, 3))
+    write(tmp_path / 'c.log', 'c', range(47, 90, 3))
+
+    matches = list(search(str(tmp_path), r'record \d*[05] ', workers=2))
+    assert [created for created, _, _ in matches] == \
+        [BASE + i for i in range(0, 90, 5)]
+    assert [(key, line) for _, key, line in matches][:3] == [
+        ('a', line(0, 'a').strip().encode()),
+        ('c', line(5, 'c').strip().encode()),
+        ('b', line(10, 'b').strip().encode())]
+
+
+def test_files_without_time_are_reported(tmp_path):
+    write(tmp_path / 'a.log', 'a', range(3))
+    (tmp_path / 'b.log').write_text('b record 000\nb record 001\n')
+    (tmp_path / 'c.log').write_text('c none\n')
+    untimed = list()
+    matches = list(search(str(tmp_path), 'record', workers=1,
+                          untimed=untimed.append))
+    assert untimed == [str(tmp_path / 'b.log')]
+    assert [key for _, key, _ in matches] == ['b', 'b', 'a', 'a', 'a']
+
+
+def test_grep_exits_quietly_on_closed_pipe(tmp_path):
+    write(tmp_path / 'a.log', 'a', range(50000))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.Popen(
+        [sys.executable, '-c',
+         'from acrilog.bin.acrilog_grep import run; run()', 'record',
+         str(tmp_path), '-w', '1'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    assert process.stdout.readline() == line(0, 'a').strip().encode() + \
+        b'\n'
+    process.stdout.close()
+    stderr = process.stderr.read()
+    process.wait(30)
+    assert stderr == b''
+
+
+def test_chunks_match_whole_file(tmp_path):
+    with open(str(tmp_path / 'a.log'), 'w') as f:
+        for i in range(100):
+            f.write(line(i, 'a'))
+            if i % 7 == 0:
+                f.write('  detail of record %03d\n' % i)
+    whole = list(search(str(tmp_path), 'record', workers=2))
+    assert len(whole) == 115
+    for chunk_size in (10, 50, 333):
+        assert list(search(str(tmp_path), 'record', workers=2,
+                           chunk_size=chunk_size)) == whole
+    # detail lines take the time of the record before them.
+    details = [created for created, _, text in whole
+               if text.startswith(b'  detail')]
+    assert details == [BASE + i for i in range(0, 100, 7)]
@@ -0,0 +1,90 @@
+import os
+import mmap
+import logging
+import multiprocessing as mp
+import pytest
+from acrilog import MmapFileHandler
+from acrilog.lib.mmap_file_handler import TAIL_SUFFIX
+
+SEGMENT_SIZE = mmap.ALLOCATIONGRANULARITY
+
+
+def make_record(msg):
+    return logging.LogRecord('acrilog.test', logging.INFO, __file__, 1, msg,
+                             (), None)
+
+
+def create_handler(filename, **kwargs):
+    handler = MmapFileHandler(str(filename), segment_size=SEGMENT_SIZE,
+                              buffer_size=0, **kwargs)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+def log(handler, start, stop):
+    for i in range(start, stop):
+        handler.handle(make_record('record %03d' % i))
+
+
+def expected(start, stop):
+    return ''.join(['record %03d\n' % i for i in range(start, stop)])
+
+
+def test_close_truncates_file_to_data(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename)
+    log(handler, 0, 10)
+    assert filename.stat().st_size == SEGMENT_SIZE
+    assert os.path.exists(str(filename) + TAIL_SUFFIX)
+    handler.close()
+    assert filename.read_text() == expected(0, 10)
+    assert not os.path.exists(str(filename) + TAIL_SUFFIX)
+
+
+def test_file_grows_by_segments(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename)
+    count = SEGMENT_SIZE // len('record 000\n') + 10
+    log(handler, 0, count)
+    assert filename.stat().st_size == 2 * SEGMENT_SIZE
+    handler.close()
+    assert filename.read_text() == expected(0, count)
+
+
+def test_rollover_truncates_backups(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename, maxBytes=100, backupCount=10)
+    log(handler, 0, 30)
+    handler.close()
+    files = [tmp_path / ('test.log.%d' % i) for i in range(10, 0, -1)] + \
+        [filename]
+    files = [f for f in files if f.exists()]
+    assert len(files) > 1
+    for f in files:
+        assert f.stat().st_size <= 100
+    assert ''.join([f.read_text() for f in files]) == expected(0, 30)
+    assert not list(tmp_path.glob('*' + TAIL_SUFFIX))
+
+
+def crash(filename):
+    handler = create_handler(filename)
+    log(handler, 0, 10)
+    # ends without closing handler, leaving the file preallocated.
+    os._exit(0)
+
+
+@pytest.mark.parametrize('delay', [False, True])
+def test_file_left_mapped_is_recovered(tmp_path, delay):
+    filename = tmp_path / 'test.log'
+    process = mp.get_context('fork').Process(target=crash,
+                                             args=(str(filename),))
+    process.start()
+    process.join()
+    assert filename.stat().st_size == SEGMENT_SIZE
+
+    handler = create_handler(filename, delay=delay, index_records=4)
+    # recovered before the file is sized and its index is opened.
+    assert handler._size == len(expected(0, 10))
+    log(handler, 10, 20)
+    handler.close()
+    assert filename.read_text() == expected(0, 20)
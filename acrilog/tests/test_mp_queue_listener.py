@@ -0,0 +1,63 @@
+import logging
+from acrilog.lib.mplogger import MpQueueListener
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super(ListHandler, self).__init__(level)
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+
+
+def make_record(msg, level=logging.INFO, process_name='test'):
+    return logging.makeLogRecord({
+        'name': 'acrilog.test', 'msg': msg, 'levelno': level,
+        'levelname': logging.getLevelName(level),
+        'processName': process_name})
+
+
+def test_route_is_cached_by_process_key():
+    first = ListHandler()
+    listener = MpQueueListener(None, name='test', global_handlers=[first])
+    listener.handle(make_record('record 0'))
+    listener.handle(make_record('record 1'))
+    assert list(listener._routes) == [('test',)]
+    assert first.records == ['record 0', 'record 1']
+
+
+def test_routes_follow_added_and_removed_handlers():
+    first, second = ListHandler(), ListHandler()
+    listener = MpQueueListener(None, name='test', global_handlers=[first])
+    listener.handle(make_record('record 0'))
+    listener.addHandler(second)
+    listener.handle(make_record('record 1'))
+    listener.removeHandler(first)
+    listener.handle(make_record('record 2'))
+    assert first.records == ['record 0', 'record 1']
+    assert second.records == ['record 1', 'record 2']
+
+
+def test_invalidate_routes_picks_up_handler_levels():
+    first, second = ListHandler(), ListHandler()
+    listener = MpQueueListener(None, name='test',
+                               global_handlers=[first, second])
+    listener.handle(make_record('record 0'))
+    second.setLevel(logging.WARNING)
+    # cached route still holds the old level.
+    listener.handle(make_record('record 1'))
+    listener.invalidate_routes()
+    listener.handle(make_record('record 2'))
+    listener.handle(make_record('record 3', level=logging.WARNING))
+    assert first.records == ['record 0', 'record 1', 'record 2', 'record 3']
+    assert second.records == ['record 0', 'record 1', 'record 3']
+
+
+def test_records_below_all_handler_levels_are_skipped():
+    handler = ListHandler(level=logging.ERROR)
+    listener = MpQueueListener(None, name='test', global_handlers=[handler])
+    listener.handle(make_record('record 0', level=logging.WARNING))
+    listener.handle(make_record('record 1', level=logging.ERROR))
+    assert handler.records == ['record 1']
+    assert listener._routes[('test',)][1] == logging.ERROR
@@ -0,0 +1,103 @@
+import re
+import time
+import logging
+from acrilog import MpLogger
+
+
+def records_of(lines):
+    ''' Returns list of (name, number) of 'record name number' messages.
+    '''
+    found = list()
+    for line in lines:
+        match = re.search(r'record (\S+) (\d+)', line)
+        if match:
+            found.append((match.group(1), int(match.group(2))))
+    return found
+
+
+def test_sharded_queues_keep_producer_order(tmp_path, run_producers,
+                                            read_log):
+    mplogger = MpLogger(name='shards', logdir=str(tmp_path), shards=2)
+    mplogger.start()
+    assert len(mplogger.loggerqs) == 2
+    names = ['shards.p%d' % i for i in range(4)]
+    assert run_producers(MpLogger, mplogger.logger_info(), names, 100) == \
+        [0] * 4
+    mplogger.stop()
+    for name in names:
+        assert records_of(read_log(name)) == \
+            [(name, i) for i in range(100)]
+
+
+def produce_after_first(logger_class, logger_info, name, count, level):
+    # the first producer starts at once, the others 150ms later.
+    logger = logger_class.get_logger(logger_info, name=name)
+    if not name.endswith('p0'):
+        time.sleep(0.15)
+    for i in range(count):
+        logger.log(level, 'record %s %s', name, i)
+
+
+def test_shards_share_parent_file(tmp_path, monkeypatch, run_producers,
+                                  read_log):
+    # every shard's drain thread creates the parent's handler lazily; with
+    # file_mode 'w' a duplicate would remove the file of the first.  Slow
+    # creation of the parent's handler, inherited by the forked listener,
+    # lets the other producers, on other shards, find it missing.
+    open_file = logging.FileHandler._open
+
+    def slow_open(handler):
+        stream = open_file(handler)
+        if handler.baseFilename.endswith('race.log'):
+            time.sleep(0.1)
+        return stream
+
+    monkeypatch.setattr(logging.FileHandler, '_open', slow_open)
+    mplogger = MpLogger(name='race', logdir=str(tmp_path), shards=4,
+                        file_mode='w')
+    mplogger.start()
+    names = ['race.p%d' % i for i in range(8)]
+    assert run_producers(MpLogger, mplogger.logger_info(), names, 50,
+                         target=produce_after_first) == [0] * 8
+    mplogger.stop()
+    records = records_of(read_log('race'))
+    assert sorted(records) == sorted((name, i) for name in names
+                                     for i in range(50))
+
+
+def test_thread_mode_is_promoted_to_process(tmp_path, run_producers,
+                                            read_log):
+    mplogger = MpLogger(name='tm', logdir=str(tmp_path), mode='thread')
+    logger = mplogger.start(name='tm.main')
+    for i in range(10):
+        logger.info('record tm.main %s', i)
+    # listener runs on threads of this process.
+    assert mplogger._thread_listeners
+    assert mplogger._queue_listener is None
+
+    assert run_producers(MpLogger, mplogger.logger_info(), ['tm.child'],
+                         10) == [0]
+    assert not mplogger._thread_listeners
+    assert mplogger._queue_listener.is_alive()
+    for i in range(10, 20):
+        logger.info('record tm.main %s', i)
+    mplogger.stop()
+
+    assert records_of(read_log('tm.main')) == \
+        [('tm.main', i) for i in range(20)]
+    assert records_of(read_log('tm.child')) == \
+        [('tm.child', i) for i in range(10)]
+
+
+def test_max_open_files_reopens_files(tmp_path, run_producers, read_log):
+    mplogger = MpLogger(name='mo', logdir=str(tmp_path), max_open_files=1,
+                        file_mode='w')
+    mplogger.start()
+    names = ['mo.p%d' % i for i in range(3)]
+    assert run_producers(MpLogger, mplogger.logger_info(), names, 20) == \
+        [0] * 3
+    mplogger.stop()
+    for name in names:
+        assert records_of(read_log(name)) == [(name, i) for i in range(20)]
+    assert sorted(records_of(read_log('mo'))) == \
+        sorted((name, i) for name in names for i in range(20))
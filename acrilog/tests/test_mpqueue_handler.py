@@ -0,0 +1,214 @@
+import sys
+import time
+import queue
+import logging
+import threading as th
+import pytest
+from acrilog import MpQueueHandler, RecordDecoder
+from acrilog.lib.mpqueue_handler import DROPPED_RECORDS
+from acrilog.lib.queue_listener import RecordQueueListener
+
+
+def make_record(msg='message', level=logging.INFO, args=(),
+                name='acrilog.test'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_batch_flushed_on_size():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, batch_size=3, batch_interval=60)
+    for i in range(3):
+        handler.handle(make_record('record %s', args=(i,)))
+    batch = q.get_nowait()
+    assert [record.getMessage() for record in batch] == \
+        ['record 0', 'record 1', 'record 2']
+    assert q.empty()
+    handler.close()
+
+
+def test_batch_flushed_on_flush_level():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, batch_size=10, batch_interval=60,
+                             flush_level=logging.ERROR)
+    handler.handle(make_record('info'))
+    assert q.empty()
+    handler.handle(make_record('error', level=logging.ERROR))
+    batch = q.get_nowait()
+    assert [record.msg for record in batch] == ['info', 'error']
+    handler.close()
+
+
+def test_batch_flushed_on_interval():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, batch_size=10, batch_interval=0.05)
+    handler.handle(make_record('waiting'))
+    assert q.empty()
+    batch = q.get(timeout=5)
+    assert [record.msg for record in batch] == ['waiting']
+    handler.close()
+
+
+def test_close_flushes_pending_batch():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, batch_size=10, batch_interval=60)
+    handler.handle(make_record('pending'))
+    handler.close()
+    assert [record.msg for record in q.get_nowait()] == ['pending']
+
+
+def test_no_batching_puts_records():
+    q = queue.Queue()
+    handler = MpQueueHandler(q)
+    handler.handle(make_record('single'))
+    assert q.get_nowait().msg == 'single'
+    handler.close()
+
+
+def drain(q):
+    items = list()
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def test_drop_newest_discards_and_reports_count():
+    q = queue.Queue(maxsize=2)
+    handler = MpQueueHandler(q, queue_policy='drop_newest')
+    for i in range(3):
+        handler.handle(make_record('record %s', args=(i,)))
+    assert handler.dropped == 1
+    assert [item.getMessage() for item in drain(q)] == \
+        ['record 0', 'record 1']
+
+    # report follows the next record put once there is room.
+    handler.handle(make_record('record 3'))
+    items = drain(q)
+    assert items[0].msg == 'record 3'
+    assert items[1][0] == DROPPED_RECORDS
+    assert items[1][3] == 1
+    handler.close()
+
+
+def test_drop_oldest_takes_oldest_off_queue():
+    q = queue.Queue(maxsize=2)
+    handler = MpQueueHandler(q, queue_policy='drop_oldest')
+    for i in range(3):
+        handler.handle(make_record('record %s', args=(i,)))
+    assert handler.dropped == 1
+    assert [item.getMessage() for item in drain(q)] == \
+        ['record 1', 'record 2']
+    handler.close()
+
+
+def test_drop_below_level_keeps_records_at_drop_level():
+    q = queue.Queue(maxsize=1)
+    handler = MpQueueHandler(q, queue_policy='drop_below_level',
+                             drop_level=logging.WARNING)
+    handler.handle(make_record('info 0'))
+    handler.handle(make_record('info 1'))
+    assert handler.dropped == 1
+
+    def consume():
+        time.sleep(0.1)
+        q.get()
+
+    consumer = th.Thread(target=consume)
+    consumer.start()
+    # waits for room instead of dropping.
+    handler.handle(make_record('warning', level=logging.WARNING))
+    consumer.join()
+    assert handler.dropped == 1
+    assert q.get_nowait().msg == 'warning'
+    handler.close()
+
+
+def test_drop_below_level_filters_batches():
+    q = queue.Queue(maxsize=1)
+    handler = MpQueueHandler(q, batch_size=3, batch_interval=60,
+                             queue_policy='drop_below_level',
+                             drop_level=logging.WARNING)
+    q.put_nowait('occupied')
+
+    def consume():
+        time.sleep(0.1)
+        q.get()
+
+    consumer = th.Thread(target=consume)
+    consumer.start()
+    handler.handle(make_record('info 0'))
+    handler.handle(make_record('warning', level=logging.WARNING))
+    handler.handle(make_record('info 1'))
+    consumer.join()
+    assert handler.dropped == 2
+    assert [item.msg for item in q.get_nowait()] == ['warning']
+    handler.close()
+
+
+def test_unknown_queue_policy_is_rejected():
+    with pytest.raises(ValueError):
+        MpQueueHandler(queue.Queue(), queue_policy='drop_all')
+
+
+def test_listener_reports_dropped_records():
+    listener = RecordQueueListener(None, queue.Queue(), name='acrilog.test')
+    first = listener.dropped_record(123, 'Worker', 3)
+    second = listener.dropped_record(123, 'Worker', 2)
+    assert first.levelno == logging.WARNING
+    assert first.getMessage() == \
+        'Queue full: Worker (pid 123) dropped 3 records; 3 in total.'
+    assert second.getMessage() == \
+        'Queue full: Worker (pid 123) dropped 2 records; 5 in total.'
+
+
+def test_deferrable_records():
+    assert MpQueueHandler.deferrable(make_record('value %s', args=(1,)))
+    assert MpQueueHandler.deferrable(
+        make_record('%(a)s %(b)s', args=({'a': 'x', 'b': 2.5},)))
+    assert not MpQueueHandler.deferrable(
+        make_record('value %s', args=(object(),)))
+    assert not MpQueueHandler.deferrable(make_record(ValueError('message')))
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        record = logging.LogRecord('acrilog.test', logging.ERROR, __file__,
+                                   1, 'failed %s', ('now',),
+                                   sys.exc_info())
+    assert not MpQueueHandler.deferrable(record)
+
+
+def test_defer_format_sends_message_and_arguments():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, defer_format=True)
+    record = make_record('value %s', args=(1,))
+    handler.handle(record)
+    sent = q.get_nowait()
+    assert sent is not record
+    assert (sent.msg, sent.args) == ('value %s', (1,))
+    assert sent.getMessage() == 'value 1'
+
+
+def test_defer_format_formats_what_it_cannot_defer():
+    class Value(object):
+        def __str__(self):
+            return 'custom'
+
+    q = queue.Queue()
+    handler = MpQueueHandler(q, defer_format=True)
+    handler.handle(make_record('value %s', args=(Value(),)))
+    sent = q.get_nowait()
+    assert sent.msg == 'value custom'
+    assert not sent.args
+
+
+def test_defer_format_with_compact_codec():
+    q = queue.Queue()
+    handler = MpQueueHandler(q, codec='compact', defer_format=True)
+    handler.handle(make_record('value %s', args=(1,)))
+    handler.handle(make_record('value %s', args=(object(),)))
+    decoder = RecordDecoder()
+    deferred, formatted = [decoder.decode(item) for item in drain(q)]
+    assert (deferred.msg, deferred.args) == ('value %s', (1,))
+    assert formatted.msg.startswith('value <object object')
+    assert formatted.args is None
@@ -0,0 +1,124 @@
+import queue
+import pickle
+import logging
+import threading as th
+import multiprocessing as mp
+import pytest
+from acrilog import MpQueueHandler, RateLimitFilter
+from acrilog.lib.mpqueue_handler import RATE_LIMITED
+from acrilog.lib.queue_listener import RecordQueueListener
+
+
+def make_record(msg='message', level=logging.INFO, name='app'):
+    return logging.LogRecord(name, level, __file__, 1, msg, (), None)
+
+
+def test_longest_prefix_then_lowest_level_wins():
+    limit = RateLimitFilter([
+        ('', logging.WARNING, 10),
+        ('app.*', 'INFO', 10),
+        {'prefix': 'app.db', 'level': logging.INFO, 'rate': 10},
+        ('app.db', logging.DEBUG, 10),
+        ])
+    assert limit.match('other', logging.WARNING) == 0
+    assert limit.match('other', logging.ERROR) is None
+    assert limit.match('app.web', logging.INFO) == 1
+    assert limit.match('application', logging.INFO) == 0
+    assert limit.match('app.db.pool', logging.INFO) == 2
+    assert limit.match('app.db', logging.DEBUG) == 3
+
+
+@pytest.mark.parametrize('rule', [('app', logging.INFO, -1),
+                                  ('app', logging.INFO, 1, 1, 2)])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        RateLimitFilter([rule])
+
+
+def test_records_above_burst_are_suppressed_and_reported():
+    limit = RateLimitFilter([('app', logging.INFO, 0, 3)], interval=0)
+    passed = [limit.filter(make_record()) for _ in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert limit.filter(make_record(level=logging.WARNING))
+    assert limit.due()
+    (prefix, level, suppressed, sampled, seconds), = limit.report()
+    assert (prefix, level, suppressed, sampled) == \
+        ('app', logging.INFO, 7, 0)
+    assert not limit.due() and limit.report() == []
+
+
+def test_sampled_records_pass():
+    limit = RateLimitFilter([('app', logging.INFO, 0, 1, 1.0)])
+    assert all(limit.filter(make_record()) for _ in range(5))
+    assert limit._counts == {0: [0, 4]}
+    # nothing was suppressed.
+    assert limit.report() == []
+
+
+def test_threads_share_bucket():
+    limit = RateLimitFilter([('app', logging.INFO, 0, 100)])
+    passed = list()
+
+    def run():
+        passed.append(sum(limit.filter(make_record()) for _ in range(2000)))
+
+    threads = [th.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(passed) == 100
+    assert limit._counts[0][0] == 8 * 2000 - 100
+
+
+def filter_in_child(limit, result):
+    result.put((limit.filter(make_record()), limit.report()))
+
+
+def test_forked_child_does_not_inherit_held_lock():
+    limit = RateLimitFilter([('app', logging.INFO, 0, 1)])
+    limit.filter(make_record())
+    result = mp.get_context('fork').Queue()
+    with limit._lock:
+        child = mp.get_context('fork').Process(
+            target=filter_in_child, args=(limit, result), daemon=True)
+        child.start()
+    # child starts with a full bucket.
+    assert result.get(timeout=10) == (True, [])
+    child.join(10)
+    assert child.exitcode == 0
+
+
+def test_pickled_filter_starts_over():
+    limit = RateLimitFilter([('app', logging.INFO, 0, 1)])
+    limit.filter(make_record())
+    limit.filter(make_record())
+    copy = pickle.loads(pickle.dumps(limit))
+    assert copy.rules == limit.rules
+    assert copy._counts == {}
+    assert copy.filter(make_record())
+
+
+def test_handler_reports_suppressed_records_to_listener():
+    q = queue.Queue()
+    limit = RateLimitFilter([('app', logging.INFO, 0, 2)], interval=0)
+    handler = MpQueueHandler(q, rate_limit=limit)
+    for i in range(5):
+        handler.handle(make_record('record %d' % i))
+    items = list()
+    while not q.empty():
+        items.append(q.get_nowait())
+    assert [item.getMessage() for item in items[:2]] == \
+        ['record 0', 'record 1']
+    assert [item[0] for item in items[2:]] == [RATE_LIMITED] * 3
+    handler.close()
+
+    listener = RecordQueueListener(None, q, name='test')
+    reports = list()
+    for item in items[2:]:
+        reports.extend(listener.rate_limited_records(*item[1:]))
+    assert listener.suppressed == 3
+    assert reports[0].levelno == logging.WARNING
+    assert reports[0].getMessage().startswith(
+        'Rate limit: %s (pid %s) suppressed 1 records of %r at INFO or '
+        'below in ' % (items[2][2], items[2][1], 'app'))
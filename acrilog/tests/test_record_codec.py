@@ -0,0 +1,104 @@
+import logging
+import logging.handlers
+from acrilog import RecordEncoder, RecordDecoder
+from acrilog.lib.queue_listener import RecordQueueListener
+from acrilog.lib.record_codec import UNKNOWN_STRING
+
+
+def make_record(msg, args=(), name='acrilog.codec', level=logging.INFO,
+                **extra):
+    record = logging.LogRecord(name, level, __file__, 10, msg, args, None,
+                               func='make_record')
+    record.__dict__.update(extra)
+    return record
+
+
+def test_round_trip_keeps_record_fields():
+    encoder, decoder = RecordEncoder(), RecordDecoder()
+    record = make_record('value %s and %s', (1, 'two'), user='someone')
+    decoded = decoder.decode(encoder.encode(record))
+    for field in ('name', 'levelno', 'levelname', 'pathname', 'lineno',
+                  'funcName', 'created', 'msecs', 'process', 'processName',
+                  'threadName', 'msg', 'args'):
+        assert getattr(decoded, field) == getattr(record, field), field
+    assert decoded.getMessage() == 'value 1 and two'
+    assert decoded.user == 'someone'
+
+
+def test_strings_are_defined_once():
+    encoder, decoder = RecordEncoder(), RecordDecoder()
+    first = encoder.encode(make_record('first'))
+    second = encoder.encode(make_record('second'))
+    assert first[2]
+    assert second[2] is None
+    assert decoder.decode(first).name == 'acrilog.codec'
+    assert decoder.decode(second).name == 'acrilog.codec'
+
+
+def test_formatted_message_replaces_args():
+    encoder, decoder = RecordEncoder(), RecordDecoder()
+    record = make_record('value %s', (object(),))
+    decoded = decoder.decode(encoder.encode(record, msg='value formatted'))
+    assert decoded.msg == 'value formatted'
+    assert decoded.args is None
+    assert decoded.getMessage() == 'value formatted'
+
+
+def test_records_below_level_are_not_rebuilt():
+    encoder, decoder = RecordEncoder(), RecordDecoder()
+    item = encoder.encode(make_record('debug', level=logging.DEBUG))
+    assert decoder.decode(item, logging.INFO) is None
+    # definitions of the skipped record are kept.
+    later = encoder.encode(make_record('info'))
+    assert decoder.decode(later, logging.INFO).name == 'acrilog.codec'
+
+
+def test_definitions_of_discarded_item_are_kept():
+    encoder, decoder = RecordEncoder(), RecordDecoder()
+    dropped = encoder.encode(make_record('dropped'))
+    assert decoder.decode(RecordEncoder.definitions(dropped)) is None
+    later = encoder.encode(make_record('later'))
+    assert decoder.decode(later).funcName == 'make_record'
+
+
+def test_tables_of_least_recent_producers_are_dropped():
+    decoder = RecordDecoder(max_producers=2)
+    encoders = [RecordEncoder() for _ in range(3)]
+    for encoder in encoders[:2]:
+        decoder.decode(encoder.encode(make_record('first')))
+    # first producer is the most recent; the second one is dropped.
+    decoder.decode(encoders[0].encode(make_record('again')))
+    decoder.decode(encoders[2].encode(make_record('first')))
+    assert list(decoder._tables) == [encoders[0].producer,
+                                     encoders[2].producer]
+
+
+def test_records_of_dropped_table_carry_raw_ids():
+    decoder = RecordDecoder(max_producers=1)
+    active, other = RecordEncoder(), RecordEncoder()
+    decoder.decode(active.encode(make_record('first')))
+    decoder.decode(other.encode(make_record('first')))
+    decoded = decoder.decode(active.encode(make_record('again')))
+    assert decoded.name == UNKNOWN_STRING % 0
+    assert decoded.getMessage() == 'again'
+    assert decoder.lost == [active.producer]
+    # reported once.
+    decoder.decode(active.encode(make_record('later')))
+    assert decoder.lost == [active.producer]
+
+
+def test_listener_reports_dropped_table():
+    listener = RecordQueueListener(None, None, name='test')
+    listener.decoder.max_producers = 1
+    target = logging.handlers.BufferingHandler(100)
+    listener.handlers = (target,)
+    active, other = RecordEncoder(), RecordEncoder()
+    listener.handle(active.encode(make_record('first')))
+    listener.handle(other.encode(make_record('first')))
+    listener.handle(active.encode(make_record('again')))
+    warning, record = target.buffer[2:]
+    assert warning.levelno == logging.WARNING
+    assert warning.getMessage().startswith(
+        'Codec: string table of pid %s (encoder %s)' % active.producer)
+    assert record.getMessage() == 'again'
+    assert listener.decoder.lost == []
@@ -0,0 +1,104 @@
+import types
+import logging
+import pytest
+from acrilog import RepeatAggregator
+from acrilog.lib import repeat_aggregator
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super(ListHandler, self).__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(repeat_aggregator, 'time', types.SimpleNamespace(
+        monotonic=lambda: clock.now))
+    return clock
+
+
+def make_record(msg='record %s', args=(0,), level=logging.INFO,
+                name='acrilog.test'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_repeats_are_summarized_at_window_end(clock):
+    target = ListHandler()
+    aggregator = RepeatAggregator(target, window=10)
+    aggregator.handle(make_record(args=(0,)))
+    for i in range(1, 5):
+        clock.now = i
+        aggregator.handle(make_record(args=(i,)))
+    assert target.messages() == ['record 0']
+    clock.now = 10
+    aggregator.handle(make_record(args=(5,)))
+    assert target.messages() == [
+        'record 0', 'record 5 [repeated 5 times in 10.0 seconds]']
+    assert target.records[-1].repeated == 5
+    assert aggregator.suppressed == 5
+    aggregator.close()
+
+
+def test_keys_are_name_level_and_template(clock):
+    target = ListHandler()
+    aggregator = RepeatAggregator(target, window=10)
+    aggregator.handle(make_record())
+    aggregator.handle(make_record(level=logging.WARNING))
+    aggregator.handle(make_record(name='acrilog.other'))
+    aggregator.handle(make_record(msg='other %s'))
+    aggregator.handle(make_record())
+    assert target.messages() == ['record 0'] * 3 + ['other 0']
+    aggregator.close()
+
+
+def test_quiet_key_is_dropped_and_passed_again(clock):
+    target = ListHandler()
+    aggregator = RepeatAggregator(target, window=10)
+    aggregator.handle(make_record(args=(0,)))
+    aggregator.handle(make_record(args=(1,)))
+    clock.now = 10
+    aggregator._expire()
+    clock.now = 20
+    aggregator._expire()
+    aggregator.handle(make_record(args=(2,)))
+    assert target.messages() == [
+        'record 0', 'record 1 [repeated 1 times in 10.0 seconds]',
+        'record 2']
+    aggregator.close()
+
+
+def test_least_recent_key_is_evicted_with_its_summary(clock):
+    target = ListHandler()
+    aggregator = RepeatAggregator(target, window=10, max_keys=2)
+    for msg in ('a', 'a', 'b', 'a', 'c'):
+        aggregator.handle(make_record(msg=msg, args=()))
+    # b, not repeated, was evicted without summary.
+    assert target.messages() == ['a', 'b', 'c']
+    aggregator.handle(make_record(msg='d', args=()))
+    assert target.messages() == [
+        'a', 'b', 'c', 'd', 'a [repeated 2 times in 0.0 seconds]']
+    aggregator.close()
+
+
+def test_close_passes_pending_summaries(clock):
+    target = ListHandler()
+    aggregator = RepeatAggregator(target, window=10)
+    aggregator.handle(make_record())
+    aggregator.handle(make_record())
+    clock.now = 2
+    aggregator.close()
+    assert target.messages() == [
+        'record 0', 'record 0 [repeated 1 times in 2.0 seconds]']
+
+
+def test_window_must_be_positive():
+    with pytest.raises(ValueError):
+        RepeatAggregator(window=0)
@@ -0,0 +1,96 @@
+import time
+import queue
+import multiprocessing as mp
+import pytest
+from acrilog import SharedMemoryQueue
+
+
+@pytest.fixture
+def shm_queues():
+    created = list()
+
+    def create(*args, **kwargs):
+        q = SharedMemoryQueue(*args, **kwargs)
+        created.append(q)
+        return q
+
+    yield create
+    for q in created:
+        q.close()
+        q.unlink()
+
+
+def test_items_wrap_around_buffer_end(shm_queues):
+    q = shm_queues(size=256)
+    items = ['item %d %s' % (i, 'x' * (i % 7)) for i in range(200)]
+    received = list()
+    for item in items:
+        q.put(item)
+        received.append(q.get(timeout=1))
+    assert received == items
+    assert q.empty()
+    assert q.pending_bytes() == 0
+
+
+def test_full_queue_raises_full_without_blocking(shm_queues):
+    q = shm_queues(size=64)
+    q.put_nowait(b'x' * 20)
+    with pytest.raises(queue.Full):
+        q.put_nowait(b'x' * 20)
+    assert q.get_nowait() == b'x' * 20
+    q.put_nowait(b'y' * 20)
+    assert q.get_nowait() == b'y' * 20
+
+
+def test_drop_overflow_counts_dropped(shm_queues):
+    q = shm_queues(size=64, overflow='drop')
+    q.put(b'x' * 20)
+    q.put(b'x' * 20)
+    q.put(b'x' * 20)
+    assert q.dropped() == 2
+    assert q.get_nowait() == b'x' * 20
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_too_large_item_is_rejected(shm_queues):
+    q = shm_queues(size=64)
+    with pytest.raises(ValueError):
+        q.put(b'x' * 100)
+
+
+def test_closed_queue_raises_value_error(shm_queues):
+    q = shm_queues(size=64)
+    q.close()
+    with pytest.raises(ValueError, match='closed'):
+        q.put('item')
+    with pytest.raises(ValueError, match='closed'):
+        q.put_nowait('item')
+    with pytest.raises(ValueError, match='closed'):
+        q.get_nowait()
+
+
+def test_get_times_out_on_empty_queue(shm_queues):
+    q = shm_queues(size=64)
+    start = time.time()
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.1)
+    assert time.time() - start >= 0.1
+
+
+def _put_later(q, delay, item):
+    time.sleep(delay)
+    q.put(item)
+
+
+def test_waiting_consumer_is_woken_by_producer_process(shm_queues):
+    q = shm_queues(size=1024)
+    producer = mp.Process(target=_put_later, args=(q, 0.2, 'wake'))
+    producer.start()
+    try:
+        # the idle wait is far longer than the producer's delay.
+        start = time.time()
+        assert q.get(timeout=5) == 'wake'
+        assert time.time() - start < SharedMemoryQueue._IDLE_WAIT - 0.2
+    finally:
+        producer.join()
@@ -0,0 +1,72 @@
+import time
+import logging
+import threading as th
+from acrilog import ThreadedHandler
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, delay=0.0, gate=None):
+        super(ListHandler, self).__init__()
+        self.records = list()
+        self.delay = delay
+        self.gate = gate
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.records.append(record.getMessage())
+
+
+def make_record(msg):
+    return logging.LogRecord('acrilog.test', logging.INFO, __file__, 1, msg,
+                             (), None)
+
+
+def test_records_are_handled_in_order_and_flushed():
+    target = ListHandler()
+    handler = ThreadedHandler(target)
+    for i in range(100):
+        handler.handle(make_record('record %d' % i))
+    handler.flush()
+    assert target.records == ['record %d' % i for i in range(100)]
+    handler.close()
+
+
+def test_slow_handler_does_not_hold_others():
+    gate = th.Event()
+    slow, fast = ListHandler(gate=gate), ListHandler()
+    slow_handler, fast_handler = ThreadedHandler(slow), ThreadedHandler(fast)
+    for i in range(10):
+        record = make_record('record %d' % i)
+        slow_handler.handle(record)
+        fast_handler.handle(record)
+    fast_handler.flush()
+    assert len(fast.records) == 10
+    assert slow.records == []
+    assert slow_handler.lag()[0] > 0
+    gate.set()
+    slow_handler.flush()
+    assert len(slow.records) == 10
+    slow_handler.close()
+    fast_handler.close()
+
+
+def test_close_handles_pending_records():
+    target = ListHandler(delay=0.001)
+    handler = ThreadedHandler(target)
+    for i in range(20):
+        handler.handle(make_record('record %d' % i))
+    handler.close()
+    assert len(target.records) == 20
+
+
+def test_records_after_close_are_dropped():
+    target = ListHandler()
+    handler = ThreadedHandler(target, maxsize=1)
+    handler.handle(make_record('record 0'))
+    handler.close()
+    # would wait for room forever on a full queue.
+    assert not handler.handle(make_record('record 1'))
+    assert not handler.handle(make_record('record 2'))
+    assert target.records == ['record 0']
@@ -0,0 +1,111 @@
+import logging
+import pytest
+from acrilog import BufferedFileHandler, LogCompressor, TimeIndex, query
+from acrilog.lib.time_index import TimeIndexWriter, index_filename, \
+    segments
+
+BASE = 1500000000.0
+
+
+def make_record(i, created=None):
+    record = logging.LogRecord('acrilog.test', logging.INFO, __file__, 1,
+                               'record %03d', (i,), None)
+    record.created = BASE + i if created is None else created
+    return record
+
+
+def create_handler(filename, **kwargs):
+    handler = BufferedFileHandler(str(filename), buffer_size=0, **kwargs)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+def test_range_of_blocks(tmp_path):
+    filename = str(tmp_path / 'test.log')
+    writer = TimeIndexWriter(filename, records=10, new=True)
+    offset = 0
+    for i in range(100):
+        if writer.due():
+            writer.checkpoint(offset)
+        writer.add(BASE + i, 10)
+        offset += 10
+    writer.close(offset)
+
+    with TimeIndex(index_filename(filename)) as index:
+        assert len(index) == 10
+        assert index[0] == (100, BASE, BASE + 9)
+        assert index.range() == (0, None)
+        assert index.range(BASE + 25, BASE + 44) == (200, 500)
+        assert index.range(BASE + 20, BASE + 29) == (200, 300)
+        assert index.range(start=BASE + 95) == (900, None)
+        assert index.range(end=BASE - 1) == (0, 0)
+
+
+def test_empty_writer_requires_block_limit(tmp_path):
+    with pytest.raises(ValueError):
+        TimeIndexWriter(str(tmp_path / 'test.log'))
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_query_across_rollovers(tmp_path, compress):
+    filename = tmp_path / 'test.log'
+    compressor = LogCompressor() if compress else None
+    handler = create_handler(filename, binary=True, maxBytes=1000,
+                             backupCount=50, index_records=4,
+                             compressor=compressor)
+    for i in range(100):
+        handler.handle(make_record(i))
+    handler.close()
+    if compressor is not None:
+        compressor.shutdown()
+
+    files = segments(str(filename))
+    assert len(files) > 2
+    for f in files:
+        with TimeIndex(index_filename(f)) as index:
+            assert len(index)
+    records = list(query(str(filename), BASE + 20, BASE + 59))
+    assert [record.getMessage() for record in records] == \
+        ['record %03d' % i for i in range(20, 60)]
+
+
+def test_text_query_returns_blocks_of_range(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename, maxBytes=400, backupCount=50,
+                             index_records=5)
+    for i in range(100):
+        handler.handle(make_record(i))
+    handler.close()
+
+    lines = [line.decode().strip()
+             for line in query(str(filename), BASE + 42, BASE + 47)]
+    assert set('record %03d' % i for i in range(42, 48)) <= set(lines)
+    # whole blocks around range; not whole files.
+    assert len(lines) <= 15
+    assert lines == sorted(lines)
+
+
+def test_out_of_order_records_are_found(tmp_path):
+    filename = tmp_path / 'test.log'
+    handler = create_handler(filename, binary=True, index_records=4)
+    # pairs logged in reverse time order.
+    for i in range(0, 40, 2):
+        handler.handle(make_record(i + 1))
+        handler.handle(make_record(i))
+    handler.close()
+
+    records = list(query(str(filename), BASE + 11, BASE + 20))
+    assert sorted(record.getMessage() for record in records) == \
+        ['record %03d' % i for i in range(11, 21)]
+
+
+def test_reopened_file_appends_to_index(tmp_path):
+    filename = tmp_path / 'test.log'
+    for start in (0, 20):
+        handler = create_handler(filename, binary=True, index_records=4)
+        for i in range(start, start + 20):
+            handler.handle(make_record(i))
+        handler.close()
+    records = list(query(str(filename), BASE + 18, BASE + 23))
+    assert [record.getMessage() for record in records] == \
+        ['record %03d' % i for i in range(18, 24)]